@@ -7,26 +7,120 @@ Implements Spec Section 3.1 - Narrative-aware task decomposition
 import logging
 
 logger = logging.getLogger(__name__)
-from typing import List, Dict, Optional, TYPE_CHECKING
-from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+from dataclasses import dataclass
 import json
 import os
 from orchestrator.ee_world_model import CodebaseWorldModel, MelodicLine, ArchitecturalPattern
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 if TYPE_CHECKING:
     from orchestrator.orchestrator import Orchestrator, AgentName
 
 
-@dataclass
+# Prompt templates are compiled once at import; per-call work is a single
+# str.format per section instead of a fresh f-string build.
+_NARRATIVE_CONTEXT_TMPL = """You are an expert software architect with deep understanding of this codebase.
+
+TASK: {task_description}
+
+{source_file_section}
+
+BUSINESS NARRATIVE CONTEXT:
+
+{narrative_section}
+
+ARCHITECTURAL PATTERNS:
+
+{pattern_section}
+
+RELEVANT MODULES:
+
+{module_section}
+
+CRITICAL DEPENDENCIES:
+
+{dependency_section}
+
+ARCHITECTURAL WARNINGS:
+
+{warning_section}
+
+"""
+
+# Static planner instructions, kept byte-identical across calls
+_NARRATIVE_INSTRUCTIONS = """INSTRUCTIONS:
+
+Decompose this task into subtasks that:
+
+1. PRESERVE business narrative flows - do not break thematic coherence
+2. RESPECT architectural patterns identified above
+3. MAINTAIN critical dependencies between modules
+4. ADDRESS architectural warnings
+
+For each subtask, specify:
+
+- Clear description of what needs to be done
+- Which modules it affects
+- Which business narratives it must preserve
+- Any dependencies on other subtasks
+- Confidence level (0-1) in the approach
+
+Output format (JSON):
+
+{
+  "subtasks": [
+    {
+      "description": "...",
+      "target_modules": ["module1", "module2"],
+      "preserves_narratives": ["narrative1"],
+      "depends_on": [],
+      "confidence": 0.85
+    }
+  ]
+}
+
+"""
+
+_NARRATIVE_PROMPT_END = "Begin:\n"
+
+_MELODIC_TMPL = """
+{i}. {name} (coherence: {c:.2f}, persistence: {p:.2f})
+   Description: {d}
+   Modules involved: {mods}
+   Critical paths: {n} dependency flows
+"""
+
+_PATTERN_TMPL = """
+- {pattern_type}: {count} instances (coherence: {coherence:.2f})
+"""
+
+_MODULE_TMPL = "- {module} (relevance: {conf:.3f})"
+
+_DEPENDENCY_TMPL = "- {src} → {dst} [{criticality}]"
+
+
+@dataclass(slots=True, frozen=True)
 class EnhancedSubtask:
-    """Subtask with narrative context (Spec Section 3.1)"""
+    """
+    Subtask with narrative context (Spec Section 3.1)
+
+    Slotted and immutable: plans allocate many of these. Narratives are
+    stored by MelodicLine name, not as MelodicLine objects (which hold
+    lists), so every field is hashable and so is the subtask.
+    """
     description: str
-    target_modules: List[str]
-    relevant_narratives: List[str]  # Business flows to preserve
-    dependencies: List[str]  # Other subtasks that must complete first
-    warnings: List[str]  # Architectural integrity warnings
+    target_modules: Tuple[str, ...]
+    relevant_narratives: Tuple[str, ...]  # Names of business flows to preserve
+    dependencies: Tuple[str, ...]  # Other subtasks that must complete first
+    warnings: Tuple[str, ...]  # Architectural integrity warnings
     confidence: float  # Bayesian belief in correctness
-    preserves_patterns: List[str] = field(default_factory=list)  # Architectural patterns
+    preserves_patterns: Tuple[str, ...] = ()  # Architectural patterns
 
 
 class EEPlannerAgent:
@@ -118,117 +212,71 @@ SOURCE FILE TO CONVERT:
 CRITICAL: You MUST inventory ALL functions, classes, interfaces, and types from the source file above before creating subtasks.
 """
 
-        prompt = f"""You are an expert software architect with deep understanding of this codebase.
-
-TASK: {task_description}
-
-{source_file_section}
-
-BUSINESS NARRATIVE CONTEXT:
-
-{narrative_section}
-
-ARCHITECTURAL PATTERNS:
-
-{pattern_section}
-
-RELEVANT MODULES:
-
-{module_section}
-
-CRITICAL DEPENDENCIES:
-
-{dependency_section}
-
-ARCHITECTURAL WARNINGS:
-
-{warning_section}
-
-INSTRUCTIONS:
-
-Decompose this task into subtasks that:
-
-1. PRESERVE business narrative flows - do not break thematic coherence
-2. RESPECT architectural patterns identified above
-3. MAINTAIN critical dependencies between modules
-4. ADDRESS architectural warnings
-
-For each subtask, specify:
-
-- Clear description of what needs to be done
-- Which modules it affects
-- Which business narratives it must preserve
-- Any dependencies on other subtasks
-- Confidence level (0-1) in the approach
-
-Output format (JSON):
-
-{{
-  "subtasks": [
-    {{
-      "description": "...",
-      "target_modules": ["module1", "module2"],
-      "preserves_narratives": ["narrative1"],
-      "depends_on": [],
-      "confidence": 0.85
-    }}
-  ]
-}}
-
-Begin:
-"""
-        return prompt
+        context_section = _NARRATIVE_CONTEXT_TMPL.format(
+            task_description=task_description,
+            source_file_section=source_file_section,
+            narrative_section=narrative_section,
+            pattern_section=pattern_section,
+            module_section=module_section,
+            dependency_section=dependency_section,
+            warning_section=warning_section,
+        )
+        return context_section + _NARRATIVE_INSTRUCTIONS + _NARRATIVE_PROMPT_END
     
     def _format_melodic_lines(self, melodic_lines: List[MelodicLine]) -> str:
         """Format business narratives for prompt"""
         if not melodic_lines:
             return "No dominant business narratives detected for this task."
         
-        sections = []
+        buf = []
         for i, line in enumerate(melodic_lines, 1):
-            sections.append(f"""
-{i}. {line.name} (coherence: {line.coherence_score:.2f}, persistence: {line.persistence:.2f})
-   Description: {line.business_description}
-   Modules involved: {' → '.join(line.modules)}
-   Critical paths: {len(line.critical_paths)} dependency flows
-""")
-        return "\n".join(sections)
+            buf.append(_MELODIC_TMPL.format(
+                i=i,
+                name=line.name,
+                c=line.coherence_score,
+                p=line.persistence,
+                d=line.business_description,
+                mods=' → '.join(line.modules),
+                n=len(line.critical_paths),
+            ))
+        return "\n".join(buf)
     
     def _format_patterns(self, patterns: List[ArchitecturalPattern]) -> str:
         """Format architectural patterns"""
         if not patterns:
             return "No specific architectural patterns detected."
         
-        sections = []
-        for pattern in patterns:
-            sections.append(f"""
-- {pattern.pattern_type}: {len(pattern.instances)} instances (coherence: {pattern.coherence:.2f})
-""")
-        return "\n".join(sections)
+        buf = [
+            _PATTERN_TMPL.format(
+                pattern_type=pattern.pattern_type,
+                count=len(pattern.instances),
+                coherence=pattern.coherence,
+            )
+            for pattern in patterns
+        ]
+        return "\n".join(buf)
     
     def _format_modules(self, modules: List[str], confidence: Dict[str, float]) -> str:
         """Format module information with Bayesian confidence"""
         if not modules:
             return "No specific modules identified."
         
-        sections = []
-        for module in sorted(modules, key=lambda m: confidence.get(m, 0), reverse=True):
-            conf = confidence.get(module, 0)
-            sections.append(f"- {module} (relevance: {conf:.3f})")
-        
-        return "\n".join(sections)
+        buf = [
+            _MODULE_TMPL.format(module=module, conf=confidence.get(module, 0))
+            for module in sorted(modules, key=lambda m: confidence.get(m, 0), reverse=True)
+        ]
+        return "\n".join(buf)
     
     def _format_dependencies(self, dependencies: List[Dict]) -> str:
         """Format critical dependencies"""
         if not dependencies:
             return "No critical inter-module dependencies detected."
         
-        sections = []
+        buf = []
         for dep in dependencies:
             criticality = "🔴 CRITICAL" if dep.get('critical', False) else "⚪ Normal"
-            sections.append(f"- {dep['from']} → {dep['to']} [{criticality}]")
-        
-        return "\n".join(sections)
+            buf.append(_DEPENDENCY_TMPL.format(src=dep['from'], dst=dep['to'], criticality=criticality))
+        return "\n".join(buf)
     
     def _format_warnings(self, warnings: List[str]) -> str:
         """Format architectural warnings"""
@@ -347,6 +395,9 @@ Begin:
 
         # Step 4: Call actual MAKER Planner LLM
         logger.info("[3/4] Generating subtasks with MAKER Planner...")
+        # The JSON instructions stay in the user message: the planner system
+        # prompt forbids JSON output, so they must not be merged into it.
+        # The static system prompt is still reused via the server prompt cache.
         planner_prompt = orchestrator._load_system_prompt("planner")
         
         # Call the actual planner agent
@@ -385,9 +436,17 @@ Begin:
     ) -> List[EnhancedSubtask]:
         """Take LLM-generated subtasks and augment with EE context"""
         enhanced = []
+
+        # Pre-index warnings by module once for the whole plan
+        all_modules = {
+            module
+            for subtask in raw_subtasks.get('subtasks', [])
+            for module in subtask.get('target_modules', [])
+        }
+        warnings_by_module = self._index_warnings_by_module(all_modules, context['warnings'])
         
         for subtask in raw_subtasks.get('subtasks', []):
-            # Map melodic line names to actual objects
+            # Keep the names of requested narratives that exist in the context
             relevant_narratives = []
             for narrative_name in subtask.get('preserves_narratives', []):
                 for line in context['melodic_lines']:
@@ -397,9 +456,7 @@ Begin:
             # Generate warnings specific to this subtask
             subtask_warnings = []
             for module in subtask.get('target_modules', []):
-                for warning in context['warnings']:
-                    if module in warning:
-                        subtask_warnings.append(warning)
+                subtask_warnings.extend(warnings_by_module.get(module, []))
             
             # Extract patterns
             patterns = []
@@ -410,16 +467,46 @@ Begin:
             
             enhanced.append(EnhancedSubtask(
                 description=subtask['description'],
-                target_modules=subtask.get('target_modules', []),
-                relevant_narratives=relevant_narratives,
-                dependencies=subtask.get('depends_on', []),
-                warnings=subtask_warnings,
+                target_modules=tuple(subtask.get('target_modules', [])),
+                relevant_narratives=tuple(relevant_narratives),
+                dependencies=tuple(subtask.get('depends_on', [])),
+                warnings=tuple(subtask_warnings),
                 confidence=subtask.get('confidence', 0.5),
-                preserves_patterns=list(set(patterns))
+                preserves_patterns=tuple(set(patterns))
             ))
         
         return enhanced
     
+    def _index_warnings_by_module(self, modules, warnings: List[str]) -> Dict[str, List[str]]:
+        """
+        Map each module name to the warnings that mention it.
+
+        Uses a single Aho-Corasick pass per warning when pyahocorasick is
+        installed, falling back to per-module substring checks otherwise.
+        """
+        warnings_by_module: Dict[str, List[str]] = {}
+        modules = [m for m in modules if m]
+        if not modules or not warnings:
+            return warnings_by_module
+
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for module in modules:
+                automaton.add_word(module, module)
+            automaton.make_automaton()
+            for warning in warnings:
+                # A module mentioned twice still maps the warning once
+                matched = {module for _, module in automaton.iter(warning)}
+                for module in matched:
+                    warnings_by_module.setdefault(module, []).append(warning)
+        else:
+            for warning in warnings:
+                for module in modules:
+                    if module in warning:
+                        warnings_by_module.setdefault(module, []).append(warning)
+
+        return warnings_by_module
+
     def _display_plan_summary(
         self, 
         subtasks: List[EnhancedSubtask],
@@ -6,18 +6,57 @@ Implements the full specification with NetworkX, Thematic PageRank, and Bayesian
 This is the complete implementation matching the specification document.
 """
 
+import ast
+import bisect
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Set
 from dataclasses import dataclass, field
-from collections import defaultdict
+from collections import defaultdict, deque
 import networkx as nx
+import os
+import pickle
 import time
 import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+_PATH_SEP_RE = re.compile(r'[\\/]')
+_DEF_RE = re.compile(r'def\s+(\w+)\s*\([^)]*\):')
+_NEWLINE_RE = re.compile(r'\n')
+
+# Below this many files, thread pool start-up costs more than parsing serially
+PARALLEL_PARSE_MIN_FILES = 32
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Below this many edges, the one-off JIT compile costs more than NumPy
+PAGERANK_JIT_MIN_EDGES = 50_000
+
+# Built L1-L3 layers are pickled here, keyed on a hash of the scanned files'
+# paths, sizes and mtimes; bump the version when the pickled layout changes
+WORLD_MODEL_CACHE_DIR = os.getenv("EE_WORLD_MODEL_CACHE_DIR", "~/.cache/ee_world_model")
+WORLD_MODEL_CACHE_VERSION = 1
+
+# Attributes that make up the built L1-L3 layers (derived lookups such as
+# the frozen call graph and melodic line index are rebuilt after loading)
+_CACHED_LAYER_ATTRS = (
+    'L1_call_graph', 'L1_data_flow', 'L1_module_registry', '_module_to_nodes',
+    'L2_patterns', 'L2_pattern_index',
+    'L3_melodic_lines', 'L3_narrative_index',
+    '_token_vocab', '_token_masks',
+)
+
 
 @dataclass
 class MelodicLine:
@@ -39,14 +78,94 @@ class ArchitecturalPattern:
     coherence: float
 
 
+@dataclass(eq=False)  # ndarray fields make field-wise == ambiguous
+class ModuleRecord:
+    """
+    Columnar (structure-of-arrays) L1 entry for one module.
+
+    Function i is names[i] defined at lines[i]; its calls are
+    calls_flat[calls_offsets[i]:calls_offsets[i + 1]].
+    """
+    path: str
+    names: List[str]
+    lines: np.ndarray  # int32, parallel to names
+    calls_offsets: np.ndarray  # int32, len(names) + 1
+    calls_flat: List[str]
+    classes: List[Dict]
+    imports: Tuple[str, ...]
+
+    @classmethod
+    def from_parsed(cls, path: str, parsed: Dict) -> "ModuleRecord":
+        """Flatten _parse_code_structure output into columns"""
+        names = []
+        lines = []
+        calls_flat = []
+        offsets = [0]
+        for func in parsed['functions']:
+            names.append(sys.intern(func['name']))
+            lines.append(func['line'])
+            calls_flat.extend(sys.intern(call) for call in func['calls'])
+            offsets.append(len(calls_flat))
+        return cls(
+            path=path,
+            names=names,
+            lines=np.array(lines, dtype=np.int32),
+            calls_offsets=np.array(offsets, dtype=np.int32),
+            calls_flat=calls_flat,
+            classes=parsed['classes'],
+            imports=tuple(parsed['imports'])
+        )
+
+    def calls_of(self, i: int) -> List[str]:
+        """Calls made by function i"""
+        return self.calls_flat[self.calls_offsets[i]:self.calls_offsets[i + 1]]
+
+    @property
+    def functions(self) -> List[Dict]:
+        """Row view of the function columns ({'name', 'line', 'calls'} dicts)"""
+        return [
+            {'name': name, 'line': int(line), 'calls': self.calls_of(i)}
+            for i, (name, line) in enumerate(zip(self.names, self.lines))
+        ]
+
+
 class ZellnerSlowBayesianUpdater:
     """Bayesian belief updater for module relevance (Spec Section 1.3)"""
     
-    def __init__(self, modules: List[str]):
-        """Initialise with uniform priors over all modules"""
-        n = len(modules) if modules else 1
-        self.posteriors = {module: 1.0/n for module in modules} if modules else {}
-        self.history = []  # Track updates for learning
+    def __init__(
+        self,
+        modules: List[str],
+        history_cap: int = 1000,
+        history_file: Optional[str] = None
+    ):
+        """
+        Initialise with uniform priors over all modules
+        
+        Args:
+            modules: Module names to hold beliefs over
+            history_cap: Number of recent updates kept in memory
+            history_file: Optional NDJSON file every update is appended to
+        """
+        # Posteriors live in a dense array indexed via module_idx so an
+        # update is one vectorised multiply/normalise instead of dict churn
+        self.modules = list(modules) if modules else []
+        self.module_idx = {module: i for i, module in enumerate(self.modules)}
+        n = len(self.modules)
+        self.posteriors_arr = np.full(n, 1.0 / n) if n else np.zeros(0)
+        self._likelihood_buf = np.zeros(n)
+        # Track recent updates for learning: each entry holds a 'timestamp'
+        # and float16 'likelihoods' and 'posteriors' arrays aligned
+        # index-for-index with self.modules. Bounded so long-lived services
+        # run in constant memory; the full trail can go to history_file.
+        self.history = deque(maxlen=history_cap)
+        self._history_path = history_file
+        self._history_fh = None
+        self._unflushed = 0
+
+    @property
+    def posteriors(self) -> Dict[str, float]:
+        """Posterior beliefs as a {module: probability} mapping"""
+        return dict(zip(self.modules, self.posteriors_arr.tolist()))
         
     def update(self, module_likelihoods: Dict[str, float]) -> None:
         """
@@ -57,38 +176,229 @@ class ZellnerSlowBayesianUpdater:
         if not module_likelihoods:
             return
         
+        # Modules without an observed likelihood drop to zero belief
+        like = self._likelihood_buf
+        like.fill(0.0)
+        for module, likelihood in module_likelihoods.items():
+            idx = self.module_idx.get(module)
+            if idx is not None:
+                like[idx] = likelihood
+        
         # Bayes' rule: P(module|task) ∝ P(task|module) * P(module)
-        unnormalised = {
-            module: likelihood * self.posteriors.get(module, 0.0)
-            for module, likelihood in module_likelihoods.items()
-        }
+        unnormalised = self.posteriors_arr * like
         
         # Normalise to get posterior
-        total = sum(unnormalised.values())
+        total = unnormalised.sum()
         if total > 0:
-            self.posteriors = {
-                module: prob / total 
-                for module, prob in unnormalised.items()
-            }
-        
-        # Store for meta-learning
-        self.history.append({
-            'likelihoods': module_likelihoods.copy(),
-            'posteriors': self.posteriors.copy()
-        })
+            unnormalised /= total
+            self.posteriors_arr = unnormalised
+        
+        # Store for meta-learning (compact float16 snapshots)
+        entry = {
+            'timestamp': time.time(),
+            'likelihoods': like.astype(np.float16),
+            'posteriors': self.posteriors_arr.astype(np.float16)
+        }
+        self.history.append(entry)
+        if self._history_path:
+            self._log_history(entry)
+    
+    def _log_history(self, entry: Dict) -> None:
+        """Append an update to the history file, flushing every 100 lines"""
+        if self._history_fh is None:
+            self._history_fh = open(self._history_path, 'a', encoding='utf-8')
+        self._history_fh.write(json.dumps({
+            'timestamp': entry['timestamp'],
+            'likelihoods': entry['likelihoods'].tolist(),
+            'posteriors': entry['posteriors'].tolist()
+        }) + '\n')
+        self._unflushed += 1
+        if self._unflushed >= 100:
+            self._history_fh.flush()
+            self._unflushed = 0
+    
+    def close(self) -> None:
+        """Flush and close the history file, if one is open"""
+        if self._history_fh is not None:
+            self._history_fh.close()
+            self._history_fh = None
+            self._unflushed = 0
     
     def get_top_modules(self, k: int = 10) -> List[Tuple[str, float]]:
         """Return k modules with highest posterior probability"""
-        sorted_modules = sorted(
-            self.posteriors.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
-        return sorted_modules[:k]
+        arr = self.posteriors_arr
+        if k <= 0 or arr.size == 0:
+            return []
+        if k < arr.size:
+            # O(N) selection of the k-th largest value; keeping every entry
+            # that ties with it lets the stable sort below break ties by
+            # module order, as a full sort of the posteriors would
+            kth = np.partition(arr, -k)[-k]
+            top = np.flatnonzero(arr >= kth)
+        else:
+            top = np.arange(arr.size)
+        top = top[np.argsort(-arr[top], kind='stable')][:k]
+        return [(self.modules[i], float(arr[i])) for i in top if arr[i] > 0]
     
     def get_posterior(self, module: str) -> float:
         """Get current belief about module relevance"""
-        return self.posteriors.get(module, 0.0)
+        idx = self.module_idx.get(module)
+        if idx is None:
+            return 0.0
+        return float(self.posteriors_arr[idx])
+
+
+def _collect_code_structure(tree: ast.AST) -> Tuple[List[Dict], List[Dict], List[str]]:
+    """
+    Single-pass collector of functions, classes, imports and calls.
+
+    Walks the tree once, breadth-first like ast.walk, carrying the call
+    lists of all enclosing functions. A call is credited to every
+    enclosing function, and every list comes out in the same order as the
+    old nested ast.walk passes, without re-traversing function bodies.
+    """
+    functions: List[Dict] = []
+    classes: List[Dict] = []
+    imports: List[str] = []
+
+    queue = deque([(tree, ())])
+    while queue:
+        node, enclosing_calls = queue.popleft()
+
+        if isinstance(node, ast.FunctionDef):
+            calls: List[str] = []
+            functions.append({
+                'name': node.name,
+                'line': node.lineno,
+                'calls': calls
+            })
+            enclosing_calls = enclosing_calls + (calls,)
+        elif isinstance(node, ast.ClassDef):
+            classes.append({
+                'name': node.name,
+                'line': node.lineno
+            })
+        elif isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            imports.append(node.module or "")
+        elif isinstance(node, ast.Call) and enclosing_calls:
+            func = node.func
+            if isinstance(func, ast.Name):
+                name = func.id
+            elif isinstance(func, ast.Attribute):
+                name = func.attr
+            else:
+                name = None
+            if name is not None:
+                for calls in enclosing_calls:
+                    calls.append(name)
+
+        for child in ast.iter_child_nodes(node):
+            queue.append((child, enclosing_calls))
+
+    return functions, classes, imports
+
+
+def _parse_code_structure(content: str, file_path: str) -> Dict:
+    """Parse code to extract functions, classes, calls"""
+    functions = []
+    classes = []
+    imports = []
+    data_flow = []
+
+    try:
+        tree = ast.parse(content, filename=file_path)
+
+        functions, classes, imports = _collect_code_structure(tree)
+    except SyntaxError:
+        # Fallback: regex parsing, with line numbers found by binary search
+        # over newline offsets instead of re-counting the prefix per match
+        line_starts = [0]
+        line_starts.extend(m.end() for m in _NEWLINE_RE.finditer(content))
+        for match in _DEF_RE.finditer(content):
+            functions.append({
+                'name': match.group(1),
+                'line': bisect.bisect_right(line_starts, match.start()),
+                'calls': []
+            })
+
+    return {
+        'functions': functions,
+        'classes': classes,
+        'imports': imports,
+        'data_flow': data_flow
+    }
+
+
+@lru_cache(maxsize=8192)
+def _module_name_for(file_path: str, root: str) -> str:
+    """Convert a file path under root to a dotted module name (memoised)"""
+    rel_path = str(Path(file_path).relative_to(root))
+    if rel_path.endswith('.py'):
+        rel_path = rel_path[:-3]
+    return _PATH_SEP_RE.sub('.', rel_path)
+
+
+def _read_and_parse_file(file_path: str) -> Optional[Dict]:
+    """Read a source file from disk and parse it (None if it can't be read or parsed)"""
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        return _parse_code_structure(content, file_path)
+    except Exception:
+        return None  # Skip files that can't be read or parsed
+
+
+def _pagerank_iterate_numpy(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    data: np.ndarray,
+    alpha: float,
+    tol: float,
+    max_iter: int
+) -> np.ndarray:
+    """PageRank power iteration over an incoming-edge CSR matrix"""
+    n = len(indptr) - 1
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    base = (1 - alpha) / n
+    pr = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        pr_new = base + alpha * np.bincount(rows, weights=data * pr[indices], minlength=n)
+        
+        # Check convergence
+        diff = np.abs(pr_new - pr).sum()
+        pr = pr_new
+        if diff < tol:
+            break
+    return pr
+
+
+def _pagerank_iterate_kernel(indptr, indices, data, alpha, tol, max_iter):
+    """Loop form of _pagerank_iterate_numpy, fusing SpMV and diff for Numba"""
+    n = indptr.shape[0] - 1
+    n_inv = 1.0 / n
+    pr = np.full(n, n_inv)
+    pr_new = np.empty(n)
+    base = (1.0 - alpha) * n_inv
+    for _ in range(max_iter):
+        diff = 0.0
+        for i in range(n):
+            acc = 0.0
+            for k in range(indptr[i], indptr[i + 1]):
+                acc += data[k] * pr[indices[k]]
+            value = base + alpha * acc
+            diff += abs(value - pr[i])
+            pr_new[i] = value
+        
+        pr, pr_new = pr_new, pr
+        if diff < tol:
+            break
+    return pr
+
+
+if NUMBA_AVAILABLE:
+    _pagerank_iterate_jit = njit(cache=True, fastmath=True)(_pagerank_iterate_kernel)
 
 
 class CodebaseWorldModel:
@@ -102,7 +412,8 @@ class CodebaseWorldModel:
         codebase_path: str,
         mcp_client=None,
         compression_ratios: Tuple[float, float, float] = (0.3, 0.2, 0.15),
-        preservation_thresholds: Tuple[float, float, float] = (0.85, 0.75, 0.70)
+        preservation_thresholds: Tuple[float, float, float] = (0.85, 0.75, 0.70),
+        use_cache: bool = True
     ):
         """
         Initialise hierarchical memory network
@@ -112,11 +423,14 @@ class CodebaseWorldModel:
             mcp_client: MAKER's existing MCP client for code queries
             compression_ratios: β values for L0→L1, L1→L2, L2→L3
             preservation_thresholds: γ values (information preservation)
+            use_cache: Reuse layers built for an unchanged local codebase
+                (stored under WORLD_MODEL_CACHE_DIR)
         """
         self.codebase_path = Path(codebase_path).resolve()
         self.mcp = mcp_client
         self.β = compression_ratios
         self.γ = preservation_thresholds
+        self.use_cache = use_cache
         
         # L₀: Raw code files (accessed via MCP)
         self.L0_index = {}  # Lazy load from MCP
@@ -124,7 +438,15 @@ class CodebaseWorldModel:
         # L₁: Structural layer (call graphs, dependencies)
         self.L1_call_graph = nx.DiGraph()
         self.L1_data_flow = nx.DiGraph()
-        self.L1_module_registry = {}
+        self.L1_module_registry: Dict[str, ModuleRecord] = {}
+        self._module_to_nodes: Dict[str, List[str]] = defaultdict(list)  # module -> call-graph nodes
+        # Read-only CSR snapshot of L1_call_graph for query-time traversal
+        # (built by _freeze_call_graph; NetworkX stays the mutable copy)
+        self._node_list: List[str] = []
+        self._node_idx: Dict[str, int] = {}
+        self._node_module: List[str] = []
+        self._succ_indptr = np.zeros(1, dtype=np.int64)
+        self._succ_indices = np.zeros(0, dtype=np.int64)
         
         # L₂: Pattern layer (architectural patterns)
         self.L2_patterns: List[ArchitecturalPattern] = []
@@ -133,10 +455,22 @@ class CodebaseWorldModel:
         # L₃: Melodic layer (business narratives)
         self.L3_melodic_lines: List[MelodicLine] = []
         self.L3_narrative_index = defaultdict(list)
+        # Lower-cased token -> indices into L3_melodic_lines, for names and
+        # business descriptions; lines ordered by coherence for score ties
+        self._ml_name_index: Dict[str, List[int]] = {}
+        self._ml_desc_index: Dict[str, List[int]] = {}
+        self._ml_by_coherence: List[int] = []
+        # Union of every melodic line's critical (from, to) module pairs
+        self._critical_edges: Set[Tuple[str, str]] = set()
         
         # Bayesian belief updater
         self.belief_updater = None  # Initialised after scanning codebase
         
+        # Name-token vocabulary: each name maps to an int bitmask over
+        # token ids so theme weights are popcounts, not set operations
+        self._token_vocab: Dict[str, int] = {}
+        self._token_masks: Dict[str, int] = {}
+        
         # Cross-level attention weights (learned)
         self.attention_weights = self._initialise_attention_weights()
         
@@ -158,17 +492,30 @@ class CodebaseWorldModel:
         """
         logger.info("Building Expositional Engineering World Model...")
         
-        # Step 1: Build L₁ (Structural Layer)
-        logger.info("  [L1] Analysing code structure...")
-        self._build_structural_layer()
-        
-        # Step 2: Build L₂ (Pattern Layer)
-        logger.info("  [L2] Detecting architectural patterns...")
-        self._build_pattern_layer()
+        # MCP file lists are remote, so only local scans are cached
+        local_files = None if self.mcp else self._list_local_files()
+        cache_path = self._cache_path(local_files) if local_files is not None else None
         
-        # Step 3: Build L₃ (Melodic Layer)
-        logger.info("  [L3] Extracting business narrative flows...")
-        self._build_melodic_layer()
+        if cache_path and self._load_cached_layers(cache_path):
+            logger.info(f"  [Cache] Loaded layers from {cache_path}")
+            self._freeze_call_graph()
+            self._index_melodic_lines()
+        else:
+            # Step 1: Build L₁ (Structural Layer)
+            logger.info("  [L1] Analysing code structure...")
+            self._build_structural_layer(local_files)
+            self._freeze_call_graph()
+            
+            # Step 2: Build L₂ (Pattern Layer)
+            logger.info("  [L2] Detecting architectural patterns...")
+            self._build_pattern_layer()
+            
+            # Step 3: Build L₃ (Melodic Layer)
+            logger.info("  [L3] Extracting business narrative flows...")
+            self._build_melodic_layer()
+            
+            if cache_path:
+                self._save_cached_layers(cache_path)
         
         # Step 4: Initialise Bayesian updater
         logger.info("  [Bayesian] Initialising belief system...")
@@ -179,7 +526,82 @@ class CodebaseWorldModel:
               f"{len(self.L2_patterns)} patterns, "
               f"{len(self.L3_melodic_lines)} melodic lines")
     
-    def _build_structural_layer(self) -> None:
+    def _list_local_files(self) -> List[Path]:
+        """Python files scanned from the local codebase"""
+        return list(self.codebase_path.rglob("*.py"))[:100]  # Limit for performance
+    
+    def _cache_path(self, files: List[Path]) -> Optional[Path]:
+        """Cache file for this file set, or None if caching is off"""
+        if not self.use_cache or not WORLD_MODEL_CACHE_DIR:
+            return None
+        
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"v{WORLD_MODEL_CACHE_VERSION}:{self.codebase_path}".encode())
+        for path in sorted(files):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            digest.update(f"\0{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return Path(WORLD_MODEL_CACHE_DIR).expanduser() / f"{digest.hexdigest()}.pkl"
+    
+    def _load_cached_layers(self, cache_path: Path) -> bool:
+        """Restore L1-L3 from cache_path; False if missing or unreadable"""
+        try:
+            with open(cache_path, 'rb') as f:
+                layers = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable world model cache {cache_path}: {e}")
+            return False
+        
+        if not isinstance(layers, dict) or set(layers) != set(_CACHED_LAYER_ATTRS):
+            return False
+        for attr in _CACHED_LAYER_ATTRS:
+            setattr(self, attr, layers[attr])
+        return True
+    
+    def _save_cached_layers(self, cache_path: Path) -> None:
+        """Write L1-L3 to cache_path atomically (best effort)"""
+        layers = {attr: getattr(self, attr) for attr in _CACHED_LAYER_ATTRS}
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(layers, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Could not write world model cache {cache_path}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+    
+    def _freeze_call_graph(self) -> None:
+        """Snapshot L1_call_graph successors as CSR arrays"""
+        graph = self.L1_call_graph
+        self._node_list = list(graph.nodes())
+        self._node_idx = {node: i for i, node in enumerate(self._node_list)}
+        # Defined functions carry their module; bare callee names
+        # (unresolved calls) fall back to the prefix
+        self._node_module = [
+            attrs.get('module') or node.split('.')[0]
+            for node, attrs in graph.nodes(data=True)
+        ]
+        
+        n = len(self._node_list)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([graph.out_degree(node) for node in self._node_list], out=indptr[1:])
+        indices = np.fromiter(
+            (self._node_idx[v] for node in self._node_list for v in graph.successors(node)),
+            dtype=np.int64,
+            count=int(indptr[-1])
+        )
+        self._succ_indptr = indptr
+        self._succ_indices = indices
+    
+    def _build_structural_layer(self, local_files: Optional[List[Path]] = None) -> None:
         """
         Build L₁: Call graphs and dependency structures
         Query MCP for all files and build relationships
@@ -197,109 +619,75 @@ class CodebaseWorldModel:
                 all_files = []
         else:
             # Fallback: scan filesystem
-            all_files = list(self.codebase_path.rglob("*.py"))[:100]  # Limit for performance
+            all_files = local_files if local_files is not None else self._list_local_files()
         
-        for file_path in all_files:
+        # Read + parse is independent per file, so fan it out over threads
+        parsed_files = self._parse_files(all_files)
+        
+        for file_path, parsed in zip(all_files, parsed_files):
+            if parsed is None:
+                continue  # Skip files that can't be parsed
             try:
-                # Get file content
-                if self.mcp:
-                    file_content = self.mcp.read_file(str(file_path))
-                else:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_content = f.read()
-                
-                # Parse file to extract functions/classes
-                parsed = self._parse_code_structure(file_content, str(file_path))
-                
                 # Register module
-                module_name = self._get_module_name(str(file_path))
-                self.L1_module_registry[module_name] = {
-                    'path': str(file_path),
-                    'functions': parsed['functions'],
-                    'classes': parsed['classes'],
-                    'imports': parsed['imports']
-                }
+                module_name = sys.intern(self._get_module_name(str(file_path)))
+                record = ModuleRecord.from_parsed(str(file_path), parsed)
+                self.L1_module_registry[module_name] = record
                 
                 # Build call graph
-                for func in parsed['functions']:
-                    func_node = f"{module_name}.{func['name']}"
+                for i, name in enumerate(record.names):
+                    func_node = f"{module_name}.{name}"
+                    calls = record.calls_of(i)
                     self.L1_call_graph.add_node(
                         func_node,
                         module=module_name,
-                        **func
+                        name=name,
+                        line=int(record.lines[i]),
+                        calls=calls
                     )
+                    self._module_to_nodes[module_name].append(func_node)
                     
                     # Add edges for function calls
-                    for called_func in func.get('calls', []):
+                    for called_func in calls:
                         self.L1_call_graph.add_edge(
                             func_node,
                             called_func,
                             weight=1.0
                         )
             except Exception as e:
-                continue  # Skip files that can't be parsed
+                continue  # Skip files that can't be registered
     
-    def _parse_code_structure(self, content: str, file_path: str) -> Dict:
-        """Parse code to extract functions, classes, calls"""
-        import ast
+    def _parse_files(self, all_files: List) -> List[Optional[Dict]]:
+        """Read and parse files in parallel, preserving input order"""
+        if not all_files:
+            return []
         
-        functions = []
-        classes = []
-        imports = []
-        data_flow = []
-        
-        try:
-            tree = ast.parse(content, filename=file_path)
+        if self.mcp:
+            def read_and_parse(file_path):
+                try:
+                    return _parse_code_structure(self.mcp.read_file(str(file_path)), str(file_path))
+                except Exception:
+                    return None
             
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    calls = []
-                    for child in ast.walk(node):
-                        if isinstance(child, ast.Call):
-                            if isinstance(child.func, ast.Name):
-                                calls.append(child.func.id)
-                            elif isinstance(child.func, ast.Attribute):
-                                calls.append(f"{child.func.attr}")
-                    
-                    functions.append({
-                        'name': node.name,
-                        'line': node.lineno,
-                        'calls': calls
-                    })
-                
-                elif isinstance(node, ast.ClassDef):
-                    classes.append({
-                        'name': node.name,
-                        'line': node.lineno
-                    })
-                
-                elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                    if isinstance(node, ast.Import):
-                        imports.extend([alias.name for alias in node.names])
-                    else:
-                        imports.append(node.module or "")
-        except SyntaxError:
-            # Fallback: regex parsing
-            import re
-            func_pattern = r'def\s+(\w+)\s*\([^)]*\):'
-            for match in re.finditer(func_pattern, content):
-                functions.append({
-                    'name': match.group(1),
-                    'line': content[:match.start()].count('\n') + 1,
-                    'calls': []
-                })
-        
-        return {
-            'functions': functions,
-            'classes': classes,
-            'imports': imports,
-            'data_flow': data_flow
-        }
+            with ThreadPoolExecutor(max_workers=min(8, len(all_files))) as executor:
+                return list(executor.map(read_and_parse, all_files))
+        
+        paths = [str(file_path) for file_path in all_files]
+        if len(paths) >= PARALLEL_PARSE_MIN_FILES:
+            # Threads, not processes: the scan is capped at 100 small files, so
+            # spawning interpreters (and re-importing __main__) costs more than
+            # the parse; file reads still overlap
+            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(paths))) as executor:
+                return list(executor.map(_read_and_parse_file, paths))
+        
+        return [_read_and_parse_file(path) for path in paths]
+    
+    def _parse_code_structure(self, content: str, file_path: str) -> Dict:
+        """Parse code to extract functions, classes, calls"""
+        return _parse_code_structure(content, file_path)
     
     def _get_module_name(self, file_path: str) -> str:
         """Convert file path to module name"""
-        rel_path = str(Path(file_path).relative_to(self.codebase_path))
-        return rel_path.replace('/', '.').replace('\\', '.').replace('.py', '')
+        return _module_name_for(file_path, str(self.codebase_path))
     
     def _build_pattern_layer(self) -> None:
         """Build L₂: Detect architectural and design patterns"""
@@ -351,16 +739,11 @@ class CodebaseWorldModel:
         if len(self.L1_call_graph.nodes()) == 0:
             return
         
-        # Step 1: Extract concept graphs from each module
-        module_concept_graphs = []
-        for module_name, module_data in self.L1_module_registry.items():
-            G = self._extract_concept_graph(module_name, module_data)
-            module_concept_graphs.append((module_name, G))
-        
-        # Step 2: Build global concept graph
+        # Steps 1-2: Extract each module's concept graph straight into the
+        # global concept graph (no per-module graphs to compose)
         global_graph = nx.DiGraph()
-        for module_name, G in module_concept_graphs:
-            global_graph = nx.compose(global_graph, G)
+        for module_name, module_data in self.L1_module_registry.items():
+            self._extract_concept_graph(module_name, module_data, target_graph=global_graph)
         
         # Step 3: Apply modified PageRank with thematic clustering
         pagerank_scores = self._thematic_pagerank(
@@ -391,30 +774,66 @@ class CodebaseWorldModel:
                 # Index for quick lookup
                 for module in melodic_line.modules:
                     self.L3_narrative_index[module].append(melodic_line)
+        
+        self._index_melodic_lines()
+    
+    def _index_melodic_lines(self) -> None:
+        """Build melodic line lookups (token index, critical edges)"""
+        name_index = defaultdict(list)
+        desc_index = defaultdict(list)
+        for i, line in enumerate(self.L3_melodic_lines):
+            for token in set(line.name.lower().split()):
+                name_index[token].append(i)
+            for token in set(line.business_description.lower().split()):
+                desc_index[token].append(i)
+        
+        self._ml_name_index = dict(name_index)
+        self._ml_desc_index = dict(desc_index)
+        self._ml_by_coherence = sorted(
+            range(len(self.L3_melodic_lines)),
+            key=lambda i: -self.L3_melodic_lines[i].coherence_score
+        )
+        self._critical_edges = {
+            edge for line in self.L3_melodic_lines for edge in line.critical_paths
+        }
     
-    def _extract_concept_graph(self, module_name: str, module_data: Dict) -> nx.DiGraph:
-        """Build concept graph for a module"""
-        G = nx.DiGraph()
+    @staticmethod
+    def _lines_matching(index: Dict[str, List[int]], words: Set[str]) -> Set[int]:
+        """Lines with a token containing any of words (substring match)"""
+        hits = set()
+        for token, lines in index.items():
+            if any(word in token for word in words):
+                hits.update(lines)
+        return hits
+    
+    def _extract_concept_graph(
+        self,
+        module_name: str,
+        module_data: ModuleRecord,
+        target_graph: Optional[nx.DiGraph] = None
+    ) -> nx.DiGraph:
+        """Build concept graph for a module, adding into target_graph if given"""
+        G = target_graph if target_graph is not None else nx.DiGraph()
         
         # Add nodes for each function/class
-        for func in module_data.get('functions', []):
-            node_id = f"{module_name}.{func['name']}"
-            G.add_node(node_id, module=module_name, name=func['name'], type='function')
+        for name in module_data.names:
+            node_id = f"{module_name}.{name}"
+            G.add_node(node_id, module=module_name, name=name, type='function',
+                       token_mask=self._name_token_mask(name))
         
-        for cls in module_data.get('classes', []):
+        for cls in module_data.classes:
             node_id = f"{module_name}.{cls['name']}"
-            G.add_node(node_id, module=module_name, name=cls['name'], type='class')
+            G.add_node(node_id, module=module_name, name=cls['name'], type='class',
+                       token_mask=self._name_token_mask(cls['name']))
         
         # Add edges for calls within module
-        for func in module_data.get('functions', []):
-            func_node = f"{module_name}.{func['name']}"
-            for called in func.get('calls', []):
-                # Try to find called function in same module
-                for other_func in module_data.get('functions', []):
-                    if other_func['name'] == called:
-                        called_node = f"{module_name}.{called}"
-                        if called_node in G:
-                            G.add_edge(func_node, called_node, weight=1.0)
+        func_names = set(module_data.names)
+        for i, name in enumerate(module_data.names):
+            func_node = f"{module_name}.{name}"
+            for called in module_data.calls_of(i):
+                # Only resolve calls to functions defined in the same module
+                if called in func_names:
+                    G.add_edge(func_node, f"{module_name}.{called}", weight=1.0)
         
         return G
     
@@ -427,6 +846,11 @@ class CodebaseWorldModel:
         """
         Modified PageRank with thematic weighting (Spec Algorithm 3.1)
         Formula: PR(c) = (1-α)/|V| + α ∑_{u∈N(c)} PR(u) · w(u,c) · theme_weight(u,c)
+
+        Edge weights are normalised once up front into a CSR transition
+        matrix; each iteration is then a single sparse matrix-vector product
+        (Numba-compiled for large graphs when available, vectorised NumPy
+        otherwise).
         """
         nodes = list(graph.nodes())
         n = len(nodes)
@@ -434,68 +858,89 @@ class CodebaseWorldModel:
         if n == 0:
             return {}
         
-        # Initialise PageRank scores uniformly
-        pr = {node: 1.0/n for node in nodes}
-        
-        # Compute theme weights between all connected nodes
-        theme_weights = {}
-        for u, v in graph.edges():
-            theme_weights[(u, v)] = self._compute_theme_weight(
-                graph.nodes[u],
-                graph.nodes[v]
-            )
+        indptr, indices, data = self._build_pagerank_csr(graph, nodes)
         
         # Iterative PageRank with thematic weighting
         max_iterations = 100
         tolerance = 1e-6
         
-        for iteration in range(max_iterations):
-            pr_new = {}
-            
-            for node in nodes:
-                # Base probability
-                pr_new[node] = (1 - alpha) / n
-                
-                # Add contributions from in-neighbours
-                for predecessor in graph.predecessors(node):
-                    if (predecessor, node) in theme_weights:
-                        edge_weight = graph[predecessor][node].get('weight', 1.0)
-                        theme_weight = theme_weights[(predecessor, node)]
-                        
-                        # Normalisation factor (out-degree of predecessor)
-                        out_degree_weighted = sum(
-                            graph[predecessor][succ].get('weight', 1.0) * 
-                            theme_weights.get((predecessor, succ), 1.0)
-                            for succ in graph.successors(predecessor)
-                        )
-                        
-                        if out_degree_weighted > 0:
-                            pr_new[node] += alpha * pr[predecessor] * \
-                                          edge_weight * theme_weight / \
-                                          out_degree_weighted
-            
-            # Check convergence
-            diff = sum(abs(pr_new[node] - pr[node]) for node in nodes)
-            pr = pr_new
-            
-            if diff < tolerance:
-                break
+        if NUMBA_AVAILABLE and len(indices) >= PAGERANK_JIT_MIN_EDGES:
+            pr = _pagerank_iterate_jit(indptr, indices, data, alpha, tolerance, max_iterations)
+        else:
+            pr = _pagerank_iterate_numpy(indptr, indices, data, alpha, tolerance, max_iterations)
         
-        return pr
+        return dict(zip(nodes, pr.tolist()))
+    
+    def _build_pagerank_csr(
+        self,
+        graph: nx.DiGraph,
+        nodes: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Build the column-stochastic transition matrix as incoming-edge CSR.
+        
+        Row i lists the predecessors of node i with weights
+        w(u,i) · theme_weight(u,i) / Σ_v w(u,v) · theme_weight(u,v).
+        """
+        n = len(nodes)
+        node_idx = {node: i for i, node in enumerate(nodes)}
+        
+        # Flatten edges into arrays: vals = w(u,c) · theme_weight(u,c)
+        n_edges = graph.number_of_edges()
+        src = np.empty(n_edges, dtype=np.int64)
+        dst = np.empty(n_edges, dtype=np.int64)
+        vals = np.empty(n_edges, dtype=np.float64)
+        node_attrs = graph.nodes
+        k = 0
+        for u, successors in graph.adjacency():
+            # Source-node lookups are hoisted out of the per-edge loop
+            u_idx = node_idx[u]
+            u_attrs = node_attrs[u]
+            for v, edge_data in successors.items():
+                src[k] = u_idx
+                dst[k] = node_idx[v]
+                vals[k] = edge_data.get('weight', 1.0) * self._compute_theme_weight(
+                    u_attrs,
+                    node_attrs[v]
+                )
+                k += 1
+        
+        # Normalise by weighted out-degree once, outside the iteration
+        out_sum = np.bincount(src, weights=vals, minlength=n)
+        has_out = out_sum[src] > 0
+        vals = np.divide(vals, out_sum[src], out=np.zeros_like(vals), where=has_out)
+        
+        # Group by target node so each row is a contiguous slice
+        order = np.argsort(dst, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=n), out=indptr[1:])
+        return indptr, src[order], vals[order]
+    
+    def _name_token_mask(self, name: str) -> int:
+        """Encode a name's '_'-separated tokens as a bitmask over the vocabulary"""
+        mask = self._token_masks.get(name)
+        if mask is None:
+            mask = 0
+            for token in name.lower().split('_'):
+                token_id = self._token_vocab.setdefault(token, len(self._token_vocab))
+                mask |= 1 << token_id
+            self._token_masks[name] = mask
+        return mask
     
     def _compute_theme_weight(self, node1_attrs: Dict, node2_attrs: Dict) -> float:
         """Compute thematic coherence between two nodes"""
-        name1 = node1_attrs.get('name', '')
-        name2 = node2_attrs.get('name', '')
-        
-        # Simple heuristic: shared tokens in names
-        tokens1 = set(name1.lower().split('_'))
-        tokens2 = set(name2.lower().split('_'))
-        
-        if not tokens1 or not tokens2:
+        # Simple heuristic: shared tokens in names (Jaccard via popcount)
+        mask1 = node1_attrs.get('token_mask')
+        if mask1 is None:
+            mask1 = self._name_token_mask(node1_attrs.get('name', ''))
+        mask2 = node2_attrs.get('token_mask')
+        if mask2 is None:
+            mask2 = self._name_token_mask(node2_attrs.get('name', ''))
+        
+        if not mask1 or not mask2:
             return 0.5
         
-        jaccard = len(tokens1 & tokens2) / len(tokens1 | tokens2)
+        jaccard = (mask1 & mask2).bit_count() / (mask1 | mask2).bit_count()
         
         # Boost if both are in same module
         if node1_attrs.get('module') == node2_attrs.get('module'):
@@ -539,29 +984,14 @@ class CodebaseWorldModel:
         
         # Find longest path through component
         subgraph = graph.subgraph(component)
+        critical_paths = []
         try:
-            # Try to find a path
-            nodes_list = list(component)
-            if len(nodes_list) >= 2:
-                # Simple path finding
-                paths = []
-                for i in range(min(3, len(nodes_list))):
-                    for j in range(i+1, min(3, len(nodes_list))):
-                        try:
-                            path = nx.shortest_path(subgraph, nodes_list[i], nodes_list[j])
-                            if len(path) > 1:
-                                paths.append(path)
-                        except Exception:
-                            pass
-                
-                critical_paths = []
-                if paths:
-                    longest_path = max(paths, key=len)
-                    for k in range(len(longest_path)-1):
-                        from_mod = longest_path[k].split('.')[0]
-                        to_mod = longest_path[k+1].split('.')[0]
-                        if from_mod != to_mod:
-                            critical_paths.append((from_mod, to_mod))
+            longest_path = self._longest_path(subgraph, pagerank_scores)
+            for k in range(len(longest_path)-1):
+                from_mod = longest_path[k].split('.')[0]
+                to_mod = longest_path[k+1].split('.')[0]
+                if from_mod != to_mod:
+                    critical_paths.append((from_mod, to_mod))
         except Exception:
             critical_paths = []
         
@@ -578,6 +1008,24 @@ class CodebaseWorldModel:
             critical_paths=critical_paths
         )
     
+    def _longest_path(
+        self,
+        subgraph: nx.DiGraph,
+        pagerank_scores: Dict[str, float]
+    ) -> List[str]:
+        """
+        Longest path through a component in O(V+E).
+        
+        DAGs use the exact longest path; cyclic components fall back to the
+        deepest shortest path from their highest-PageRank node.
+        """
+        if nx.is_directed_acyclic_graph(subgraph):
+            return nx.dag_longest_path(subgraph, weight=None)
+        
+        root = max(subgraph.nodes(), key=lambda node: pagerank_scores.get(node, 0))
+        paths = nx.single_source_shortest_path(subgraph, root)
+        return max(paths.values(), key=len)
+    
     def query_with_context(self, task_description: str) -> Dict:
         """
         Hierarchical query using PageIndex-style navigation (Spec Section 2.1)
@@ -619,26 +1067,37 @@ class CodebaseWorldModel:
     
     def _query_melodic_lines(self, task_description: str) -> List[MelodicLine]:
         """Find melodic lines relevant to task using semantic search"""
-        # Simplified: keyword matching
-        task_lower = task_description.lower()
-        scored_lines = []
+        # Simplified: keyword matching over the precomputed token index.
+        # A task word (no whitespace) is a substring of a line's text iff it
+        # is a substring of one of its tokens, so this matches a full scan.
+        k = 5
+        words = set(task_description.lower().split())
+        name_hits = self._lines_matching(self._ml_name_index, words)
+        desc_hits = self._lines_matching(self._ml_desc_index, words)
+        hits = name_hits | desc_hits
+        
+        # Unmatched lines score on coherence alone, so only the k most
+        # coherent of them can make the cut
+        candidates = set(hits)
+        for i in self._ml_by_coherence:
+            if len(candidates) >= len(hits) + k:
+                break
+            candidates.add(i)
         
-        for melodic_line in self.L3_melodic_lines:
+        scored_lines = []
+        for i in candidates:
+            melodic_line = self.L3_melodic_lines[i]
             score = 0.0
-            # Check name
-            if any(word in melodic_line.name.lower() for word in task_lower.split()):
+            if i in name_hits:
                 score += 0.5
-            # Check description
-            if any(word in melodic_line.business_description.lower() for word in task_lower.split()):
+            if i in desc_hits:
                 score += 0.3
             # Weight by quality
             score += melodic_line.coherence_score * 0.2
-            
-            scored_lines.append((melodic_line, score))
+            scored_lines.append((i, score))
         
-        scored_lines.sort(key=lambda x: x[1], reverse=True)
-        k = 5
-        return [line for line, score in scored_lines[:k] if score > 0.1]
+        scored_lines.sort(key=lambda x: (-x[1], x[0]))
+        return [self.L3_melodic_lines[i] for i, score in scored_lines[:k] if score > 0.1]
     
     def _query_patterns(
         self, 
@@ -690,38 +1149,47 @@ class CodebaseWorldModel:
     
     def _fetch_code(self, modules: List[str]) -> str:
         """Retrieve actual code for specified modules via MCP"""
-        code_snippets = []
+        targets = [module for module in modules[:10] if module in self.L1_module_registry]  # Limit to 10 modules
+        if not targets:
+            return "\n\n" + "="*80
         
-        for module in modules[:10]:  # Limit to 10 modules
-            if module in self.L1_module_registry:
-                file_path = self.L1_module_registry[module]['path']
-                try:
-                    if self.mcp:
-                        content = self.mcp.read_file(file_path)
-                    else:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                    
-                    code_snippets.append(f"# Module: {module}\n# Path: {file_path}\n\n{content[:2000]}")
-                except Exception:
-                    pass
+        # Reads are independent round-trips; issue them concurrently
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            snippets = list(executor.map(self._read_module_snippet, targets))
         
+        code_snippets = [snippet for snippet in snippets if snippet is not None]
         return "\n\n" + "="*80 + "\n\n".join(code_snippets)
     
+    def _read_module_snippet(self, module: str, max_chars: int = 2000) -> Optional[str]:
+        """Read the first max_chars of a module's source, or None on failure"""
+        file_path = self.L1_module_registry[module].path
+        try:
+            if self.mcp:
+                content = self.mcp.read_file(file_path)[:max_chars]
+            else:
+                # Only read what we keep instead of loading the whole file
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read(max_chars)
+        except Exception:
+            return None
+        return f"# Module: {module}\n# Path: {file_path}\n\n{content}"
+    
     def _extract_dependencies(self, modules: List[str]) -> List[Dict]:
         """Extract critical dependencies between modules"""
         dependencies = []
         
+        node_list = self._node_list
+        node_module = self._node_module
+        indptr = self._succ_indptr
+        indices = self._succ_indices
+        module_set = set(modules)
         for module in modules:
-            module_nodes = [
-                node for node in self.L1_call_graph.nodes()
-                if node.startswith(module + ".")
-            ]
-            
-            for node in module_nodes:
-                for successor in self.L1_call_graph.successors(node):
-                    dep_module = successor.split('.')[0]
-                    if dep_module != module and dep_module in modules:
+            for node in self._module_to_nodes.get(module, ()):
+                i = self._node_idx[node]
+                for j in indices[indptr[i]:indptr[i + 1]].tolist():
+                    dep_module = node_module[j]
+                    if dep_module != module and dep_module in module_set:
+                        successor = node_list[j]
                         dependencies.append({
                             'from': module,
                             'to': dep_module,
@@ -735,12 +1203,7 @@ class CodebaseWorldModel:
     def _is_critical_dependency(self, from_func: str, to_func: str) -> bool:
         """Determine if dependency is architecturally critical"""
         # Check if in critical path of any melodic line
-        for melodic_line in self.L3_melodic_lines:
-            from_mod = from_func.split('.')[0]
-            to_mod = to_func.split('.')[0]
-            if (from_mod, to_mod) in melodic_line.critical_paths:
-                return True
-        return False
+        return (from_func.split('.')[0], to_func.split('.')[0]) in self._critical_edges
     
     def _generate_warnings(
         self,
@@ -7,14 +7,28 @@ Provides user-friendly error messages with actionable suggestions and recovery h
 """
 
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from types import MappingProxyType
+from typing import Optional, List, Dict, Any, Mapping, Sequence, Tuple
 import json
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+try:
+    from enum import StrEnum
+except ImportError:  # Python < 3.11
+    class StrEnum(str, Enum):
+        """Enum whose members are their string values"""
+        def __str__(self) -> str:
+            return str.__str__(self)
 
-class ErrorCategory(Enum):
+        def __format__(self, format_spec: str) -> str:
+            return str.__format__(self, format_spec)
+
+
+class ErrorCategory(StrEnum):
     """Error categories for classification"""
     AUTHENTICATION = "authentication"
     FILE_SYSTEM = "file_system"
@@ -32,7 +46,7 @@ class ErrorCategory(Enum):
     UNKNOWN = "unknown"
 
 
-class ErrorLevel(Enum):
+class ErrorLevel(StrEnum):
     """Error severity levels"""
     CRITICAL = "critical"
     MAJOR = "major"
@@ -45,6 +59,49 @@ class ErrorLevel(Enum):
     FATAL = "fatal"
 
 
+# Severities logged at ERROR; everything else logs as a warning
+_ERROR_LOG_LEVELS = frozenset({ErrorLevel.FATAL, ErrorLevel.CRITICAL, ErrorLevel.ERROR})
+
+# Error-storm log budget: at most LOG_BUDGET_PER_WINDOW identical
+# (category, message) records per window; the rest are counted and
+# reported as one rollup line when the key next logs in a later window
+LOG_BUDGET_PER_WINDOW = 10
+LOG_BUDGET_WINDOW_SECONDS = 1.0
+_LOG_BUDGET_MAX_KEYS = 1024
+
+# (category, message) -> [window_start, emitted_in_window, suppressed]
+_log_budget: Dict[Tuple[str, str], List] = {}
+_log_budget_lock = threading.Lock()
+
+
+def _take_log_budget(category: str, message: str) -> Tuple[bool, int]:
+    """
+    Charge one log record against the (category, message) budget.
+    
+    Returns:
+        (emit, suppressed): whether to emit this record, and how many
+        duplicates were suppressed since the key last logged
+    """
+    now = time.monotonic()
+    key = (category, message)
+    with _log_budget_lock:
+        entry = _log_budget.get(key)
+        if entry is None or now - entry[0] >= LOG_BUDGET_WINDOW_SECONDS:
+            suppressed = entry[2] if entry is not None else 0
+            if entry is None and len(_log_budget) >= _LOG_BUDGET_MAX_KEYS:
+                # Forget keys whose window has lapsed (drops their rollups)
+                for stale in [k for k, e in _log_budget.items()
+                              if now - e[0] >= LOG_BUDGET_WINDOW_SECONDS]:
+                    del _log_budget[stale]
+            _log_budget[key] = [now, 1, 0]
+            return True, suppressed
+        if entry[1] < LOG_BUDGET_PER_WINDOW:
+            entry[1] += 1
+            return True, 0
+        entry[2] += 1
+        return False, 0
+
+
 class UserError(Exception):
     """
     User-friendly error with categorization, suggestions, and context.
@@ -53,12 +110,21 @@ class UserError(Exception):
     that can be formatted for display to users.
     """
     
+    # Slots keep these out of the instance __dict__, which BaseException then
+    # never materialises (roughly halves per-instance memory)
+    __slots__ = ('message', 'category', 'level', 'suggestions', 'recoverable',
+                 'context', 'code', 'cause')
+    
+    # Shared read-only defaults for errors without suggestions/context
+    _EMPTY_SUGGESTIONS: Tuple[str, ...] = ()
+    _EMPTY_CONTEXT: Mapping[str, Any] = MappingProxyType({})
+    
     def __init__(
         self,
         message: str,
         category: ErrorCategory = ErrorCategory.UNKNOWN,
         level: ErrorLevel = ErrorLevel.ERROR,
-        suggestions: Optional[List[str]] = None,
+        suggestions: Optional[Sequence[str]] = None,
         recoverable: bool = True,
         context: Optional[Dict[str, Any]] = None,
         code: Optional[str] = None,
@@ -81,9 +147,9 @@ class UserError(Exception):
         self.message = message
         self.category = category
         self.level = level
-        self.suggestions = suggestions or []
+        self.suggestions = suggestions if suggestions else UserError._EMPTY_SUGGESTIONS
         self.recoverable = recoverable
-        self.context = context or {}
+        self.context = context if context else UserError._EMPTY_CONTEXT
         self.code = code
         self.cause = cause
     
@@ -97,21 +163,21 @@ class UserError(Exception):
         lines = [f"Error: {self.message}"]
         
         if self.category != ErrorCategory.UNKNOWN:
-            lines.append(f"Category: {self.category.value}")
+            lines.append(f"Category: {self.category}")
         
         if self.suggestions:
-            lines.append("\nSuggestions:")
-            for suggestion in self.suggestions:
-                lines.append(f"  • {suggestion}")
+            lines.append("\nSuggestions:\n" + "\n".join(
+                "  • " + str(suggestion) for suggestion in self.suggestions
+            ))
         
         if self.context:
-            lines.append("\nContext:")
-            for key, value in self.context.items():
-                formatted_value = (
+            lines.append("\nContext:\n" + "\n".join(
+                f"  {key}: " + (
                     json.dumps(value, indent=2) if isinstance(value, (dict, list))
                     else str(value)
                 )
-                lines.append(f"  {key}: {formatted_value}")
+                for key, value in self.context.items()
+            ))
         
         if self.cause:
             lines.append(f"\nOriginal error: {type(self.cause).__name__}: {self.cause}")
@@ -125,8 +191,8 @@ class UserError(Exception):
     def __repr__(self) -> str:
         """Detailed representation for debugging"""
         return (
-            f"UserError(message={self.message!r}, category={self.category.value}, "
-            f"level={self.level.value}, recoverable={self.recoverable})"
+            f"UserError(message={self.message!r}, category={self.category}, "
+            f"level={self.level}, recoverable={self.recoverable})"
         )
 
 
@@ -134,7 +200,7 @@ def create_user_error(
     message: str,
     category: ErrorCategory = ErrorCategory.UNKNOWN,
     level: ErrorLevel = ErrorLevel.ERROR,
-    suggestions: Optional[List[str]] = None,
+    suggestions: Optional[Sequence[str]] = None,
     recoverable: bool = True,
     context: Optional[Dict[str, Any]] = None,
     code: Optional[str] = None,
@@ -167,17 +233,29 @@ def create_user_error(
         cause=cause
     )
     
-    # Log the error with appropriate level
-    log_level = 'error' if level in (ErrorLevel.FATAL, ErrorLevel.CRITICAL, ErrorLevel.ERROR) else 'warning'
-    getattr(logger, log_level)(
-        f"User error: {message}",
-        extra={
-            "category": category.value,
-            "level": level.value,
-            "context": context,
-            "suggestions": suggestions
-        }
-    )
+    # Log the error with appropriate level; skip building the record (and
+    # its `extra` dict) entirely when that level is disabled
+    log_level = logging.ERROR if level in _ERROR_LOG_LEVELS else logging.WARNING
+    if logger.isEnabledFor(log_level):
+        emit, suppressed = _take_log_budget(category, message)
+        if not emit:
+            return error
+        if suppressed:
+            logger.log(log_level, "Suppressed %d repeats of user error: %s", suppressed, message)
+        
+        # Lazy %-formatting: the message is only interpolated if a handler
+        # emits the record; context/suggestions ride along unserialised
+        logger.log(
+            log_level,
+            "User error: %s",
+            message,
+            extra={
+                "category": category,
+                "level": level,
+                "context": context,
+                "suggestions": suggestions
+            }
+        )
     
     return error
 
@@ -222,7 +300,9 @@ def ensure_user_error(
     if isinstance(error, UserError):
         return error
     
-    message = str(error) if error else default_message
+    # Stringify the error once; exceptions without a message (e.g. a bare
+    # KeyError()) fall back to default_message
+    message = (str(error) if error is not None else "") or default_message
     
     return create_user_error(
         message=message,
@@ -234,85 +314,92 @@ def ensure_user_error(
 
 # Convenience functions for common error types
 
+# Default suggestions, shared across calls rather than rebuilt per error
+_FILE_NOT_FOUND_SUGGESTIONS = (
+    "Check the file path is correct",
+    "Ensure the file exists in the codebase",
+    "Try using a relative path from project root",
+)
+
+_GIT_SUGGESTIONS = (
+    "Check that git is installed and in PATH",
+    "Verify you have write permissions in the repository",
+    "Check git repository status with 'git status'",
+)
+
+_MODEL_TIMEOUT_SUGGESTIONS = (
+    "Check llama.cpp server is running",
+    "Verify model is loaded at the correct port",
+    "Try restarting the llama.cpp server",
+    "Check server logs for errors",
+)
+
+_CONFIG_SUGGESTIONS = (
+    "Check your .maker.json file for syntax errors",
+    "Verify configuration values are valid",
+    "See .maker.json.example for reference",
+)
+
+_NETWORK_SUGGESTIONS = (
+    "Check your internet connection",
+    "Verify the server URL is correct",
+    "Check firewall settings",
+    "Retry the operation",
+)
+
+
 def file_not_found_error(path: str, suggestions: Optional[List[str]] = None) -> UserError:
     """Create a file not found error"""
-    default_suggestions = [
-        "Check the file path is correct",
-        "Ensure the file exists in the codebase",
-        "Try using a relative path from project root"
-    ]
     return create_user_error(
         message=f"File not found: {path}",
         category=ErrorCategory.FILE_SYSTEM,
-        suggestions=suggestions or default_suggestions,
+        suggestions=suggestions or _FILE_NOT_FOUND_SUGGESTIONS,
         context={"path": path}
     )
 
 
 def git_error(message: str, command: Optional[str] = None, suggestions: Optional[List[str]] = None) -> UserError:
     """Create a git operation error"""
-    default_suggestions = [
-        "Check that git is installed and in PATH",
-        "Verify you have write permissions in the repository",
-        "Check git repository status with 'git status'"
-    ]
     context = {"command": command} if command else {}
     return create_user_error(
         message=f"Git error: {message}",
         category=ErrorCategory.GIT,
-        suggestions=suggestions or default_suggestions,
+        suggestions=suggestions or _GIT_SUGGESTIONS,
         context=context
     )
 
 
 def model_timeout_error(agent: str, port: Optional[int] = None, suggestions: Optional[List[str]] = None) -> UserError:
     """Create a model timeout error"""
-    default_suggestions = [
-        "Check llama.cpp server is running",
-        "Verify model is loaded at the correct port",
-        "Try restarting the llama.cpp server",
-        "Check server logs for errors"
-    ]
     context = {"agent": agent}
     if port:
         context["port"] = port
     return create_user_error(
         message=f"Model timeout for agent {agent}",
         category=ErrorCategory.MODEL_TIMEOUT,
-        suggestions=suggestions or default_suggestions,
+        suggestions=suggestions or _MODEL_TIMEOUT_SUGGESTIONS,
         context=context
     )
 
 
 def config_error(message: str, config_path: Optional[str] = None, suggestions: Optional[List[str]] = None) -> UserError:
     """Create a configuration error"""
-    default_suggestions = [
-        "Check your .maker.json file for syntax errors",
-        "Verify configuration values are valid",
-        "See .maker.json.example for reference"
-    ]
     context = {"config_path": config_path} if config_path else {}
     return create_user_error(
         message=f"Configuration error: {message}",
         category=ErrorCategory.CONFIG,
-        suggestions=suggestions or default_suggestions,
+        suggestions=suggestions or _CONFIG_SUGGESTIONS,
         context=context
     )
 
 
 def network_error(message: str, url: Optional[str] = None, suggestions: Optional[List[str]] = None) -> UserError:
     """Create a network error"""
-    default_suggestions = [
-        "Check your internet connection",
-        "Verify the server URL is correct",
-        "Check firewall settings",
-        "Retry the operation"
-    ]
     context = {"url": url} if url else {}
     return create_user_error(
         message=f"Network error: {message}",
         category=ErrorCategory.NETWORK,
-        suggestions=suggestions or default_suggestions,
+        suggestions=suggestions or _NETWORK_SUGGESTIONS,
         context=context,
         recoverable=True
     )
@@ -8,27 +8,112 @@ Implements open-docs pattern for multi-level retrieval:
 3. Re-rank and merge results
 """
 
+import heapq
 import logging
-from typing import List, Dict, Optional, Set
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 from pathlib import Path
 import re
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# find_references output line: "[DEF] orchestrator/orchestrator.py:123 (definition)".
+# Anchored per line and kept within it, so one finditer scans the whole output
+_REF_LINE_RE = re.compile(r'(?m)^\[(?:DEF|REF)\][^\S\n]+([^:\n]+):(\d+)[^\S\n]+\((\w+)\)')
+_REF_LINE_RE_B = re.compile(_REF_LINE_RE.pattern.encode('ascii'))
+
+# Potential identifiers (camelCase, snake_case, UPPER_CASE)
+_IDENT_RE = re.compile(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b')
+
+# Keywords per query sent to find_references (one concurrent call each)
+MAX_SEARCH_KEYWORDS = 5
+
+# Below this many merged results, a Python loop beats NumPy's setup cost
+NUMPY_RERANK_MIN_RESULTS = 256
+
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'how', 'what', 'where', 'when', 'why', 'does',
+    'is', 'are', 'was', 'were', 'do', 'did', 'can', 'could',
+    'should', 'would', 'will', 'this', 'that', 'these', 'those'
+})
+
+
+def _iter_references(refs_result) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield (file_path, line_number, ref_type) from find_references output.
+    
+    Byte buffers (bytes/bytearray/memoryview) are scanned in place with the
+    bytes pattern and only matched fields are decoded. str output is scanned
+    directly: CPython already stores ASCII text one byte per character, so
+    encoding it first would only add a pass.
+    """
+    if isinstance(refs_result, (bytes, bytearray, memoryview)):
+        for match in _REF_LINE_RE_B.finditer(refs_result):
+            file_path, line_num, ref_type = match.groups()
+            yield file_path.decode('utf-8', 'replace'), line_num.decode('ascii'), ref_type.decode('ascii')
+    else:
+        for match in _REF_LINE_RE.finditer(refs_result):
+            yield match.groups()
+
 
 class HybridSearch:
     """Combines semantic and keyword search for better retrieval"""
     
-    def __init__(self, rag_service=None, mcp_client=None):
+    def __init__(self, rag_service=None, mcp_client=None, cache_size: int = 256,
+                 cache_ttl: float = 60.0):
         """
         Initialize hybrid search.
         
         Args:
             rag_service: RAG service for semantic search
             mcp_client: MCP client for keyword search (find_references)
+            cache_size: Max keyword searches kept in the LRU cache (0 disables)
+            cache_ttl: Seconds a cached keyword search stays valid
         """
         self.rag = rag_service
         self.mcp = mcp_client
+        
+        # (query, top_k) -> (timestamp, results); saves the MCP round-trips
+        # when a query recurs during iterative refinement
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._keyword_cache: OrderedDict[Tuple[str, int], Tuple[float, List[Dict]]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+    
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Shared pool for concurrent find_references calls (created lazily)"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=MAX_SEARCH_KEYWORDS,
+                thread_name_prefix="hybrid-search"
+            )
+        return self._pool
+    
+    def close(self) -> None:
+        """Shut down the find_references pool (in-flight calls finish in the background)"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    def invalidate_cache(self) -> None:
+        """Drop cached keyword searches (the MCP server calls this when its caches are invalidated)"""
+        with self._cache_lock:
+            self._keyword_cache.clear()
     
     def keyword_search(self, query: str, top_k: int = 10) -> List[Dict]:
         """
@@ -44,76 +129,96 @@ class HybridSearch:
         if not self.mcp:
             return []
         
+        cache_key = (query, top_k)
+        with self._cache_lock:
+            cached = self._keyword_cache.get(cache_key)
+            if cached is not None:
+                if time.time() - cached[0] < self.cache_ttl:
+                    self._keyword_cache.move_to_end(cache_key)
+                    return [dict(result) for result in cached[1]]
+                del self._keyword_cache[cache_key]
+        
+        results, complete = self._keyword_search_uncached(query, top_k)
+        
+        # Only cache searches where every MCP call succeeded
+        if complete and self.cache_size > 0:
+            with self._cache_lock:
+                self._keyword_cache[cache_key] = (time.time(), [dict(result) for result in results])
+                if len(self._keyword_cache) > self.cache_size:
+                    self._keyword_cache.popitem(last=False)
+        
+        return results
+    
+    def _keyword_search_uncached(self, query: str, top_k: int) -> Tuple[List[Dict], bool]:
+        """Run keyword_search against MCP; also reports whether all calls succeeded"""
+        complete = True
         results = []
+        seen = set()  # (file_path, line_number) already in results
         
         # Extract keywords from query
-        keywords = self._extract_keywords(query)
+        keywords = self._extract_keywords(query)[:MAX_SEARCH_KEYWORDS]
         
-        for keyword in keywords[:5]:  # Limit to top 5 keywords
+        # The find_references round-trips are independent, so issue them
+        # concurrently; results are consumed in keyword order so dedup
+        # keeps the same first hit as a sequential loop
+        if len(keywords) > 1:
+            pending = [self._get_pool().submit(self.mcp.find_references, kw) for kw in keywords]
+        else:
+            pending = [None] * len(keywords)
+        
+        for keyword, future in zip(keywords, pending):
             try:
                 # Use MCP find_references for keyword search
-                refs_result = self.mcp.find_references(keyword)
+                refs_result = future.result() if future else self.mcp.find_references(keyword)
                 
                 # Parse results (format: "[DEF] file.py:42 (definition)" or "[REF] file.py:100 (reference)")
-                for line in refs_result.split('\n'):
-                    if not line.strip() or line.startswith(' No'):
+                for file_path, line_num, ref_type in _iter_references(refs_result):
+                    line_number = int(line_num)
+                    
+                    # Deduplicate by file_path + line_number as we go
+                    key = (file_path, line_number)
+                    if key in seen:
                         continue
+                    seen.add(key)
                     
-                    # Parse: "[DEF] orchestrator/orchestrator.py:123 (definition)"
-                    match = re.match(r'[[DEF][REF]]\s+([^:]+):(\d+)\s+\((\w+)\)', line)
-                    if match:
-                        file_path, line_num, ref_type = match.groups()
-                        results.append({
-                            'file_path': file_path,
-                            'line_number': int(line_num),
-                            'ref_type': ref_type,
-                            'keyword': keyword,
-                            'score': 0.8 if ref_type == 'definition' else 0.6,  # Definitions score higher
-                            'source': 'keyword'
-                        })
+                    results.append({
+                        'file_path': file_path,
+                        'line_number': line_number,
+                        'ref_type': ref_type,
+                        'keyword': keyword,
+                        'score': 0.8 if ref_type == 'definition' else 0.6,  # Definitions score higher
+                        'source': 'keyword'
+                    })
             except (ValueError, AttributeError, TypeError) as e:
                 logger.warning(f"Keyword search failed for '{keyword}': {e}")
+                complete = False
                 continue
         
-        # Deduplicate by file_path + line_number
-        seen = set()
-        unique_results = []
-        for result in results:
-            key = (result['file_path'], result['line_number'])
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(result)
-        
-        # Sort by score and return top_k
-        unique_results.sort(key=lambda x: x['score'], reverse=True)
-        return unique_results[:top_k]
+        # Return top_k by score (same order as a stable full sort)
+        return heapq.nlargest(top_k, results, key=itemgetter('score')), complete
     
-    def _extract_keywords(self, query: str) -> List[str]:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _extract_keywords(query: str) -> Tuple[str, ...]:
         """
-        Extract meaningful keywords from query.
+        Extract meaningful keywords from query (memoised; pure in query).
         
         Args:
             query: Search query
             
         Returns:
-            List of keywords (function names, class names, variables)
+            Tuple of keywords (function names, class names, variables)
         """
-        # Remove common words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-                     'of', 'with', 'by', 'how', 'what', 'where', 'when', 'why', 'does', 
-                     'is', 'are', 'was', 'were', 'do', 'does', 'did', 'can', 'could', 
-                     'should', 'would', 'will', 'this', 'that', 'these', 'those'}
-        
         # Extract potential identifiers (camelCase, snake_case, UPPER_CASE)
-        words = re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b', query)
+        words = _IDENT_RE.findall(query)
         
         # Filter out stop words and short words
-        keywords = [w for w in words if w.lower() not in stop_words and len(w) > 2]
+        keywords = [w for w in words if w.lower() not in _STOP_WORDS and len(w) > 2]
         
         # Prioritize capitalized words (likely class/function names)
         keywords.sort(key=lambda x: (x[0].isupper(), len(x)), reverse=True)
         
-        return keywords[:10]  # Return top 10 keywords
+        return tuple(keywords[:10])  # Return top 10 keywords
     
     def merge_and_rerank(self, semantic_results: List[Dict], keyword_results: List[Dict], 
                          top_k: int = 5) -> List[Dict]:
@@ -128,33 +233,39 @@ class HybridSearch:
         Returns:
             Merged and re-ranked results
         """
+        # Nothing to merge when both backends came back empty (e.g. offline)
+        if not semantic_results and not keyword_results:
+            return []
+        
         # Create a combined result set
         combined = {}
         
-        # Add semantic results (weight: 0.6)
+        # Add semantic results (weight: 0.6). Each file path is hashed once:
+        # a single get() serves both the insert and the update branch.
         for result in semantic_results:
-            file_path = result.get('metadata', {}).get('file_path', '')
+            metadata = result.get('metadata', {})
+            file_path = metadata.get('file_path', '')
             if not file_path:
                 continue
             
-            key = file_path
-            if key not in combined:
-                combined[key] = {
+            score = result.get('score', 0.0)
+            semantic_score = score * 0.6  # Weight semantic results
+            entry = combined.get(file_path)
+            if entry is None:
+                combined[file_path] = {
                     'file_path': file_path,
                     'text': result.get('text', ''),
-                    'semantic_score': result.get('score', 0.0) * 0.6,  # Weight semantic results
+                    'semantic_score': semantic_score,
                     'keyword_score': 0.0,
-                    'confidence': result.get('confidence', result.get('score', 0.0)),
-                    'metadata': result.get('metadata', {}),
+                    'confidence': result.get('confidence', score),
+                    'metadata': metadata,
                     'sources': ['semantic']
                 }
             else:
                 # Boost if found in both
-                combined[key]['semantic_score'] = max(
-                    combined[key]['semantic_score'],
-                    result.get('score', 0.0) * 0.6
-                )
-                combined[key]['sources'].append('semantic')
+                if semantic_score > entry['semantic_score']:
+                    entry['semantic_score'] = semantic_score
+                entry['sources'].append('semantic')
         
         # Add keyword results (weight: 0.4)
         for result in keyword_results:
@@ -162,18 +273,18 @@ class HybridSearch:
             if not file_path:
                 continue
             
-            key = file_path
             keyword_score = result.get('score', 0.0) * 0.4  # Weight keyword results
-            
-            if key not in combined:
-                combined[key] = {
+            line_number = result.get('line_number')
+            entry = combined.get(file_path)
+            if entry is None:
+                combined[file_path] = {
                     'file_path': file_path,
                     'text': f"Found at line {result.get('line_number', '?')}",
                     'semantic_score': 0.0,
                     'keyword_score': keyword_score,
                     'confidence': keyword_score,
                     'metadata': {
-                        'line_number': result.get('line_number'),
+                        'line_number': line_number,
                         'ref_type': result.get('ref_type'),
                         'keyword': result.get('keyword')
                     },
@@ -181,18 +292,26 @@ class HybridSearch:
                 }
             else:
                 # Boost if found in both searches
-                combined[key]['keyword_score'] = max(
-                    combined[key]['keyword_score'],
-                    keyword_score
-                )
-                combined[key]['sources'].append('keyword')
+                if keyword_score > entry['keyword_score']:
+                    entry['keyword_score'] = keyword_score
+                entry['sources'].append('keyword')
                 # Update metadata with line number if available
-                if result.get('line_number'):
-                    combined[key]['metadata']['line_number'] = result.get('line_number')
+                if line_number:
+                    entry['metadata']['line_number'] = line_number
         
-        # Calculate final scores (semantic + keyword, with boost for both)
-        final_results = []
-        for file_path, result in combined.items():
+        if len(combined) >= NUMPY_RERANK_MIN_RESULTS:
+            return self._rerank_numpy(list(combined.values()), top_k)
+        
+        # Return top_k by final score. Scores are streamed straight into
+        # nlargest's bounded size-k heap (no intermediate list); ties keep
+        # merge order, as a stable full sort would
+        return heapq.nlargest(top_k, self._score_results(combined.values()),
+                              key=itemgetter('final_score'))
+    
+    @staticmethod
+    def _score_results(results) -> Iterator[Dict]:
+        """Attach final scores (semantic + keyword, with boost for both)"""
+        for result in results:
             final_score = result['semantic_score'] + result['keyword_score']
             
             # Boost if found in both searches (hybrid bonus)
@@ -200,11 +319,37 @@ class HybridSearch:
                 final_score *= 1.2  # 20% boost for hybrid matches
             
             result['final_score'] = final_score
-            final_results.append(result)
+            yield result
+    
+    def _rerank_numpy(self, results: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Vectorised final scoring for large merged result sets.
+        
+        Same scores and order as the Python path in merge_and_rerank:
+        (semantic + keyword) with a 1.2x boost for multi-source hits,
+        ties kept in merge order.
+        """
+        n = len(results)
+        semantic = np.fromiter((r['semantic_score'] for r in results), dtype=np.float64, count=n)
+        keyword = np.fromiter((r['keyword_score'] for r in results), dtype=np.float64, count=n)
+        hybrid = np.fromiter((len(r['sources']) > 1 for r in results), dtype=bool, count=n)
+        
+        final = semantic + keyword
+        final[hybrid] *= 1.2  # 20% boost for hybrid matches
+        for result, final_score in zip(results, final.tolist()):
+            result['final_score'] = final_score
         
-        # Sort by final score and return top_k
-        final_results.sort(key=lambda x: x['final_score'], reverse=True)
-        return final_results[:top_k]
+        if top_k <= 0:
+            return []
+        if top_k < n:
+            # O(N) cut at the k-th score; keep ties so the stable sort
+            # below orders them by merge position
+            kth = np.partition(final, -top_k)[-top_k]
+            top = np.flatnonzero(final >= kth)
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-final[top], kind='stable')][:top_k]
+        return [results[i] for i in top]
     
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         """
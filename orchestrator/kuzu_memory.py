@@ -11,7 +11,10 @@ This solves the problem of agents operating "all over the place" with no shared
 import os
 import time
 import json
+import queue
 import logging
+import threading
+from collections import OrderedDict
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 from dataclasses import dataclass
@@ -27,6 +30,195 @@ except ImportError:
     logger.warning("         Install with: pip install kuzu==0.6.0")
 
 
+# Buffered actions are written in one transaction once this many are pending
+ACTION_BATCH_SIZE = 64
+
+# Actions queued for the background writer before add_action blocks
+WRITE_QUEUE_SIZE = 1024
+
+# Formatted agent contexts kept per memory instance (LRU)
+CONTEXT_CACHE_SIZE = 128
+
+# Seconds a cached context is served without re-reading the graph; bounds
+# staleness from actions written by other instances or processes
+CONTEXT_CACHE_TTL = 5.0
+
+# Rough tokens per formatted context entry, used to cap rows fetched for a budget
+CONTEXT_TOKENS_PER_ROW = 50
+
+# Buffer pool used when durability="low" and no explicit size is given (bytes)
+LOW_DURABILITY_BUFFER_POOL_SIZE = 512 * 1024 * 1024
+
+
+# Bump when _SCHEMA_DDL changes so existing databases are re-checked
+SCHEMA_VERSION = 1
+SCHEMA_SENTINEL = ".schema_version"
+
+# Graph schema, created table by table when missing
+_SCHEMA_DDL = (
+    # Task nodes
+    ("Task", """
+        CREATE NODE TABLE IF NOT EXISTS Task(
+            task_id STRING,
+            user_input STRING,
+            status STRING,
+            created_at INT64,
+            PRIMARY KEY(task_id)
+        )
+    """),
+    # Agent action nodes (each agent's reasoning)
+    ("AgentAction", """
+        CREATE NODE TABLE IF NOT EXISTS AgentAction(
+            action_id STRING,
+            task_id STRING,
+            agent STRING,
+            action_type STRING,
+            input_data STRING,
+            output_data STRING,
+            reasoning STRING,
+            temperature DOUBLE,
+            created_at INT64,
+            PRIMARY KEY(action_id)
+        )
+    """),
+    # Relationships
+    ("PART_OF", """
+        CREATE REL TABLE IF NOT EXISTS PART_OF(
+            FROM AgentAction TO Task
+        )
+    """),
+    ("LEADS_TO", """
+        CREATE REL TABLE IF NOT EXISTS LEADS_TO(
+            FROM AgentAction TO AgentAction,
+            causal_reasoning STRING
+        )
+    """),
+    ("COORDINATES_WITH", """
+        CREATE REL TABLE IF NOT EXISTS COORDINATES_WITH(
+            FROM AgentAction TO AgentAction,
+            collaboration_type STRING
+        )
+    """),
+)
+
+# Cypher for the hot paths, prepared once per connection (see _execute)
+_CYPHER_CREATE_TASK = """
+    CREATE (:Task {
+        task_id: $task_id,
+        user_input: $user_input,
+        status: 'preprocessing',
+        created_at: $timestamp
+    })
+"""
+
+_CYPHER_ADD_ACTIONS = """
+    UNWIND $rows AS r
+    CREATE (:AgentAction {
+        action_id: r.action_id,
+        task_id: r.task_id,
+        agent: r.agent,
+        action_type: r.action_type,
+        input_data: r.input_data,
+        output_data: r.output_data,
+        reasoning: r.reasoning,
+        temperature: r.temperature,
+        created_at: r.created_at
+    })
+"""
+
+_CYPHER_LINK_PART_OF = """
+    UNWIND $rows AS r
+    MATCH (a:AgentAction {action_id: r.action_id}),
+          (t:Task {task_id: r.task_id})
+    CREATE (a)-[:PART_OF]->(t)
+"""
+
+_CYPHER_LINK_LEADS_TO = """
+    UNWIND $links AS l
+    MATCH (prev:AgentAction {action_id: l.prev_id}),
+          (curr:AgentAction {action_id: l.curr_id})
+    CREATE (prev)-[:LEADS_TO {
+        causal_reasoning: l.reasoning
+    }]->(curr)
+"""
+
+_CYPHER_PREVIOUS_ACTION = """
+    MATCH (prev:AgentAction)-[:PART_OF]->(t:Task {task_id: $task_id})
+    WHERE prev.task_id = $task_id
+    RETURN prev.action_id, prev.agent, prev.created_at
+    ORDER BY prev.created_at DESC
+    LIMIT 1
+"""
+
+# Kùzu 0.6 cannot bind LIMIT to a parameter, so the row cap is formatted in
+# as an int; each distinct cap is prepared once
+_CYPHER_GET_CONTEXT = """
+    MATCH (a:AgentAction)-[:PART_OF]->(t:Task {task_id: $task_id})
+    WHERE a.task_id = $task_id
+    RETURN a.agent, a.action_type, substring(a.output_data, 1, 201), a.reasoning, a.created_at
+    ORDER BY a.created_at DESC
+    LIMIT %d
+"""
+
+_CYPHER_MELODIC_LINE = """
+    MATCH (a:AgentAction)
+    WHERE a.task_id = $task_id
+    RETURN a.agent, a.action_type, a.reasoning, a.output_data, a.created_at
+    ORDER BY a.created_at ASC
+"""
+
+# Swarm members' latest actions. Led by the equality predicates on the
+# denormalised task_id/action_type with no PART_OF hop; an empty
+# $exclude_agent excludes nobody. LIMIT is formatted in as above.
+_CYPHER_SWARM_INSIGHTS = """
+    MATCH (a:AgentAction)
+    WHERE a.task_id = $task_id
+      AND a.action_type = 'swarm_code'
+      AND a.agent <> $exclude_agent
+    RETURN a.agent, a.reasoning, a.output_data, a.created_at
+    ORDER BY a.created_at DESC
+    LIMIT %d
+"""
+
+_CYPHER_ADD_COORDINATION = """
+    MATCH (a1:AgentAction {action_id: $id1}),
+          (a2:AgentAction {action_id: $id2})
+    CREATE (a1)-[:COORDINATES_WITH {
+        collaboration_type: $collab_type
+    }]->(a2)
+"""
+
+_CYPHER_UPDATE_TASK_STATUS = """
+    MATCH (t:Task {task_id: $task_id})
+    SET t.status = $status
+"""
+
+# All four counts in one round-trip; OPTIONAL keeps a row when a table is empty
+_CYPHER_STATS = """
+    OPTIONAL MATCH (t:Task)
+    WITH count(t) AS tasks
+    OPTIONAL MATCH (a:AgentAction)
+    WITH tasks, count(a) AS actions
+    OPTIONAL MATCH ()-[l:LEADS_TO]->()
+    WITH tasks, actions, count(l) AS leads_to
+    OPTIONAL MATCH ()-[c:COORDINATES_WITH]->()
+    RETURN tasks, actions, leads_to, count(c) AS coords
+"""
+
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """Cut text to at most max_bytes of UTF-8 without splitting a character"""
+    if text.isascii():
+        # One byte per char: only slice (copy) when actually over the limit
+        return text if len(text) <= max_bytes else text[:max_bytes]
+    if len(text) * 4 <= max_bytes:
+        return text
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", "ignore")
+
+
 @dataclass
 class AgentAction:
     """Single action in the workflow melodic line"""
@@ -74,13 +266,29 @@ class SharedWorkflowMemory:
         # context includes BOTH reasonings!
     """
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self,
+                 db_path: Optional[str] = None,
+                 durability: Optional[str] = None,
+                 buffer_pool_size: Optional[int] = None,
+                 background_writes: Optional[bool] = None):
         """
         Initialize shared workflow memory.
 
         Args:
             db_path: Path to Kùzu database directory (default: ./kuzu_workflow_db)
+            durability: "normal" (default, env KUZU_DURABILITY) or "low". Low
+                        durability disables auto-checkpointing and checkpoints
+                        once in close(); after a crash the whole WAL is replayed
+                        on the next open.
+            buffer_pool_size: Kùzu buffer pool in bytes (default: Kùzu's own, or
+                              LOW_DURABILITY_BUFFER_POOL_SIZE when durability="low")
+            background_writes: If True (env KUZU_BACKGROUND_WRITES), add_action only
+                               queues the action and a writer thread commits it in
+                               batches; reads and flush() wait for the queue to drain
         """
+        self._write_q: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+
         if not KUZU_AVAILABLE:
             self.enabled = False
             self.db = None
@@ -89,15 +297,48 @@ class SharedWorkflowMemory:
 
         self.enabled = True
         self.db_path = db_path or os.getenv("KUZU_DB_PATH", "./kuzu_workflow_db")
+        self.durability = (durability or os.getenv("KUZU_DURABILITY", "normal")).lower()
+        if buffer_pool_size is None and self.durability == "low":
+            buffer_pool_size = LOW_DURABILITY_BUFFER_POOL_SIZE
+
+        if background_writes is None:
+            background_writes = os.getenv("KUZU_BACKGROUND_WRITES", "false").lower() == "true"
+
+        # Actions awaiting a batched write: (row, link_to_previous, agent, reasoning)
+        self._pending_actions: List[tuple] = []
+        # Serialises use of the connection, so the writer thread's transaction
+        # never interleaves with other queries
+        self._lock = threading.RLock()
+        # Ids handed out in the current millisecond, to suffix repeats
+        self._id_lock = threading.Lock()
+        self._id_ms = 0
+        self._id_counts: Dict[str, int] = {}
+
+        # Latest (action_id, agent) this instance wrote per task; a new action
+        # changes the context cache key. Writes from other instances are only
+        # seen once an entry's CONTEXT_CACHE_TTL expires
+        self._last_action_per_task: Dict[str, tuple] = {}
+        # (task_id, max_tokens, last action_id) -> (cached_at, context); guarded by _lock
+        self._ctx_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Prepared statements by query string (see _execute)
+        self._statements: Dict[str, Any] = {}
 
         # Create directory if needed
         Path(self.db_path).mkdir(parents=True, exist_ok=True)
 
         # Initialize Kùzu database
         try:
-            self.db = kuzu.Database(self.db_path)
+            self.db = kuzu.Database(self.db_path, buffer_pool_size=buffer_pool_size or 0)
             self.conn = kuzu.Connection(self.db)
+            if self.durability == "low":
+                self.conn.execute("CALL auto_checkpoint=false")
             self._init_schema()
+            if background_writes:
+                self._write_q = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+                self._writer = threading.Thread(
+                    target=self._writer_loop, name="kuzu-memory-writer", daemon=True
+                )
+                self._writer.start()
             logger.info(f"[KùzuMemory] Initialized workflow memory at {self.db_path}")
         except Exception as e:
             logger.error(f"[KùzuMemory] Failed to initialize: {e}")
@@ -110,60 +351,49 @@ class SharedWorkflowMemory:
         if not self.enabled:
             return
 
+        # Kùzu only indexes primary keys, and it plans these reads as a scan
+        # of AgentAction probed against PART_OF. Every per-task read therefore
+        # also filters on the denormalised AgentAction.task_id, which prunes
+        # the scan before the join instead of probing every action.
+        # A sentinel written after a complete schema lets later opens skip
+        # the catalog entirely
+        sentinel = Path(self.db_path) / SCHEMA_SENTINEL
         try:
-            # Task nodes
-            self.conn.execute("""
-                CREATE NODE TABLE IF NOT EXISTS Task(
-                    task_id STRING,
-                    user_input STRING,
-                    status STRING,
-                    created_at INT64,
-                    PRIMARY KEY(task_id)
-                )
-            """)
-
-            # Agent action nodes (each agent's reasoning)
-            self.conn.execute("""
-                CREATE NODE TABLE IF NOT EXISTS AgentAction(
-                    action_id STRING,
-                    task_id STRING,
-                    agent STRING,
-                    action_type STRING,
-                    input_data STRING,
-                    output_data STRING,
-                    reasoning STRING,
-                    temperature DOUBLE,
-                    created_at INT64,
-                    PRIMARY KEY(action_id)
-                )
-            """)
+            if sentinel.read_text().strip() == str(SCHEMA_VERSION):
+                return
+        except OSError:
+            pass
 
-            # Relationships
-            self.conn.execute("""
-                CREATE REL TABLE IF NOT EXISTS PART_OF(
-                    FROM AgentAction TO Task
-                )
-            """)
+        try:
+            result = self.conn.execute("CALL show_tables() RETURN name")
+            existing = set()
+            while result.has_next():
+                existing.add(result.get_next()[0])
 
-            self.conn.execute("""
-                CREATE REL TABLE IF NOT EXISTS LEADS_TO(
-                    FROM AgentAction TO AgentAction,
-                    causal_reasoning STRING
-                )
-            """)
-
-            self.conn.execute("""
-                CREATE REL TABLE IF NOT EXISTS COORDINATES_WITH(
-                    FROM AgentAction TO AgentAction,
-                    collaboration_type STRING
-                )
-            """)
+            for table, ddl in _SCHEMA_DDL:
+                if table not in existing:
+                    self.conn.execute(ddl)
 
+            sentinel.write_text(f"{SCHEMA_VERSION}\n")
             logger.info("[KùzuMemory] Schema initialized")
         except Exception as e:
             logger.error(f"[KùzuMemory] Schema initialization error: {e}")
             # Schema might already exist, continue
 
+    def _execute(self, query: str, params: Optional[Dict[str, Any]] = None):
+        """Run a query through a prepared statement, preparing it on first use"""
+        with self._lock:
+            if not params:
+                # Kùzu only accepts prepared statements together with parameters
+                return self.conn.execute(query)
+            statement = self._statements.get(query)
+            if statement is None:
+                statement = self.conn.prepare(query)
+                if not statement.is_success():
+                    raise RuntimeError(statement.get_error_message())
+                self._statements[query] = statement
+            return self.conn.execute(statement, params)
+
     def create_task(self, task_id: str, user_input: str) -> bool:
         """
         Create a new task node in the graph.
@@ -179,14 +409,7 @@ class SharedWorkflowMemory:
             return False
 
         try:
-            self.conn.execute("""
-                CREATE (:Task {
-                    task_id: $task_id,
-                    user_input: $user_input,
-                    status: 'preprocessing',
-                    created_at: $timestamp
-                })
-            """, {
+            self._execute(_CYPHER_CREATE_TASK, {
                 "task_id": task_id,
                 "user_input": user_input,
                 "timestamp": int(time.time())
@@ -204,7 +427,8 @@ class SharedWorkflowMemory:
                    output_data: str,
                    reasoning: str,
                    temperature: float = 0.7,
-                   link_to_previous: bool = True) -> Optional[str]:
+                   link_to_previous: bool = True,
+                   flush: bool = True) -> Optional[str]:
         """
         Add an agent action to the melodic line.
 
@@ -217,6 +441,8 @@ class SharedWorkflowMemory:
             reasoning: WHY the agent made this choice (the melodic line!)
             temperature: Temperature used for generation
             link_to_previous: If True, automatically link to previous action in chain
+            flush: If False, buffer the action and write it with the next batch
+                   (reads flush first, so buffered actions are never missed)
 
         Returns:
             action_id if successful, None otherwise
@@ -224,90 +450,211 @@ class SharedWorkflowMemory:
         if not self.enabled:
             return None
 
-        action_id = f"{task_id}_{agent}_{int(time.time() * 1000)}"
+        entry = self._action_entry(task_id, agent, action_type, input_data, output_data,
+                                   reasoning, temperature, link_to_previous)
+        action_id = entry[0]["action_id"]
 
-        try:
-            # Create action node
-            self.conn.execute("""
-                CREATE (:AgentAction {
-                    action_id: $action_id,
-                    task_id: $task_id,
-                    agent: $agent,
-                    action_type: $action_type,
-                    input_data: $input_data,
-                    output_data: $output_data,
-                    reasoning: $reasoning,
-                    temperature: $temperature,
-                    created_at: $timestamp
-                })
-            """, {
-                "action_id": action_id,
-                "task_id": task_id,
-                "agent": agent,
-                "action_type": action_type,
-                "input_data": input_data[:5000],  # Limit to 5KB
-                "output_data": output_data[:5000],  # Limit to 5KB
-                "reasoning": reasoning[:2000],  # Limit to 2KB
-                "temperature": temperature,
-                "timestamp": int(time.time())
-            })
+        if self._write_q is not None:
+            # Blocks only when the writer is WRITE_QUEUE_SIZE actions behind
+            self._write_q.put(entry)
+            return action_id
 
-            # Link to task
-            self.conn.execute("""
-                MATCH (a:AgentAction {action_id: $action_id}),
-                      (t:Task {task_id: $task_id})
-                CREATE (a)-[:PART_OF]->(t)
-            """, {
-                "action_id": action_id,
-                "task_id": task_id
-            })
+        with self._lock:
+            self._pending_actions.append(entry)
+            if not flush and len(self._pending_actions) < ACTION_BATCH_SIZE:
+                return action_id
+            if action_id in self._write_pending():
+                return None
+        return action_id
+
+    def _action_entry(self,
+                      task_id: str,
+                      agent: str,
+                      action_type: str,
+                      input_data: str,
+                      output_data: str,
+                      reasoning: str,
+                      temperature: float = 0.7,
+                      link_to_previous: bool = True) -> tuple:
+        """Pending-action entry: (row, link_to_previous, agent, reasoning)"""
+        return ({
+            "action_id": self._new_action_id(task_id, agent),
+            "task_id": task_id,
+            "agent": agent,
+            "action_type": action_type,
+            "input_data": _truncate_utf8(input_data, 5000),  # Limit to 5KB
+            "output_data": _truncate_utf8(output_data, 5000),  # Limit to 5KB
+            "reasoning": _truncate_utf8(reasoning, 2000),  # Limit to 2KB
+            "temperature": float(temperature),
+            "created_at": int(time.time())
+        }, link_to_previous, agent, reasoning)
+
+    def add_actions_batch(self, actions: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Add several actions (e.g. a swarm fan-in) in a single transaction.
 
-            # Link to previous action (creates melodic line)
-            if link_to_previous:
-                self._link_to_previous_action(action_id, task_id, agent, reasoning)
+        Args:
+            actions: add_action keyword arguments, one dict per action, in order
 
-            return action_id
-        except Exception as e:
-            logger.error(f"[KùzuMemory] Error adding action: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+        Returns:
+            action_ids in input order (None for actions that could not be written)
+        """
+        if not self.enabled:
+            return [None] * len(actions)
+
+        entries = [self._action_entry(**action) for action in actions]
+        # Queued actions go first so each task's chain stays in order
+        self._drain_write_queue()
+        with self._lock:
+            self._pending_actions.extend(entries)
+            failed = self._write_pending()
+        return [None if row["action_id"] in failed else row["action_id"]
+                for row, _, _, _ in entries]
+
+    def flush(self) -> bool:
+        """
+        Write queued and buffered actions.
+
+        Returns:
+            True if successful (or nothing pending), False otherwise
+        """
+        if not self.enabled:
+            return True
+        self._drain_write_queue()
+        with self._lock:
+            return not self._write_pending()
+
+    def _drain_write_queue(self):
+        """Wait until the background writer has committed everything queued"""
+        if self._write_q is not None:
+            self._write_q.join()
+
+    def _writer_loop(self):
+        """Background writer: commit queued actions in batches until stopped"""
+        while True:
+            batch = [self._write_q.get()]
+            while len(batch) < ACTION_BATCH_SIZE:
+                try:
+                    batch.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
 
-    def _link_to_previous_action(self, action_id: str, task_id: str, agent: str, reasoning: str):
-        """Link current action to previous action in workflow"""
+            entries = [entry for entry in batch if entry is not None]
+            if entries:
+                with self._lock:
+                    self._pending_actions.extend(entries)
+                    self._write_pending()
+            for _ in batch:
+                self._write_q.task_done()
+            if len(entries) < len(batch):
+                return  # None is the stop sentinel from close()
+
+    def _write_pending(self) -> set:
+        """
+        Write buffered actions (caller holds self._lock). The whole batch goes
+        in one transaction; if that fails, each action is retried on its own so
+        a bad row loses only itself.
+
+        Returns:
+            action_ids that could not be written (empty if all succeeded)
+        """
+        if not self._pending_actions:
+            return set()
+
+        pending, self._pending_actions = self._pending_actions, []
         try:
-            # Find most recent action in this task (before current)
-            result = self.conn.execute("""
-                MATCH (prev:AgentAction)-[:PART_OF]->(t:Task {task_id: $task_id})
-                WHERE prev.action_id != $action_id
-                RETURN prev.action_id, prev.agent, prev.created_at
-                ORDER BY prev.created_at DESC
-                LIMIT 1
-            """, {
-                "task_id": task_id,
-                "action_id": action_id
-            })
+            self._write_entries(pending)
+            return set()
+        except Exception as e:
+            if len(pending) == 1:
+                self._log_write_error(e)
+                return {pending[0][0]["action_id"]}
+            logger.warning(f"[KùzuMemory] Batch of {len(pending)} actions failed ({e}); retrying one by one")
 
-            prev_actions = result.get_as_df()
-
-            if not prev_actions.empty:
-                prev_action_id = prev_actions.iloc[0]['prev.action_id']
-                prev_agent = prev_actions.iloc[0]['prev.agent']
-
-                # Create causal link
-                self.conn.execute("""
-                    MATCH (prev:AgentAction {action_id: $prev_id}),
-                          (curr:AgentAction {action_id: $curr_id})
-                    CREATE (prev)-[:LEADS_TO {
-                        causal_reasoning: $reasoning
-                    }]->(curr)
-                """, {
-                    "prev_id": prev_action_id,
-                    "curr_id": action_id,
-                    "reasoning": f"{agent} builds on {prev_agent}'s output: {reasoning[:200]}"
-                })
+        failed = set()
+        for entry in pending:
+            try:
+                self._write_entries([entry])
+            except Exception as e:
+                self._log_write_error(e)
+                failed.add(entry[0]["action_id"])
+        return failed
+
+    def _write_entries(self, entries: List[tuple]):
+        """
+        Write pending-action entries in one transaction: nodes, PART_OF and
+        LEADS_TO edges are each one UNWIND statement. Raises on failure, after
+        rolling back.
+        """
+        rows = [row for row, _, _, _ in entries]
+
+        # Chain each action to the one before it in its task: earlier rows
+        # of this batch or actions written by this process are known in
+        # memory; only a task's first action after a restart asks the graph
+        links = []
+        last_in_batch: Dict[str, tuple] = {}
+        for row, link_to_previous, agent, reasoning in entries:
+            task_id = row["task_id"]
+            if link_to_previous:
+                prev = (last_in_batch.get(task_id)
+                        or self._last_action_per_task.get(task_id)
+                        or self._find_previous_action(task_id))
+                if prev:
+                    prev_action_id, prev_agent = prev
+                    links.append({
+                        "prev_id": prev_action_id,
+                        "curr_id": row["action_id"],
+                        "reasoning": f"{agent} builds on {prev_agent}'s output: {reasoning[:200]}"
+                    })
+            last_in_batch[task_id] = (row["action_id"], agent)
+
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            # Create action nodes, link them to their task, then link
+            # each to the previous action (creates melodic line)
+            self._execute(_CYPHER_ADD_ACTIONS, {"rows": rows})
+            self._execute(_CYPHER_LINK_PART_OF, {"rows": rows})
+            if links:
+                self._execute(_CYPHER_LINK_LEADS_TO, {"links": links})
+
+            self.conn.execute("COMMIT")
+        except Exception:
+            try:
+                self.conn.execute("ROLLBACK")
+            except RuntimeError:
+                pass  # Kùzu already rolled back after the failed statement
+            raise
+        self._last_action_per_task.update(last_in_batch)
+
+    @staticmethod
+    def _log_write_error(error: Exception):
+        """Log a failed action write (called from the except block)"""
+        # Tracebacks only in debug: a flapping DB would otherwise flood the log
+        logger.error(f"[KùzuMemory] Error adding action: {error}",
+                     exc_info=logger.isEnabledFor(logging.DEBUG))
+
+    def _new_action_id(self, task_id: str, agent: str) -> str:
+        """Action id from task, agent and ms clock; repeats within a ms get a suffix"""
+        now_ms = int(time.time() * 1000)
+        action_id = f"{task_id}_{agent}_{now_ms}"
+        with self._id_lock:
+            if now_ms != self._id_ms:
+                self._id_ms = now_ms
+                self._id_counts.clear()
+            seen = self._id_counts.get(action_id, 0)
+            self._id_counts[action_id] = seen + 1
+        return f"{action_id}_{seen}" if seen else action_id
+
+    def _find_previous_action(self, task_id: str) -> Optional[tuple]:
+        """Most recent stored action in a task, as (action_id, agent)"""
+        try:
+            result = self._execute(_CYPHER_PREVIOUS_ACTION, {"task_id": task_id})
+            if result.has_next():
+                prev_action_id, prev_agent, _ = result.get_next()
+                return prev_action_id, prev_agent
         except Exception as e:
             logger.error(f"[KùzuMemory] Error linking actions: {e}")
+        return None
 
     def get_context_for_agent(self, task_id: str, agent: str, max_tokens: int = 4000) -> str:
         """
@@ -326,46 +673,73 @@ class SharedWorkflowMemory:
         """
         if not self.enabled:
             return ""
+        self.flush()
+
+        # The context depends only on the task's actions, so it stays valid
+        # until another action is written to the task (by us: new key; by
+        # anyone else: at most CONTEXT_CACHE_TTL later)
+        with self._lock:
+            last_action = self._last_action_per_task.get(task_id)
+            cache_key = (task_id, max_tokens, last_action[0] if last_action else None)
+            cached = self._ctx_cache.get(cache_key)
+            if cached is not None and time.monotonic() - cached[0] < CONTEXT_CACHE_TTL:
+                self._ctx_cache.move_to_end(cache_key)
+                return cached[1]
 
         try:
-            # Get all previous actions in this task, ordered by time
-            result = self.conn.execute("""
-                MATCH (a:AgentAction)-[:PART_OF]->(t:Task {task_id: $task_id})
-                RETURN a.agent, a.action_type, a.output_data, a.reasoning, a.created_at
-                ORDER BY a.created_at ASC
-            """, {"task_id": task_id})
-
-            actions = result.get_as_df()
+            # Newest actions first, capped at what the token budget could hold;
+            # only the 200-char output preview (+1 to detect overflow) is shipped
+            row_budget = max(1, int(max_tokens) // CONTEXT_TOKENS_PER_ROW)
+            result = self._execute(_CYPHER_GET_CONTEXT % (row_budget + 1), {"task_id": task_id})
 
-            if actions.empty:
+            if not result.has_next():
+                self._cache_context(cache_key, "")
                 return ""
 
-            # Format as context
-            context_parts = ["[MELODIC LINE - Previous agent reasoning]"]
+            # Walk back from the newest action until the budget is spent
+            entries = []
             current_tokens = 0
+            truncated = False
 
-            for _, row in actions.iterrows():
-                agent_name = row['a.agent']
-                reasoning = row['a.reasoning']
-                output_preview = row['a.output_data'][:200] + "..." if len(row['a.output_data']) > 200 else row['a.output_data']
+            while result.has_next():
+                if len(entries) == row_budget:
+                    truncated = True
+                    break
+                agent_name, _, output_data, reasoning, _ = result.get_next()
+                output_preview = output_data[:200] + "..." if len(output_data) > 200 else output_data
 
                 entry = f"\n{agent_name.upper()}: {reasoning}\n  Output: {output_preview}"
                 entry_tokens = len(entry) // 4  # Rough estimate
 
                 if current_tokens + entry_tokens > max_tokens:
-                    context_parts.append("\n... (earlier actions truncated)")
+                    truncated = True
                     break
 
-                context_parts.append(entry)
+                entries.append(entry)
                 current_tokens += entry_tokens
 
+            # Format as context, oldest first
+            context_parts = ["[MELODIC LINE - Previous agent reasoning]"]
+            if truncated:
+                context_parts.append("\n... (earlier actions truncated)")
+            context_parts.extend(reversed(entries))
             context_parts.append("\n[END MELODIC LINE]\n")
 
-            return "\n".join(context_parts)
+            context = "\n".join(context_parts)
+            self._cache_context(cache_key, context)
+            return context
         except Exception as e:
             logger.error(f"[KùzuMemory] Error getting context: {e}")
             return ""
 
+    def _cache_context(self, cache_key: tuple, context: str):
+        """Store a formatted context, evicting the least recently used"""
+        with self._lock:
+            self._ctx_cache[cache_key] = (time.monotonic(), context)
+            self._ctx_cache.move_to_end(cache_key)
+            if len(self._ctx_cache) > CONTEXT_CACHE_SIZE:
+                self._ctx_cache.popitem(last=False)
+
     def get_melodic_line(self, task_id: str) -> List[Dict[str, Any]]:
         """
         Get the complete melodic line (reasoning chain) for a task.
@@ -375,38 +749,24 @@ class SharedWorkflowMemory:
         """
         if not self.enabled:
             return []
+        self.flush()
 
         try:
-            result = self.conn.execute("""
-                MATCH path = (start:AgentAction)-[:LEADS_TO*0..20]->(end:AgentAction)
-                WHERE start.task_id = $task_id
-                WITH path, length(path) AS depth
-                ORDER BY depth DESC
-                LIMIT 1
-                UNWIND nodes(path) AS node
-                RETURN node.agent AS agent,
-                       node.action_type AS action_type,
-                       node.reasoning AS reasoning,
-                       node.output_data AS output,
-                       node.created_at AS timestamp
-                ORDER BY node.created_at ASC
-            """, {"task_id": task_id})
-
-            df = result.get_as_df()
-
-            if df.empty:
-                return []
-
-            return [
-                {
-                    "agent": row['agent'],
-                    "action_type": row['action_type'],
-                    "reasoning": row['reasoning'],
-                    "output": row['output'],
-                    "timestamp": row['timestamp']
-                }
-                for _, row in df.iterrows()
-            ]
+            # Actions carry task_id and created_at, so the line is one ordered
+            # scan; LEADS_TO edges are kept for auditing, not traversed here
+            result = self._execute(_CYPHER_MELODIC_LINE, {"task_id": task_id})
+
+            melodic_line = []
+            while result.has_next():
+                agent_name, action_type, reasoning, output, timestamp = result.get_next()
+                melodic_line.append({
+                    "agent": agent_name,
+                    "action_type": action_type,
+                    "reasoning": reasoning,
+                    "output": output,
+                    "timestamp": timestamp
+                })
+            return melodic_line
         except Exception as e:
             logger.error(f"[KùzuMemory] Error getting melodic line: {e}")
             return []
@@ -427,38 +787,24 @@ class SharedWorkflowMemory:
         """
         if not self.enabled:
             return ""
+        self.flush()
 
         try:
             # Get recent actions from other agents (swarm members)
-            query = """
-                MATCH (a:AgentAction)-[:PART_OF]->(t:Task {task_id: $task_id})
-                WHERE a.action_type = 'swarm_code'
-            """
-
-            if exclude_agent:
-                query += " AND a.agent != $exclude_agent"
-
-            query += """
-                RETURN a.agent, a.reasoning, a.output_data, a.created_at
-                ORDER BY a.created_at DESC
-                LIMIT $limit
-            """
-
-            params = {"task_id": task_id, "limit": limit}
-            if exclude_agent:
-                params["exclude_agent"] = exclude_agent
-
-            result = self.conn.execute(query, params)
-            df = result.get_as_df()
+            result = self._execute(_CYPHER_SWARM_INSIGHTS % max(0, int(limit)), {
+                "task_id": task_id,
+                "exclude_agent": exclude_agent or ""
+            })
 
-            if df.empty:
+            if not result.has_next():
                 return "No other swarm members have contributed yet."
 
             insights = ["[SWARM INSIGHTS - What other coders discovered]"]
 
-            for _, row in df.iterrows():
-                insights.append(f"\n{row['a.agent']}: {row['a.reasoning']}")
-                insights.append(f"  Approach: {row['a.output_data'][:150]}...")
+            while result.has_next():
+                agent_name, reasoning, output_data, _ = result.get_next()
+                insights.append(f"\n{agent_name}: {reasoning}")
+                insights.append(f"  Approach: {output_data[:150]}...")
 
             insights.append("\n[Build on these insights or propose a better approach]")
 
@@ -478,15 +824,10 @@ class SharedWorkflowMemory:
         """
         if not self.enabled:
             return
+        self.flush()
 
         try:
-            self.conn.execute("""
-                MATCH (a1:AgentAction {action_id: $id1}),
-                      (a2:AgentAction {action_id: $id2})
-                CREATE (a1)-[:COORDINATES_WITH {
-                    collaboration_type: $collab_type
-                }]->(a2)
-            """, {
+            self._execute(_CYPHER_ADD_COORDINATION, {
                 "id1": action_id_1,
                 "id2": action_id_2,
                 "collab_type": collaboration_type
@@ -500,10 +841,7 @@ class SharedWorkflowMemory:
             return
 
         try:
-            self.conn.execute("""
-                MATCH (t:Task {task_id: $task_id})
-                SET t.status = $status
-            """, {"task_id": task_id, "status": status})
+            self._execute(_CYPHER_UPDATE_TASK_STATUS, {"task_id": task_id, "status": status})
         except Exception as e:
             logger.error(f"[KùzuMemory] Error updating task status: {e}")
 
@@ -511,23 +849,19 @@ class SharedWorkflowMemory:
         """Get workflow memory statistics"""
         if not self.enabled:
             return {"enabled": False}
+        self.flush()
 
         try:
-            # Count nodes
-            tasks = self.conn.execute("MATCH (t:Task) RETURN count(t) AS count").get_as_df()
-            actions = self.conn.execute("MATCH (a:AgentAction) RETURN count(a) AS count").get_as_df()
-
-            # Count relationships
-            leads_to = self.conn.execute("MATCH ()-[r:LEADS_TO]->() RETURN count(r) AS count").get_as_df()
-            coords = self.conn.execute("MATCH ()-[r:COORDINATES_WITH]->() RETURN count(r) AS count").get_as_df()
+            # Count nodes and relationships
+            tasks, actions, leads_to, coords = self._execute(_CYPHER_STATS).get_next()
 
             return {
                 "enabled": True,
                 "db_path": self.db_path,
-                "total_tasks": int(tasks.iloc[0]['count']),
-                "total_actions": int(actions.iloc[0]['count']),
-                "melodic_line_links": int(leads_to.iloc[0]['count']),
-                "swarm_coordination_links": int(coords.iloc[0]['count'])
+                "total_tasks": int(tasks),
+                "total_actions": int(actions),
+                "melodic_line_links": int(leads_to),
+                "swarm_coordination_links": int(coords)
             }
         except Exception as e:
             logger.error(f"[KùzuMemory] Error getting stats: {e}")
@@ -536,7 +870,15 @@ class SharedWorkflowMemory:
     def close(self):
         """Close database connection"""
         if self.enabled and self.db:
+            self.flush()
+            if self._writer is not None:
+                self._write_q.put(None)
+                self._writer.join()
+                self._writer = None
+                self._write_q = None
             try:
+                # Fold the WAL into the database files (deferred when durability="low")
+                self._execute("CHECKPOINT")
                 # Kùzu auto-closes, but explicit close is good practice
                 self.conn = None
                 self.db = None
@@ -4,52 +4,129 @@ MCP Client Wrapper for EE World Model
 Provides MCP interface that CodebaseWorldModel expects
 """
 
+import asyncio
+import concurrent.futures
 import httpx
+import json
 import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Dict, Optional
 import os
 
 logger = logging.getLogger(__name__)
 
+# read_file results are reused for this long within an agent run (seconds)
+READ_FILE_CACHE_TTL = 30.0
+READ_FILE_CACHE_SIZE = 256
+
+# Upper bound on a synchronous wrapper call (seconds); httpx's own 30s
+# timeout applies per connect/read, so a whole call can take longer
+SYNC_CALL_TIMEOUT = 60.0
+
+# One long-lived event loop on a daemon thread runs the sync wrappers of
+# every MCPClientWrapper, so they work from inside a running loop and their
+# pooled clients survive across calls
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_loop_lock = threading.Lock()
+
+
+def _get_shared_loop() -> asyncio.AbstractEventLoop:
+    """Start the shared background loop on first use"""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None or _shared_loop.is_closed():
+            _shared_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_shared_loop.run_forever, name="mcp-client-wrapper", daemon=True
+            ).start()
+        return _shared_loop
+
+
+def _close_client_from_other_loop(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+    """Close a pooled client whose connections belong to `loop`, not the running one"""
+    if loop.is_running() and not loop.is_closed():
+        # The connections are bound to that loop, so aclose() has to run there
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    
+    # A stopped or closed loop can't run aclose(); shut the pooled sockets
+    # down directly so the server's side is released now rather than at GC
+    pool = getattr(client._transport, "_pool", None)
+    for connection in list(getattr(pool, "connections", ())):
+        stream = getattr(getattr(connection, "_connection", None), "_network_stream", None)
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
 
 class MCPClientWrapper:
     """Wrapper to make MCP server accessible to EE World Model"""
     
     def __init__(self, mcp_url: str = None):
         self.mcp_url = mcp_url or os.getenv("MCP_CODEBASE_URL", "http://localhost:9001")
-        self._cache = {}
+        # file_path -> (fetched_at, content), least recently used first
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Pooled client, reused across calls (keep-alive); bound to the loop
+        # that created it, since httpx connections cannot cross event loops
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Pooled client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            if self._client is not None:
+                _close_client_from_other_loop(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(
+                base_url=self.mcp_url,
+                timeout=30.0,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+            )
+            self._client_loop = loop
+        return self._client
     
     async def _query_mcp(self, tool: str, args: Dict) -> str:
         """Query MCP server"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.mcp_url}/api/mcp/tool",
-                    json={"tool": tool, "args": args}
-                )
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("result", "")
-                return ""
+            response = await self._get_client().post(
+                "/api/mcp/tool",
+                json={"tool": tool, "args": args}
+            )
+            if response.status_code == 200:
+                result = response.json()
+                return result.get("result", "")
+            return ""
         except (httpx.HTTPError, httpx.TimeoutException, ConnectionError) as e:
             logger.error(f"[MCP Wrapper] Error: {e}")
             return ""
     
-    def analyze_codebase(self) -> Dict:
-        """Get codebase structure (synchronous wrapper)"""
-        import asyncio
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(self._query_mcp("analyze_codebase", {}))
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def analyze_codebase_async(self) -> Dict:
+        """Get codebase structure"""
+        result = await self._query_mcp("analyze_codebase", {})
         
         # Parse result if it's JSON string
         if isinstance(result, str):
             try:
-                import json
                 return json.loads(result)
             except (json.JSONDecodeError, ValueError, TypeError):
                 # Return as dict with key_files
@@ -59,17 +136,56 @@ class MCPClientWrapper:
                 }
         return result if isinstance(result, dict) else {}
     
+    async def read_file_async(self, file_path: str) -> str:
+        """Read file from codebase (cached for READ_FILE_CACHE_TTL seconds)"""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(file_path)
+            if entry is not None and now - entry[0] < READ_FILE_CACHE_TTL:
+                self._cache.move_to_end(file_path)
+                return entry[1]
+        
+        result = await self._query_mcp("read_file", {"path": file_path})
+        content = result if isinstance(result, str) else ""
+        
+        # Empty means missing or failed; don't pin that for the TTL
+        if content:
+            with self._cache_lock:
+                self._cache[file_path] = (now, content)
+                self._cache.move_to_end(file_path)
+                if len(self._cache) > READ_FILE_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return content
+    
+    def invalidate_cache(self):
+        """Drop cached file contents (e.g. after the codebase changes)"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def _run(self, coro, default):
+        """Run a coroutine on the shared background loop and wait for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, _get_shared_loop())
+        try:
+            return future.result(timeout=SYNC_CALL_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logger.error(f"[MCP Wrapper] Error: call timed out after {SYNC_CALL_TIMEOUT}s")
+            return default
+    
+    def analyze_codebase(self) -> Dict:
+        """Get codebase structure (synchronous wrapper)"""
+        return self._run(self.analyze_codebase_async(), {})
+    
     def read_file(self, file_path: str) -> str:
         """Read file from codebase (synchronous wrapper)"""
-        import asyncio
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(self._query_mcp("read_file", {"path": file_path}))
-        return result if isinstance(result, str) else ""
+        return self._run(self.read_file_async(file_path), "")
+    
+    def close(self):
+        """Close the pooled client used by the sync wrappers"""
+        if self._client_loop is _shared_loop and _shared_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.aclose(), _shared_loop).result(
+                timeout=SYNC_CALL_TIMEOUT
+            )
     
     def list_files(self, codebase_path: str) -> List[str]:
         """List all files in codebase"""
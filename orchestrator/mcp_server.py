@@ -15,78 +15,510 @@ If RAG index doesn't exist, tools simply won't appear in /api/mcp/tools list.
 """
 
 import os
+import copy
+import codecs
+import asyncio
 import json
+import time
 import subprocess
 import re
 import logging
+import mmap
+import stat
+import threading
+import warnings
 
 logger = logging.getLogger(__name__)
 import ast
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from typing import Optional, Dict, Any, List, Tuple, Iterator, AsyncIterator, Union
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
+try:
+    import diskcache  # persistent tool-result cache shared across restarts
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+try:
+    import orjson  # Rust JSON encoder for large analyze_codebase payloads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import re2  # google-re2: linear-time DFA matching for the find_references scan
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+try:
+    from tree_sitter_languages import get_language, get_parser  # C parsers for read_file chunking
+    TREE_SITTER_AVAILABLE = True
+except ImportError:
+    TREE_SITTER_AVAILABLE = False
+
 # Maximum file size before chunking (in characters)
 MAX_FILE_SIZE_FOR_CHUNKING = 5000
 
-app = FastAPI(title="MCP Codebase Server", version="1.0.0")
+# Seconds an analyze_codebase result is reused while the tree signature is unchanged
+ANALYZE_CACHE_TTL = 30.0
+
+# Lowercased file extension (no dot) -> language name
+EXTENSION_TO_LANGUAGE = {
+    'ts': 'TypeScript',
+    'tsx': 'TypeScript (React)',
+    'js': 'JavaScript',
+    'jsx': 'JavaScript (React)',
+    'py': 'Python',
+    'java': 'Java',
+    'c': 'C',
+    'cpp': 'C++',
+    'cc': 'C++',
+    'cxx': 'C++',
+    'cs': 'C#',
+    'go': 'Go',
+    'rs': 'Rust',
+    'php': 'PHP',
+    'rb': 'Ruby',
+    'swift': 'Swift',
+    'kt': 'Kotlin',
+    'scala': 'Scala',
+    'html': 'HTML',
+    'css': 'CSS',
+    'scss': 'SCSS',
+    'less': 'Less',
+    'json': 'JSON',
+    'md': 'Markdown',
+    'yml': 'YAML',
+    'yaml': 'YAML',
+    'xml': 'XML',
+    'sql': 'SQL',
+    'sh': 'Shell',
+    'bash': 'Bash',
+    'zsh': 'Zsh',
+    'bat': 'Batch',
+    'ps1': 'PowerShell',
+    'r': 'R',
+    'm': 'Objective-C',
+    'mm': 'Objective-C++',
+    'vue': 'Vue',
+    'svelte': 'Svelte'
+}
+
+# Extensions _extract_dependencies understands; other code files only need a line count
+DEPENDENCY_EXTENSIONS = frozenset({'py', 'js', 'jsx', 'ts', 'tsx', 'java', 'rb'})
+
+# Read size for byte-level line counting
+LINE_COUNT_CHUNK_SIZE = 65536
+
+# Manifests, entry points and docs reported as key_files by analyze_codebase
+KEY_FILES = frozenset({
+    'README.md', 'pyproject.toml', 'setup.py', 'setup.cfg', 'requirements.txt',
+    'package.json', 'tsconfig.json', 'go.mod', 'Cargo.toml', 'pom.xml', 'build.gradle',
+    'Gemfile', 'Makefile', 'Dockerfile', 'docker-compose.yml', '.maker.json',
+    'main.py', 'app.py', '__main__.py', 'index.js', 'index.ts', 'main.go', 'main.rs'
+})
+
+# File types find_references searches
+REFERENCE_EXTENSIONS = frozenset({'.py', '.js', '.ts', '.tsx', '.jsx', '.md'})
+
+# Below this many candidate files find_references scans serially (pool startup dominates)
+PARALLEL_SCAN_MIN_FILES = 8
+
+# Seconds a `git ls-files` listing is reused by _iter_files
+GIT_FILES_CACHE_TTL = 60.0
+
+# Persistent cache for find_references / analyze_codebase results (needs diskcache);
+# per-user so one user's entries are never served to (or written by) another
+DISK_CACHE_DIR = os.getenv("MCP_CACHE_DIR") or os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "mcp_cache"
+)
+DISK_CACHE_SIZE_LIMIT = 256 * 1024 * 1024
+
+# Part of every disk cache key; bump when a cached tool's output format changes
+DISK_CACHE_VERSION = 1
+
+# Seconds a clean-checkout HEAD sha is reused when keying the disk cache
+GIT_STATE_TTL = 2.0
+
+# Files at least this large are memory-mapped instead of read into a buffer
+MMAP_MIN_SIZE = 256 * 1024
+
+# Word tokens for the search_docs index
+_WORD_RE = re.compile(r'\w+')
+
+# Seconds a test run may take before it is killed
+RUN_TESTS_TIMEOUT = 30
+
+# Read size for streamed test output
+STREAM_CHUNK_SIZE = 65536
+
+# Python files whose symbol index find_references keeps (keyed by path, mtime, size)
+PYTHON_INDEX_CACHE_SIZE = 4096
+
+# Files whose read_file chunks are kept (keyed by path, mtime, size)
+CHUNK_CACHE_SIZE = 256
+
+# Suffix -> (tree-sitter language, query) for read_file chunking; capture names are chunk types
+TREE_SITTER_CHUNK_QUERIES = {
+    '.py': ('python', '(function_definition) @function (class_definition) @class'),
+    '.js': ('javascript', '(function_declaration) @function (method_definition) @function (class_declaration) @class'),
+    '.jsx': ('javascript', '(function_declaration) @function (method_definition) @function (class_declaration) @class'),
+    '.ts': ('typescript', '(function_declaration) @function (method_definition) @function '
+                          '(class_declaration) @class (interface_declaration) @class'),
+    '.tsx': ('tsx', '(function_declaration) @function (method_definition) @function '
+                    '(class_declaration) @class (interface_declaration) @class'),
+    '.go': ('go', '(function_declaration) @function (method_declaration) @function (type_spec) @class'),
+    '.rs': ('rust', '(function_item) @function (struct_item) @class (enum_item) @class '
+                    '(trait_item) @class (impl_item) @class'),
+}
+
+
+
+@lru_cache(maxsize=2048)
+def _compile_symbol_patterns(symbol: str) -> Tuple[re.Pattern, re.Pattern]:
+    """
+    Compiled (reference, definition) word-boundary patterns for a symbol.
+    
+    The reference pattern scans whole files, so it uses RE2 when installed.
+    RE2's \\b is ASCII-only, so non-ASCII symbols stay on stdlib re. The
+    definition pattern only runs on matched lines and always uses re.
+    """
+    escaped = re.escape(symbol)
+    backend = re2 if RE2_AVAILABLE and symbol.isascii() else re
+    return (
+        backend.compile(r'\b' + escaped + r'\b'),
+        re.compile(r'\b(function|class|const|let|var)\s+' + escaped + r'\b'),
+    )
+
+
+class _GitFileEntry:
+    """os.DirEntry stand-in for files listed by `git ls-files` (stat cached on first use)"""
+    
+    __slots__ = ('path', 'name', '_stat')
+    
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self._stat = None
+    
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+_MISSING = object()
+
+
+def _cached_by_git_sha(tool_name: str):
+    """
+    Persist a CodebaseMCPServer method's result keyed by (tool, cache version,
+    server settings, root, HEAD sha, args).
+    
+    Only used for clean checkouts: with uncommitted or untracked changes the
+    sha doesn't describe the files, so the method runs uncached.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args):
+            cache = self._disk_cache
+            sha = self._clean_head_sha() if cache is not None else None
+            if sha is None:
+                return method(self, *args)
+            
+            key = (tool_name, DISK_CACHE_VERSION, self._settings_key, self.root_str, sha, args)
+            try:
+                result = cache.get(key, _MISSING)
+            except Exception as e:
+                logger.debug(f"Disk cache read failed for {tool_name}: {e}")
+                result = _MISSING
+            if result is not _MISSING:
+                return result
+            
+            result = method(self, *args)
+            try:
+                cache[key] = result
+            except Exception as e:
+                logger.debug(f"Disk cache write failed for {tool_name}: {e}")
+            return result
+        return wrapper
+    return decorator
+
+
+_DEFINITION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Node type -> chunk_type for _chunk_python_file
+_CHUNK_NODE_TYPES = {ast.FunctionDef: 'function', ast.AsyncFunctionDef: 'function', ast.ClassDef: 'class'}
+
+
+@lru_cache(maxsize=None)
+def _tree_sitter_chunker(suffix: str):
+    """(parser, compiled query) for a file suffix, built once; None if unsupported"""
+    spec = TREE_SITTER_CHUNK_QUERIES.get(suffix)
+    if not TREE_SITTER_AVAILABLE or spec is None:
+        return None
+    language_name, query = spec
+    try:
+        with warnings.catch_warnings():
+            # tree_sitter_languages still loads grammars through a deprecated API
+            warnings.simplefilter('ignore', FutureWarning)
+            language = get_language(language_name)
+            return get_parser(language_name), language.query(query)
+    except Exception as e:
+        logger.debug(f"tree-sitter chunking unavailable for {suffix}: {e}")
+        return None
+
+
+def _block_chunks(lines: List[str], chunk_size: int = 100) -> List[Dict[str, Any]]:
+    """Fixed-size line blocks, for files that can't be parsed"""
+    chunks = []
+    for i in range(0, len(lines), chunk_size):
+        chunk_lines = lines[i:i+chunk_size]
+        chunks.append({
+            'text': '\n'.join(chunk_lines),
+            'start_line': i + 1,
+            'end_line': min(i + chunk_size, len(lines)),
+            'chunk_type': 'block',
+            'name': f'block_{i//chunk_size + 1}'
+        })
+    return chunks
+
+
+def _module_chunk(content: str, lines: List[str]) -> Dict[str, Any]:
+    """Single chunk for a file with no functions or classes"""
+    return {
+        'text': content[:MAX_FILE_SIZE_FOR_CHUNKING],
+        'start_line': 1,
+        'end_line': len(lines),
+        'chunk_type': 'module',
+        'name': 'module'
+    }
+
+
+def _build_symbol_index(tree: ast.AST) -> Dict[str, List[Tuple[int, str]]]:
+    """Collect every name, attribute and def/class in one ast.walk pass, keyed by name"""
+    index: Dict[str, List[Tuple[int, str]]] = {}
+    for node in ast.walk(tree):
+        # Exact type checks: cheaper than isinstance in this loop, and the
+        # AST node classes are never subclassed
+        t = type(node)
+        if t is ast.Name:
+            index.setdefault(node.id, []).append((node.lineno, "name"))
+        elif t is ast.Attribute:
+            index.setdefault(node.attr, []).append((node.lineno, "attribute"))
+        elif t in _DEFINITION_NODES:
+            index.setdefault(node.name, []).append((node.lineno, "definition"))
+    # ast.walk is breadth-first; report each symbol in source order
+    for refs in index.values():
+        refs.sort(key=lambda ref: ref[0])
+    return index
+
+
+# Dependency extraction patterns, compiled once
+_PY_IMPORT_RE = re.compile(r'^\s*(?:import\s+(\S+)|from\s+(\S+)\s+import)', re.MULTILINE)
+_ES_IMPORT_RE = re.compile(r"import\s+(?:[\w\s{},*]*\s+from\s+)?['\"]([^'\"]+)['\"]", re.MULTILINE)
+_CJS_REQUIRE_RE = re.compile(r"(?:const|let|var)\s+(?:[\w\s{},*]*)\s*=\s*require\s*\(\s*['\"]([^'\"]+)['\"]\s*\)", re.MULTILINE)
+_JAVA_IMPORT_RE = re.compile(r'^\s*import\s+([^;]+);', re.MULTILINE)
+_RB_REQUIRE_RE = re.compile(r"^\s*require\s+['\"]([^'\"]+)['\"]", re.MULTILINE)
+
+# Top-level Python modules treated as internal (stdlib plus the server's own stack)
+_PY_STDLIB = frozenset({
+    'os', 'sys', 're', 'math', 'datetime', 'time', 'random', 'json', 'csv',
+    'collections', 'itertools', 'functools', 'pathlib', 'shutil', 'glob',
+    'pickle', 'urllib', 'http', 'logging', 'argparse', 'unittest', 'subprocess',
+    'threading', 'multiprocessing', 'typing', 'enum', 'io', 'tempfile', 'asyncio',
+    'httpx', 'fastapi', 'pydantic', 'redis'
+})
+
+
+def _py_dependencies(content: str, source: str) -> List[Dict[str, Any]]:
+    dependencies = []
+    for match in _PY_IMPORT_RE.finditer(content):
+        import_path = match.group(1) or match.group(2)
+        if import_path:
+            module_name = import_path.split('.')[0]
+            dependencies.append({
+                'name': module_name,
+                'type': 'import',
+                'source': source,
+                'import_path': import_path,
+                'is_external': not import_path.startswith('.') and module_name not in _PY_STDLIB
+            })
+    return dependencies
+
+
+def _js_dependencies(content: str, source: str) -> List[Dict[str, Any]]:
+    dependencies = []
+    # ES module imports. Each pattern needs its keyword literally, so a
+    # substring check skips a pass the file can't match (usually CommonJS)
+    for match in (_ES_IMPORT_RE.finditer(content) if 'import' in content else ()):
+        import_path = match.group(1)
+        dependencies.append({
+            'name': import_path.split('/')[0].lstrip('@'),
+            'type': 'import',
+            'source': source,
+            'import_path': import_path,
+            'is_external': not (import_path.startswith('.') or import_path.startswith('/'))
+        })
+    # CommonJS requires
+    for match in (_CJS_REQUIRE_RE.finditer(content) if 'require' in content else ()):
+        import_path = match.group(1)
+        dependencies.append({
+            'name': import_path.split('/')[0],
+            'type': 'require',
+            'source': source,
+            'import_path': import_path,
+            'is_external': not (import_path.startswith('.') or import_path.startswith('/'))
+        })
+    return dependencies
+
+
+def _java_dependencies(content: str, source: str) -> List[Dict[str, Any]]:
+    return [
+        {
+            'name': match.group(1).split('.')[0],
+            'type': 'import',
+            'source': source,
+            'import_path': match.group(1),
+            'is_external': True
+        }
+        for match in _JAVA_IMPORT_RE.finditer(content)
+    ]
+
+
+def _rb_dependencies(content: str, source: str) -> List[Dict[str, Any]]:
+    return [
+        {
+            'name': match.group(1),
+            'type': 'require',
+            'source': source,
+            'import_path': match.group(1),
+            'is_external': True
+        }
+        for match in _RB_REQUIRE_RE.finditer(content)
+    ]
+
+
+# Lowercased extension -> extractor(content, source) used by _extract_dependencies
+_DEPENDENCY_EXTRACTORS = {
+    'py': _py_dependencies,
+    'js': _js_dependencies,
+    'jsx': _js_dependencies,
+    'ts': _js_dependencies,
+    'tsx': _js_dependencies,
+    'java': _java_dependencies,
+    'rb': _rb_dependencies,
+}
+
+
+# ORJSONResponse needs orjson at render time; fall back to stdlib json without it
+_JSONResponse = ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+
+app = FastAPI(title="MCP Codebase Server", version="1.0.0", default_response_class=_JSONResponse)
 
 class CodebaseMCPServer:
     def __init__(self, codebase_root: str, redis_client=None):
         self.root = Path(codebase_root).resolve()
+        self.root_str = str(self.root)
         self.redis_client = redis_client  # For loading code graph
-        self.excluded = {
+        self.excluded = frozenset({
             '.git', 'node_modules', 'dist', 'build', '__pycache__', '.specify', '.claude',
             'models', '.venv', 'venv', 'env', '.env', 'vendor', 'target', 
             '.docker', 'docker-data', '.cache', '.npm', '.yarn', 'coverage',
             '.idea', '.vscode', '.DS_Store', 'tmp', 'temp', 'logs',
             'weaviate_data', 'redis_data', 'postgres_data'
-        }
+        })
         
-        # Language detection mapping
-        self.EXTENSION_TO_LANGUAGE = {
-            'ts': 'TypeScript',
-            'tsx': 'TypeScript (React)',
-            'js': 'JavaScript',
-            'jsx': 'JavaScript (React)',
-            'py': 'Python',
-            'java': 'Java',
-            'c': 'C',
-            'cpp': 'C++',
-            'cc': 'C++',
-            'cxx': 'C++',
-            'cs': 'C#',
-            'go': 'Go',
-            'rs': 'Rust',
-            'php': 'PHP',
-            'rb': 'Ruby',
-            'swift': 'Swift',
-            'kt': 'Kotlin',
-            'scala': 'Scala',
-            'html': 'HTML',
-            'css': 'CSS',
-            'scss': 'SCSS',
-            'less': 'Less',
-            'json': 'JSON',
-            'md': 'Markdown',
-            'yml': 'YAML',
-            'yaml': 'YAML',
-            'xml': 'XML',
-            'sql': 'SQL',
-            'sh': 'Shell',
-            'bash': 'Bash',
-            'zsh': 'Zsh',
-            'bat': 'Batch',
-            'ps1': 'PowerShell',
-            'r': 'R',
-            'm': 'Objective-C',
-            'mm': 'Objective-C++',
-            'vue': 'Vue',
-            'svelte': 'Svelte'
-        }
+        # (cached_at, tree signature, structure) from the last analyze_codebase walk
+        self._analyze_cache: Optional[Tuple[float, int, Dict[str, Any]]] = None
+        
+        # (checked_at, `git ls-files` paths or None) driving _iter_files
+        self._git_files_cache: Optional[Tuple[float, Optional[List[str]]]] = None
+        
+        # (checked_at, HEAD sha if the checkout is clean else None)
+        self._git_state_cache: Optional[Tuple[float, Optional[str]]] = None
+        
+        # Settings that shape cached results, so disk entries written under
+        # other exclusions or file types are not reused
+        self._settings_key = (tuple(sorted(self.excluded)), tuple(sorted(REFERENCE_EXTENSIONS)))
+        self._disk_cache = None
+        if DISKCACHE_AVAILABLE:
+            try:
+                self._disk_cache = diskcache.Cache(
+                    DISK_CACHE_DIR, size_limit=DISK_CACHE_SIZE_LIMIT,
+                    eviction_policy='least-recently-used'
+                )
+            except Exception as e:
+                logger.warning(f"Disk cache unavailable at {DISK_CACHE_DIR}: {e}")
+        
+        # search_docs index: path -> ((st_mtime_ns, st_size), lowercased text, tokens)
+        # plus token -> paths postings
+        self._docs: Dict[str, Tuple[Tuple[int, int], str, frozenset]] = {}
+        self._doc_postings: Dict[str, set] = {}
+        self._doc_lock = threading.Lock()
+        
+        # path -> ((st_mtime_ns, st_size), symbol index or None on SyntaxError)
+        self._python_index: OrderedDict = OrderedDict()
+        self._python_index_lock = threading.Lock()
+        
+        # path -> ((st_mtime_ns, st_size), read_file chunks)
+        self._file_chunks: OrderedDict = OrderedDict()
+        self._file_chunks_lock = threading.Lock()
         
+        # Language detection mapping (shared module table)
+        self.EXTENSION_TO_LANGUAGE = EXTENSION_TO_LANGUAGE
+        
+    def _chunk_file(self, file_path: Path, content: str) -> List[Dict[str, Any]]:
+        """
+        Chunk a source file respecting function/class boundaries.
+        
+        Uses tree-sitter for the languages in TREE_SITTER_CHUNK_QUERIES when
+        tree_sitter_languages is installed, the ast-based chunker for Python
+        otherwise, and line blocks for anything else.
+        
+        Returns:
+            List of chunks with metadata: [{text, start_line, end_line, chunk_type, name}]
+        """
+        chunker = _tree_sitter_chunker(file_path.suffix)
+        if chunker is not None:
+            chunks = self._chunk_with_tree_sitter(chunker, content)
+            if chunks is not None:
+                return chunks
+        if file_path.suffix == '.py':
+            return self._chunk_python_file(file_path, content)
+        return _block_chunks(content.splitlines())
+    
+    @staticmethod
+    def _chunk_with_tree_sitter(chunker, content: str) -> Optional[List[Dict[str, Any]]]:
+        """Chunks from a tree-sitter parse (None if the source has syntax errors)"""
+        parser, query = chunker
+        tree = parser.parse(content.encode('utf-8'))
+        if tree.root_node.has_error:
+            return None
+        
+        lines = content.splitlines()
+        chunks = []
+        for node, chunk_type in query.captures(tree.root_node):
+            name_node = node.child_by_field_name('name') or node.child_by_field_name('type')
+            start_line = node.start_point[0]  # 0-indexed
+            end_line = node.end_point[0] + 1
+            chunks.append({
+                'text': '\n'.join(lines[start_line:end_line]),
+                'start_line': start_line + 1,  # 1-indexed for display
+                'end_line': end_line,
+                'chunk_type': chunk_type,
+                'name': name_node.text.decode('utf-8', 'replace') if name_node is not None else f'{chunk_type}_{start_line + 1}'
+            })
+        chunks.sort(key=lambda chunk: chunk['start_line'])
+        return chunks or [_module_chunk(content, lines)]
+    
     def _chunk_python_file(self, file_path: Path, content: str) -> List[Dict[str, Any]]:
         """
         Chunk Python file respecting function/class boundaries (semantic-aware chunking).
@@ -99,67 +531,57 @@ class CodebaseMCPServer:
         
         try:
             tree = ast.parse(content, filename=str(file_path))
-            
-            class ChunkVisitor(ast.NodeVisitor):
-                def __init__(self, lines_list):
-                    self.lines = lines_list
-                    self.chunks = []
-                
-                def visit_FunctionDef(self, node):
-                    start_line = node.lineno - 1  # 0-indexed
-                    end_line = node.end_lineno if hasattr(node, 'end_lineno') else node.lineno
-                    chunk_text = '\n'.join(self.lines[start_line:end_line])
-                    self.chunks.append({
-                        'text': chunk_text,
-                        'start_line': start_line + 1,  # 1-indexed for display
-                        'end_line': end_line,
-                        'chunk_type': 'function',
-                        'name': node.name
-                    })
-                    self.generic_visit(node)
-                
-                def visit_ClassDef(self, node):
-                    start_line = node.lineno - 1
-                    end_line = node.end_lineno if hasattr(node, 'end_lineno') else node.lineno
-                    chunk_text = '\n'.join(self.lines[start_line:end_line])
-                    self.chunks.append({
-                        'text': chunk_text,
-                        'start_line': start_line + 1,
-                        'end_line': end_line,
-                        'chunk_type': 'class',
-                        'name': node.name
-                    })
-                    self.generic_visit(node)
-            
-            visitor = ChunkVisitor(lines)
-            visitor.visit(tree)
-            
-            # If no functions/classes found, create module-level chunk
-            if not visitor.chunks:
-                visitor.chunks.append({
-                    'text': content[:MAX_FILE_SIZE_FOR_CHUNKING],
-                    'start_line': 1,
-                    'end_line': len(lines),
-                    'chunk_type': 'module',
-                    'name': 'module'
-                })
-            
-            return visitor.chunks
-            
         except SyntaxError:
             # If AST parsing fails, fall back to line-based chunking
-            chunk_size = 100  # lines per chunk
-            chunks = []
-            for i in range(0, len(lines), chunk_size):
-                chunk_lines = lines[i:i+chunk_size]
-                chunks.append({
-                    'text': '\n'.join(chunk_lines),
-                    'start_line': i + 1,
-                    'end_line': min(i + chunk_size, len(lines)),
-                    'chunk_type': 'block',
-                    'name': f'block_{i//chunk_size + 1}'
-                })
-            return chunks
+            return _block_chunks(lines)
+        
+        # One flat ast.walk pass; sorting by line restores the source
+        # (pre-order) ordering the old NodeVisitor produced
+        for node in ast.walk(tree):
+            chunk_type = _CHUNK_NODE_TYPES.get(type(node))
+            if chunk_type is None:
+                continue
+            start_line = node.lineno - 1  # 0-indexed
+            end_line = node.end_lineno if hasattr(node, 'end_lineno') else node.lineno
+            chunks.append({
+                'text': '\n'.join(lines[start_line:end_line]),
+                'start_line': start_line + 1,  # 1-indexed for display
+                'end_line': end_line,
+                'chunk_type': chunk_type,
+                'name': node.name
+            })
+        chunks.sort(key=lambda chunk: chunk['start_line'])
+        
+        # If no functions/classes found, create module-level chunk
+        return chunks or [_module_chunk(content, lines)]
+    
+    def _chunk_file_cached(self, file_path: Path, content: str, file_stat: os.stat_result) -> List[Dict[str, Any]]:
+        """
+        _chunk_file memoised per file by (mtime_ns, size).
+        
+        Repeated read_file calls on an unchanged file skip the parse. The
+        returned list is shared with the cache and must not be mutated.
+        """
+        key = str(file_path)
+        version = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self._file_chunks_lock:
+            cached = self._file_chunks.get(key)
+            if cached is not None and cached[0] == version:
+                self._file_chunks.move_to_end(key)
+                return cached[1]
+        
+        chunks = self._chunk_file(file_path, content)
+        with self._file_chunks_lock:
+            self._file_chunks[key] = (version, chunks)
+            self._file_chunks.move_to_end(key)
+            while len(self._file_chunks) > CHUNK_CACHE_SIZE:
+                self._file_chunks.popitem(last=False)
+        return chunks
+    
+    @staticmethod
+    def _is_chunkable(suffix: str) -> bool:
+        """Whether read_file splits large files with this suffix into semantic chunks"""
+        return suffix == '.py' or _tree_sitter_chunker(suffix) is not None
     
     def read_file(self, path: str, chunked: Optional[bool] = None) -> str:
         """
@@ -175,13 +597,24 @@ class CodebaseMCPServer:
         file_path = (self.root / path).resolve()
         
         # Security: Ensure path is within codebase
-        if not str(file_path).startswith(str(self.root)):
+        if not file_path.is_relative_to(self.root):
             raise ValueError(f"Path traversal attempt: {path}")
             
         if not file_path.exists():
             return f" File not found: {path}"
             
         try:
+            # Stat before reading so a cached chunking is never keyed newer than its content
+            file_stat = file_path.stat()
+            chunkable = self._is_chunkable(file_path.suffix)
+            if chunked is not False and not chunkable and file_stat.st_size >= MMAP_MIN_SIZE:
+                # Large files we can't chunk are truncated anyway: decode only the
+                # prefix we return instead of copying the whole file
+                with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    size = len(mm)
+                    head = str(mm[:MAX_FILE_SIZE_FOR_CHUNKING * 4], 'utf-8', 'ignore')
+                return f"{head[:MAX_FILE_SIZE_FOR_CHUNKING]}\n\n... (truncated, file too large: {size} bytes)"
+            
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
             
@@ -191,8 +624,8 @@ class CodebaseMCPServer:
             
             # If chunking enabled and file is large, use intelligent chunking
             if should_chunk and len(content) > MAX_FILE_SIZE_FOR_CHUNKING:
-                if file_path.suffix == '.py':
-                    chunks = self._chunk_python_file(file_path, content)
+                if chunkable:
+                    chunks = self._chunk_file_cached(file_path, content, file_stat)
                     # Format chunks for display
                     result = f"File {path} (chunked into {len(chunks)} semantic units):\n\n"
                     for chunk in chunks:
@@ -200,17 +633,34 @@ class CodebaseMCPServer:
                         result += f"{chunk['text']}\n\n"
                     return result
                 else:
-                    # For non-Python files, truncate with note
+                    # For files we can't chunk, truncate with note
                     return f"{content[:MAX_FILE_SIZE_FOR_CHUNKING]}\n\n... (truncated, file too large: {len(content)} chars)"
             
             return content
         except Exception as e:
             return f" Error reading file: {e}"
     
+    @staticmethod
+    def _count_lines(file_path) -> int:
+        """Count lines by scanning raw bytes (no decode, no per-line objects)"""
+        total = 0
+        has_content = False
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(LINE_COUNT_CHUNK_SIZE):
+                total += chunk.count(b'\n')
+                has_content = True
+        # Same convention as the text path: a trailing partial line counts
+        return total + (1 if has_content else 0)
+    
     def _detect_language(self, file_path: Path) -> str:
         """Detect programming language from file extension"""
-        ext = file_path.suffix.lstrip('.')
-        return self.EXTENSION_TO_LANGUAGE.get(ext.lower(), 'Other')
+        return self._detect_language_ext(file_path.suffix[1:])
+    
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _detect_language_ext(ext: str) -> str:
+        """Language for an extension without the dot, in any case (memoised per spelling)"""
+        return EXTENSION_TO_LANGUAGE.get(ext.lower(), 'Other')
     
     def _extract_dependencies(self, content: str, file_path: Path) -> List[Dict[str, Any]]:
         """
@@ -219,94 +669,14 @@ class CodebaseMCPServer:
         Returns:
             List of dependency info dicts: [{name, type, source, import_path, is_external}]
         """
-        dependencies = []
-        ext = file_path.suffix.lstrip('.').lower()
-        
+        extractor = _DEPENDENCY_EXTRACTORS.get(file_path.suffix.lstrip('.').lower())
+        if extractor is None:
+            return []
         try:
-            # Python imports
-            if ext == 'py':
-                import_regex = re.compile(r'^\s*(?:import\s+(\S+)|from\s+(\S+)\s+import)', re.MULTILINE)
-                for match in import_regex.finditer(content):
-                    import_path = match.group(1) or match.group(2)
-                    if import_path:
-                        module_name = import_path.split('.')[0]
-                        is_external = not import_path.startswith('.') and module_name not in [
-                            'os', 'sys', 're', 'math', 'datetime', 'time', 'random', 'json', 'csv',
-                            'collections', 'itertools', 'functools', 'pathlib', 'shutil', 'glob',
-                            'pickle', 'urllib', 'http', 'logging', 'argparse', 'unittest', 'subprocess',
-                            'threading', 'multiprocessing', 'typing', 'enum', 'io', 'tempfile', 'asyncio',
-                            'httpx', 'fastapi', 'pydantic', 'redis'
-                        ]
-                        dependencies.append({
-                            'name': module_name,
-                            'type': 'import',
-                            'source': str(file_path.relative_to(self.root)),
-                            'import_path': import_path,
-                            'is_external': is_external
-                        })
-            
-            # JavaScript/TypeScript imports
-            elif ext in ('js', 'jsx', 'ts', 'tsx'):
-                # ES module imports
-                es_import_regex = re.compile(r"import\s+(?:[\w\s{},*]*\s+from\s+)?['\"]([^'\"]+)['\"]", re.MULTILINE)
-                for match in es_import_regex.finditer(content):
-                    import_path = match.group(1)
-                    package_name = import_path.split('/')[0].lstrip('@')
-                    is_external = not (import_path.startswith('.') or import_path.startswith('/'))
-                    dependencies.append({
-                        'name': package_name,
-                        'type': 'import',
-                        'source': str(file_path.relative_to(self.root)),
-                        'import_path': import_path,
-                        'is_external': is_external
-                    })
-                
-                # CommonJS requires
-                require_regex = re.compile(r"(?:const|let|var)\s+(?:[\w\s{},*]*)\s*=\s*require\s*\(\s*['\"]([^'\"]+)['\"]\s*\)", re.MULTILINE)
-                for match in require_regex.finditer(content):
-                    import_path = match.group(1)
-                    package_name = import_path.split('/')[0]
-                    is_external = not (import_path.startswith('.') or import_path.startswith('/'))
-                    dependencies.append({
-                        'name': package_name,
-                        'type': 'require',
-                        'source': str(file_path.relative_to(self.root)),
-                        'import_path': import_path,
-                        'is_external': is_external
-                    })
-            
-            # Java imports
-            elif ext == 'java':
-                import_regex = re.compile(r'^\s*import\s+([^;]+);', re.MULTILINE)
-                for match in import_regex.finditer(content):
-                    import_path = match.group(1)
-                    package_name = import_path.split('.')[0]
-                    dependencies.append({
-                        'name': package_name,
-                        'type': 'import',
-                        'source': str(file_path.relative_to(self.root)),
-                        'import_path': import_path,
-                        'is_external': True
-                    })
-            
-            # Ruby requires
-            elif ext == 'rb':
-                require_regex = re.compile(r"^\s*require\s+['\"]([^'\"]+)['\"]", re.MULTILINE)
-                for match in require_regex.finditer(content):
-                    import_path = match.group(1)
-                    dependencies.append({
-                        'name': import_path,
-                        'type': 'require',
-                        'source': str(file_path.relative_to(self.root)),
-                        'import_path': import_path,
-                        'is_external': True
-                    })
-        
+            return extractor(content, str(file_path.relative_to(self.root)))
         except Exception as e:
             # Silently fail dependency extraction
-            pass
-        
-        return dependencies
+            return []
     
     def analyze_file(self, path: str) -> Dict[str, Any]:
         """
@@ -321,7 +691,7 @@ class CodebaseMCPServer:
         file_path = (self.root / path).resolve()
         
         # Security: Ensure path is within codebase
-        if not str(file_path).startswith(str(self.root)):
+        if not file_path.is_relative_to(self.root):
             raise ValueError(f"Path traversal attempt: {path}")
         
         if not file_path.exists():
@@ -329,7 +699,7 @@ class CodebaseMCPServer:
         
         try:
             # Get file stats
-            stat = file_path.stat()
+            file_stat = file_path.stat()
             
             # Read content for analysis
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
@@ -348,91 +718,253 @@ class CodebaseMCPServer:
                 'path': path,
                 'extension': file_path.suffix,
                 'language': language,
-                'size': stat.st_size,
+                'size': file_stat.st_size,
                 'line_count': line_count,
-                'last_modified': stat.st_mtime,
+                'last_modified': file_stat.st_mtime,
                 'dependencies': dependencies
             }
         
         except Exception as e:
             raise ValueError(f"Error analyzing file {path}: {e}")
     
+    def _git_tracked_files(self) -> Optional[List[str]]:
+        """
+        Tracked plus untracked-but-not-ignored files from `git ls-files`.
+        
+        Paths are relative to the root. Returns None when the root is not a git
+        checkout or git fails; either answer is cached for GIT_FILES_CACHE_TTL.
+        """
+        cached = self._git_files_cache
+        if cached is not None and time.monotonic() - cached[0] < GIT_FILES_CACHE_TTL:
+            return cached[1]
+        
+        files = None
+        if (self.root / '.git').exists():
+            try:
+                result = subprocess.run(
+                    ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                    cwd=self.root, capture_output=True, timeout=10
+                )
+                if result.returncode == 0:
+                    files = [path for path in os.fsdecode(result.stdout).split('\0') if path]
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.debug(f"git ls-files unavailable, walking the tree: {e}")
+        self._git_files_cache = (time.monotonic(), files)
+        return files
+    
+    def _clean_head_sha(self) -> Optional[str]:
+        """HEAD commit sha when the checkout has no changes or untracked files, else None"""
+        cached = self._git_state_cache
+        if cached is not None and time.monotonic() - cached[0] < GIT_STATE_TTL:
+            return cached[1]
+        
+        sha = None
+        if (self.root / '.git').exists():
+            try:
+                # One call reports both the HEAD oid and any worktree changes
+                result = subprocess.run(
+                    ['git', 'status', '--porcelain=v2', '--branch'],
+                    cwd=self.root, capture_output=True, text=True, timeout=5
+                )
+                if result.returncode == 0:
+                    lines = result.stdout.splitlines()
+                    if all(line.startswith('#') for line in lines):
+                        for line in lines:
+                            if line.startswith('# branch.oid '):
+                                oid = line[len('# branch.oid '):]
+                                sha = oid if oid != '(initial)' else None
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.debug(f"git status unavailable: {e}")
+        self._git_state_cache = (time.monotonic(), sha)
+        return sha
+    
+    def _iter_files(self) -> Iterator[os.DirEntry]:
+        """
+        Yield a DirEntry-like object per codebase file.
+        
+        In a git checkout the file list comes from `git ls-files`, so .gitignore
+        is honoured; excluded directory names and dotfiles are still filtered.
+        Otherwise the tree is walked with os.scandir in the same order and with
+        the same filtering as the os.walk loops it replaced: a directory's files
+        come before its subdirectories, excluded directory names are pruned,
+        dotfiles are skipped and symlinked directories are not followed. Callers
+        use entry.stat() (cached on the entry) instead of a separate Path.stat().
+        """
+        git_files = self._git_tracked_files()
+        if git_files is not None:
+            root = self.root_str
+            for rel_path in git_files:
+                parts = rel_path.split('/')
+                if parts[-1].startswith('.') or not self.excluded.isdisjoint(parts[:-1]):
+                    continue
+                yield _GitFileEntry(os.path.join(root, *parts), parts[-1])
+            return
+        
+        stack = [self.root_str]
+        while stack:
+            files = []
+            subdirs = []
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if entry.name not in self.excluded and not entry.is_symlink():
+                                subdirs.append(entry.path)
+                        elif not entry.name.startswith('.'):
+                            files.append(entry)
+            except OSError:
+                continue
+            yield from files
+            stack.extend(reversed(subdirs))
+    
+    def _tree_signature(self) -> int:
+        """
+        Cheap change validator for the codebase tree.
+        
+        XORs st_mtime_ns of the root and each non-excluded top-level directory,
+        which move whenever entries are added, removed or renamed in them.
+        Edits deeper in the tree are picked up once ANALYZE_CACHE_TTL expires.
+        """
+        try:
+            signature = self.root.stat().st_mtime_ns
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.name not in self.excluded and entry.is_dir(follow_symlinks=False):
+                        signature ^= entry.stat(follow_symlinks=False).st_mtime_ns
+        except OSError:
+            return 0
+        return signature
+    
+    def invalidate_analysis_cache(self):
+        """Drop the cached analyze_codebase result, git file list/state and hybrid keyword hits"""
+        self._analyze_cache = None
+        self._git_files_cache = None
+        self._git_state_cache = None
+        # rag_search's keyword half caches find_references output
+        _invalidate_hybrid_search()
+    
+    def analysis_etag(self) -> Optional[str]:
+        """ETag for the cached analyze_codebase result (None if nothing is cached)"""
+        cached = self._analyze_cache
+        if cached is None:
+            return None
+        cached_at, signature, _ = cached
+        return f'"{signature:x}-{int(cached_at * 1000):x}"'
+    
     def analyze_codebase(self) -> Dict[str, Any]:
         """
         Analyze entire codebase structure with language detection and dependency tracking.
         
+        Results are cached for ANALYZE_CACHE_TTL seconds and reused while the
+        tree signature is unchanged; callers always get their own copy.
+        
         Returns:
-            Project structure dict with: {root, total_files, files_by_language, total_lines_of_code, directories, dependencies}
+            Project structure dict with: {root, total_files, files_by_language, total_lines_of_code, directories, key_files, dependencies}
         """
+        signature = self._tree_signature()
+        cached = self._analyze_cache
+        if cached is not None:
+            cached_at, cached_signature, cached_structure = cached
+            if cached_signature == signature and time.monotonic() - cached_at < ANALYZE_CACHE_TTL:
+                return copy.deepcopy(cached_structure)
+        
+        structure = self._analyze_codebase_uncached()
+        self._analyze_cache = (time.monotonic(), signature, structure)
+        return copy.deepcopy(structure)
+    
+    def _measure_code_file(self, path: str, ext: str) -> Tuple[int, List[Dict[str, Any]]]:
+        """(line count, dependencies) for one code file; (0, []) if it can't be read"""
+        try:
+            if ext.lower() in DEPENDENCY_EXTENSIONS:
+                # One binary read serves both the line count and the parse
+                with open(path, 'rb') as f:
+                    data = f.read()
+                line_count = data.count(b'\n') + (1 if data else 0)
+                
+                # Extract dependencies
+                content = data.decode('utf-8', errors='ignore')
+                return line_count, self._extract_dependencies(content, Path(path))
+            return self._count_lines(path), []
+        except (OSError, IOError, UnicodeDecodeError):
+            return 0, []
+    
+    @_cached_by_git_sha("analyze_codebase")
+    def _analyze_codebase_uncached(self) -> Dict[str, Any]:
+        """Walk the tree and build the analyze_codebase structure"""
         MAX_FILES = 500  # Limit to prevent timeout
         MAX_FILE_SIZE = 1_000_000  # 1MB max per file
         
         structure = {
-            "root": str(self.root),
+            "root": self.root_str,
             "total_files": 0,
             "total_lines_of_code": 0,
             "files_by_language": {},
             "directories": {},
+            "key_files": [],
             "dependencies": [],
             "truncated": False
         }
         
-        all_dependencies = []
+        # (path, extension) of files to line count, filled by the walk
+        code_files: List[Tuple[str, str]] = []
+        # Relative paths by string slicing; Path objects only where a helper needs one
+        root_prefix_len = len(os.path.join(self.root_str, ''))
+        files_by_language = structure["files_by_language"]
+        directories = structure["directories"]
         
-        for root, dirs, files in os.walk(self.root):
-            # Skip excluded dirs
-            dirs[:] = [d for d in dirs if d not in self.excluded]
+        # Phase 1: walk the tree, tallying everything that only needs the entry
+        for entry in self._iter_files():
+            # Check file limit
+            if structure["total_files"] >= MAX_FILES:
+                structure["truncated"] = True
+                break
             
-            # Record directory
-            rel_dir = Path(root).relative_to(self.root)
-            dir_key = str(rel_dir) if str(rel_dir) != '.' else '.'
+            # Skip large files (one stat per file, cached on the entry)
+            try:
+                file_stat = entry.stat()
+            except OSError:
+                continue  # e.g. tracked by git but deleted from the worktree
+            size = file_stat.st_size
+            if size > MAX_FILE_SIZE or not stat.S_ISREG(file_stat.st_mode):
+                continue
             
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                
-                # Check file limit
-                if structure["total_files"] >= MAX_FILES:
-                    structure["truncated"] = True
-                    break
-                    
-                file_path = Path(root) / file
-                
-                # Skip large files
-                try:
-                    if file_path.stat().st_size > MAX_FILE_SIZE:
-                        continue
-                except OSError:
-                    continue
-                
-                # Detect language
-                language = self._detect_language(file_path)
-                structure["files_by_language"][language] = structure["files_by_language"].get(language, 0) + 1
-                
-                # Track directory structure
-                if dir_key not in structure["directories"]:
-                    structure["directories"][dir_key] = []
-                structure["directories"][dir_key].append(str(file_path.relative_to(self.root)))
-                
-                # Count lines and extract dependencies (only for code files)
-                if language != 'Other':
-                    try:
-                        if file_path.stat().st_size < 100_000:  # Only analyze files < 100KB
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                                line_count = content.count('\n') + (1 if content else 0)
-                                structure["total_lines_of_code"] += line_count
-                                
-                                # Extract dependencies
-                                deps = self._extract_dependencies(content, file_path)
-                                all_dependencies.extend(deps)
-                    except (OSError, IOError, UnicodeDecodeError):
-                        pass
-                
-                structure["total_files"] += 1
+            # Detect language
+            ext = os.path.splitext(entry.name)[1][1:]
+            language = self._detect_language_ext(ext)
+            files_by_language[language] = files_by_language.get(language, 0) + 1
             
-            if structure["truncated"]:
-                break
+            # Track directory structure
+            rel_path = entry.path[root_prefix_len:]
+            dir_key = os.path.dirname(rel_path) or '.'
+            if dir_key not in directories:
+                directories[dir_key] = []
+            directories[dir_key].append(rel_path)
+            
+            if entry.name in KEY_FILES:
+                structure["key_files"].append({"path": rel_path, "language": language, "size": size})
+            
+            # Count lines and extract dependencies (only for code files)
+            if language != 'Other' and size < 100_000:  # Only analyze files < 100KB
+                code_files.append((entry.path, ext))
+            
+            structure["total_files"] += 1
+        
+        # Phase 2: read, count and parse the code files collected by the walk
+        if len(code_files) >= PARALLEL_SCAN_MIN_FILES:
+            # Reads release the GIL; results keep walk order
+            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(code_files))) as executor:
+                measured = list(executor.map(lambda item: self._measure_code_file(*item), code_files))
+        else:
+            measured = [self._measure_code_file(path, ext) for path, ext in code_files]
+        
+        all_dependencies = []
+        for line_count, deps in measured:
+            structure["total_lines_of_code"] += line_count
+            all_dependencies.extend(deps)
         
         # Deduplicate dependencies
         seen = set()
@@ -447,182 +979,370 @@ class CodebaseMCPServer:
         
         return structure
     
-    def search_docs(self, query: str) -> str:
-        """Search in docs/ and README files for query term"""
-        doc_dirs = [self.root / 'docs', self.root / 'README.md']
-        results = []
-        
-        for path in doc_dirs:
+    def _doc_paths(self) -> List[Path]:
+        """Docs searched by search_docs: docs/**/*.md, then README.md"""
+        paths = []
+        for path in [self.root / 'docs', self.root / 'README.md']:
             if path.is_file():
+                paths.append(path)
+            elif path.is_dir():
+                paths.extend(path.rglob('*.md'))
+        return paths
+    
+    def _refresh_doc_index(self) -> List[str]:
+        """
+        Bring the docs index up to date and return indexed doc paths in search order.
+        
+        Only docs whose (mtime_ns, size) changed are re-read. Each entry keeps the
+        lowercased text, and _doc_postings maps every word token to the docs
+        containing it. Caller must hold _doc_lock.
+        """
+        order = []
+        for path in self._doc_paths():
+            key = str(path)
+            try:
+                file_stat = path.stat()
+            except OSError:
+                continue
+            version = (file_stat.st_mtime_ns, file_stat.st_size)
+            entry = self._docs.get(key)
+            if entry is None or entry[0] != version:
                 try:
                     with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        if query.lower() in content.lower():
-                            results.append(f" {path.name}: Found '{query}'")
+                        lowered = f.read().lower()
                 except (OSError, IOError, UnicodeDecodeError):
-                    pass
-            elif path.is_dir():
-                for doc_file in path.rglob('*.md'):
-                    try:
-                        with open(doc_file, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            if query.lower() in content.lower():
-                                results.append(f" {doc_file.name}: Found '{query}'")
-                    except (OSError, IOError, UnicodeDecodeError):
-                        pass
+                    continue
+                if entry is not None:
+                    self._unindex_doc(key)
+                tokens = frozenset(_WORD_RE.findall(lowered))
+                for token in tokens:
+                    self._doc_postings.setdefault(token, set()).add(key)
+                self._docs[key] = (version, lowered, tokens)
+            order.append(key)
+        
+        # Forget docs that were deleted or moved
+        for key in set(self._docs) - set(order):
+            self._unindex_doc(key)
+        return order
+    
+    def _unindex_doc(self, key: str):
+        """Remove one doc from the docs index (caller holds _doc_lock)"""
+        _, _, tokens = self._docs.pop(key)
+        for token in tokens:
+            docs = self._doc_postings.get(token)
+            if docs is not None:
+                docs.discard(key)
+                if not docs:
+                    del self._doc_postings[token]
+    
+    def search_docs(self, query: str) -> str:
+        """
+        Search in docs/ and README files for query term.
+        
+        Uses semantic search over markdown chunks when the RAG service is
+        available, falling back to the literal (indexed) search otherwise.
+        """
+        rag = _get_rag_service()
+        if rag:
+            try:
+                hits = self._search_docs_semantic(rag, query)
+                if hits:
+                    return hits
+            except Exception as e:
+                logger.warning(f"Semantic doc search failed, using literal search: {e}")
+        return self._search_docs_literal(query)
+    
+    def _search_docs_semantic(self, rag, query: str) -> Optional[str]:
+        """RAG hits restricted to markdown docs, one line per doc (None if no doc matched)"""
+        results = []
+        seen = set()
+        for doc in rag.search(query, top_k=10):
+            file_path = doc.get('metadata', {}).get('file_path', '')
+            if not file_path.endswith('.md') or file_path in seen:
+                continue
+            seen.add(file_path)
+            results.append(f" {os.path.basename(file_path)}: Related to '{query}' (similarity {doc.get('score', 0.0):.2f})")
+        return "\n".join(results) if results else None
+    
+    def _search_docs_literal(self, query: str) -> str:
+        """Case-insensitive substring search over the indexed docs"""
+        needle = query.lower()
+        results = []
+        with self._doc_lock:
+            order = self._refresh_doc_index()
+            
+            # Candidate docs from the token index: a doc containing the query
+            # contains, for each query word, some token with that word inside it
+            candidates = None
+            for word in set(_WORD_RE.findall(needle)):
+                docs = set()
+                for token, token_docs in self._doc_postings.items():
+                    if word in token:
+                        docs |= token_docs
+                candidates = docs if candidates is None else candidates & docs
+                if not candidates:
+                    break
+            
+            # Confirm with the same case-insensitive substring test as before
+            for key in order:
+                if candidates is not None and key not in candidates:
+                    continue
+                if needle in self._docs[key][1]:
+                    results.append(f" {os.path.basename(key)}: Found '{query}'")
         
         return "\n".join(results) if results else f" No docs found for '{query}'"
     
-    def _find_references_python(self, file_path: Path, symbol: str) -> List[Tuple[int, str]]:
+    @staticmethod
+    def _index_python_source(content: str, file_path: Path) -> Optional[Dict[str, List[Tuple[int, str]]]]:
+        """Parse Python source into a symbol -> [(lineno, kind)] index (None on SyntaxError)"""
+        try:
+            tree = ast.parse(content, filename=str(file_path))
+        except SyntaxError:
+            return None
+        return _build_symbol_index(tree)
+    
+    def _find_references_python(self, file_path: Path, symbol: str, content: Optional[str] = None) -> List[Tuple[int, str]]:
         """Find references in Python files using AST parsing"""
-        refs = []
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                lines = content.splitlines()
+            if content is None:
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
             
-            # Parse AST
-            try:
-                tree = ast.parse(content, filename=str(file_path))
-            except SyntaxError:
+            index = self._index_python_source(content, file_path)
+            if index is None:
                 # If AST parsing fails, fall back to regex
-                return self._find_references_regex(file_path, symbol, lines)
-            
-            # Visit AST nodes to find references
-            class ReferenceVisitor(ast.NodeVisitor):
-                def __init__(self, target_symbol):
-                    self.target = target_symbol
-                    self.refs = []
-                
-                def visit_Name(self, node):
-                    if node.id == self.target:
-                        self.refs.append((node.lineno, "name"))
-                    self.generic_visit()
-                
-                def visit_Attribute(self, node):
-                    if isinstance(node.attr, str) and node.attr == self.target:
-                        self.refs.append((node.lineno, "attribute"))
-                    self.generic_visit()
-                
-                def visit_FunctionDef(self, node):
-                    if node.name == self.target:
-                        self.refs.append((node.lineno, "definition"))
-                    self.generic_visit()
-                
-                def visit_ClassDef(self, node):
-                    if node.name == self.target:
-                        self.refs.append((node.lineno, "definition"))
-                    self.generic_visit()
-            
-            visitor = ReferenceVisitor(symbol)
-            visitor.visit(tree)
-            return visitor.refs
+                return self._find_references_regex(file_path, symbol, content)
+            return list(index.get(symbol, ()))
             
         except Exception:
             return []
     
-    def _find_references_regex(self, file_path: Path, symbol: str, lines: List[str]) -> List[Tuple[int, str]]:
+    def _find_references_python_cached(self, file_path: Path, symbol: str) -> List[Tuple[int, str]]:
+        """
+        Python references via a per-file symbol index cached by (mtime_ns, size).
+        
+        A cache hit answers any symbol without reading the file. On a miss the
+        file is only parsed (and its index cached) if it contains the symbol
+        literally, so a first query costs no more than an uncached scan.
+        """
+        file_stat = file_path.stat()
+        key = str(file_path)
+        version = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self._python_index_lock:
+            cached = self._python_index.get(key)
+            if cached is not None and cached[0] == version:
+                self._python_index.move_to_end(key)
+                if cached[1] is not None:
+                    return list(cached[1].get(symbol, ()))
+        
+        content = self._read_text_if_contains(file_path, symbol.encode('utf-8'))
+        if content is None:
+            return []
+        
+        index = self._index_python_source(content, file_path)
+        with self._python_index_lock:
+            self._python_index[key] = (version, index)
+            self._python_index.move_to_end(key)
+            while len(self._python_index) > PYTHON_INDEX_CACHE_SIZE:
+                self._python_index.popitem(last=False)
+        
+        if index is None:
+            # If AST parsing fails, fall back to regex
+            return self._find_references_regex(file_path, symbol, content)
+        return list(index.get(symbol, ()))
+    
+    def _find_references_regex(self, file_path: Path, symbol: str, content: str) -> List[Tuple[int, str]]:
         """Find references using regex with word boundaries (for non-Python files)"""
         refs = []
         # Use word boundaries to avoid false positives
         # Match: symbol as whole word, not part of another word
-        pattern = r'\b' + re.escape(symbol) + r'\b'
+        ref_pattern, def_pattern = _compile_symbol_patterns(symbol)
         
-        for i, line in enumerate(lines, 1):
-            if re.search(pattern, line):
-                # Check if it's a definition (function/class/const/let/var)
-                if re.search(rf'\b(function|class|const|let|var)\s+{re.escape(symbol)}\b', line):
-                    refs.append((i, "definition"))
-                else:
-                    refs.append((i, "reference"))
+        # One scan over the whole file; line numbers come from counting the
+        # newlines between consecutive matches
+        line_num = 1
+        last_pos = 0
+        last_line = 0
+        for match in ref_pattern.finditer(content):
+            start = match.start()
+            line_num += content.count('\n', last_pos, start)
+            last_pos = start
+            if line_num == last_line:
+                continue  # one entry per line
+            last_line = line_num
+            
+            line_start = content.rfind('\n', 0, start) + 1
+            line_end = content.find('\n', start)
+            line = content[line_start:line_end if line_end != -1 else len(content)]
+            # Check if it's a definition (function/class/const/let/var)
+            if def_pattern.search(line):
+                refs.append((line_num, "definition"))
+            else:
+                refs.append((line_num, "reference"))
         
         return refs
     
+    @staticmethod
+    def _read_bytes_mmap(file_path) -> Union[bytes, mmap.mmap]:
+        """File contents as bytes, or a read-only mmap (caller closes) above MMAP_MIN_SIZE"""
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+                return f.read()
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    def _read_text_if_contains(self, file_path, needle: bytes) -> Optional[str]:
+        """
+        Literal prescreen: decode a file only if its bytes contain needle.
+        
+        Most files never mention the symbol and are rejected by a C-level byte
+        search before any decoding or parsing. Large files are searched through
+        an mmap of the page cache rather than a copied buffer.
+        """
+        data = self._read_bytes_mmap(file_path)
+        try:
+            # find(), not `in`: mmap's `in` tests for a single byte value
+            if data.find(needle) == -1:
+                return None
+            return str(data, 'utf-8', 'ignore')
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    
+    def _scan_one(self, file_path: Path, symbol: str) -> List[str]:
+        """Find references to symbol in one file, formatted as [DEF]/[REF] lines"""
+        try:
+            if file_path.suffix == '.py':
+                # Use AST parsing for Python files
+                file_refs = self._find_references_python_cached(file_path, symbol)
+            else:
+                content = self._read_text_if_contains(file_path, symbol.encode('utf-8'))
+                if content is None:
+                    return []
+                # Use regex for other languages
+                file_refs = self._find_references_regex(file_path, symbol, content)
+            
+            # Format results
+            rel_path = file_path.relative_to(self.root)
+            refs = []
+            for line_num, ref_type in file_refs:
+                marker = "[DEF]" if ref_type == "definition" else "[REF]"
+                refs.append(f"{marker} {rel_path}:{line_num} ({ref_type})")
+            return refs
+        except Exception:
+            return []
+    
+    @_cached_by_git_sha("find_references")
     def find_references(self, symbol: str) -> str:
         """Find all references to a function/class/variable using AST parsing for Python, regex for others"""
-        refs = []
+        # Only search code files
+        paths = [
+            Path(entry.path) for entry in self._iter_files()
+            if os.path.splitext(entry.name)[1] in REFERENCE_EXTENSIONS
+        ]
         
-        for root, dirs, files in os.walk(self.root):
-            dirs[:] = [d for d in dirs if d not in self.excluded]
-            
-            for file in files:
-                if file.startswith('.'):
-                    continue
-                    
-                file_path = Path(root) / file
-                
-                # Only search code files
-                if file_path.suffix in {'.py', '.js', '.ts', '.tsx', '.jsx', '.md'}:
-                    try:
-                        if file_path.suffix == '.py':
-                            # Use AST parsing for Python files
-                            file_refs = self._find_references_python(file_path, symbol)
-                        else:
-                            # Use regex for other languages
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                lines = f.read().splitlines()
-                            file_refs = self._find_references_regex(file_path, symbol, lines)
-                        
-                        # Format results
-                        rel_path = file_path.relative_to(self.root)
-                        for line_num, ref_type in file_refs:
-                            marker = "[DEF]" if ref_type == "definition" else "[REF]"
-                            refs.append(f"{marker} {rel_path}:{line_num} ({ref_type})")
-                    except Exception:
-                        pass
+        if len(paths) >= PARALLEL_SCAN_MIN_FILES:
+            # Reads and regex scans release the GIL; results keep walk order
+            with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(paths))) as executor:
+                per_file = list(executor.map(lambda path: self._scan_one(path, symbol), paths))
+        else:
+            per_file = [self._scan_one(path, symbol) for path in paths]
         
+        refs = [ref for file_refs in per_file for ref in file_refs]
         return "\n".join(refs) if refs else f" No references found for '{symbol}'"
     
     def git_diff(self, file: Optional[str] = None) -> str:
         """Get git diff (what changed recently)"""
         try:
-            original_cwd = os.getcwd()
-            os.chdir(self.root)
-            try:
-                if file:
-                    result = subprocess.run(['git', 'diff', file], 
-                                          capture_output=True, text=True, timeout=10)
-                else:
-                    result = subprocess.run(['git', 'diff', '--stat'], 
-                                          capture_output=True, text=True, timeout=10)
-                return result.stdout if result.returncode == 0 else " Git not available"
-            finally:
-                os.chdir(original_cwd)
+            if file:
+                result = subprocess.run(['git', 'diff', file], cwd=self.root,
+                                      capture_output=True, text=True, timeout=10)
+            else:
+                result = subprocess.run(['git', 'diff', '--stat'], cwd=self.root,
+                                      capture_output=True, text=True, timeout=10)
+            return result.stdout if result.returncode == 0 else " Git not available"
         except subprocess.TimeoutExpired:
             return " Git diff timed out"
         except Exception as e:
             return f" Git diff error: {e}"
     
+    def _test_command(self, test_file: Optional[str] = None) -> Optional[List[str]]:
+        """Pick the test command for a file or the whole codebase (None if no framework found)"""
+        if test_file:
+            # Run specific test file
+            if test_file.endswith('.py'):
+                return ['python', '-m', 'pytest', test_file, '-v']
+            return ['npm', 'test', '--', test_file]  # JavaScript/TypeScript
+        # Run all tests
+        if (self.root / 'package.json').exists():
+            return ['npm', 'test']
+        if (self.root / 'pytest.ini').exists() or list(self.root.glob('**/test_*.py')):
+            return ['python', '-m', 'pytest', '-v']
+        return None
+    
     def run_tests(self, test_file: Optional[str] = None) -> str:
         """Run test suite (returns exit code + output)"""
         try:
-            original_cwd = os.getcwd()
-            os.chdir(self.root)
+            cmd = self._test_command(test_file)
+            if cmd is None:
+                return " No test framework detected"
+            
             try:
-                if test_file:
-                    # Run specific test file
-                    if test_file.endswith('.py'):
-                        cmd = ['python', '-m', 'pytest', test_file, '-v']
-                    else:  # JavaScript/TypeScript
-                        cmd = ['npm', 'test', '--', test_file]
-                else:
-                    # Run all tests
-                    if (self.root / 'package.json').exists():
-                        cmd = ['npm', 'test']
-                    elif (self.root / 'pytest.ini').exists() or list(self.root.glob('**/test_*.py')):
-                        cmd = ['python', '-m', 'pytest', '-v']
-                    else:
-                        return " No test framework detected"
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-                return f"Exit: {result.returncode}\n\n{result.stdout}\n{result.stderr}"
+                # cwd= rather than os.chdir: the process cwd is shared by every request thread
+                result = subprocess.run(cmd, cwd=self.root, capture_output=True, text=True, timeout=RUN_TESTS_TIMEOUT)
             finally:
-                os.chdir(original_cwd)
+                # Test runs can write files (caches, snapshots, fixtures)
+                self.invalidate_analysis_cache()
+            return f"Exit: {result.returncode}\n\n{result.stdout}\n{result.stderr}"
         except subprocess.TimeoutExpired:
-            return " Tests timed out (>30s)"
+            return f" Tests timed out (>{RUN_TESTS_TIMEOUT}s)"
         except Exception as e:
             return f" Test error: {e}"
     
+    async def stream_tests(self, test_file: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Run test suite, yielding combined stdout/stderr as it is produced.
+        
+        Output arrives with constant memory and the exit code is reported
+        last ("Exit: N"), since it is only known once the run finishes.
+        """
+        cmd = self._test_command(test_file)
+        if cmd is None:
+            yield " No test framework detected"
+            return
+        
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, cwd=self.root,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+            )
+        except Exception as e:
+            self.invalidate_analysis_cache()
+            yield f" Test error: {e}"
+            return
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + RUN_TESTS_TIMEOUT
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            while True:
+                chunk = await asyncio.wait_for(proc.stdout.read(STREAM_CHUNK_SIZE), deadline - loop.time())
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            tail = decoder.decode(b'', final=True)
+            returncode = await asyncio.wait_for(proc.wait(), max(deadline - loop.time(), 0))
+            yield f"{tail}\nExit: {returncode}\n"
+        except asyncio.TimeoutError:
+            yield f"\n Tests timed out (>{RUN_TESTS_TIMEOUT}s)\n"
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            # Test runs can write files (caches, snapshots, fixtures)
+            self.invalidate_analysis_cache()
+    
     def find_callers(self, symbol: str, use_communities: bool = True) -> List[str]:
         """
         Find all callers of a function/class using code graph.
@@ -746,102 +1466,130 @@ async def health():
     return {"status": "healthy", "codebase_root": str(mcp_server.root)}
 
 
-@app.get("/api/mcp/tools")
-async def list_tools():
-    """List available MCP tools"""
-    tools = [
-        {
-            "name": "read_file",
-            "description": "Read a file from the codebase",
-            "parameters": {
-                "path": {"type": "string", "description": "File path relative to codebase"}
-            }
-        },
-        {
-            "name": "analyze_file",
-            "description": "Analyze a single file for language, LOC, dependencies, and metrics",
-            "parameters": {
-                "path": {"type": "string", "description": "File path relative to codebase"}
-            }
-        },
-        {
-            "name": "analyze_codebase",
-            "description": "Get codebase structure (files, languages, LOC, dependencies)",
-            "parameters": {}
-        },
-        {
-            "name": "search_docs",
-            "description": "Search documentation for a topic",
-            "parameters": {
-                "query": {"type": "string"}
-            }
-        },
-        {
-            "name": "find_references",
-            "description": "Find all references to a symbol (function/class/var)",
-            "parameters": {
-                "symbol": {"type": "string"}
-            }
-        },
-        {
-            "name": "find_callers",
-            "description": "Find all functions/classes that call a given symbol (uses knowledge graph)",
-            "parameters": {
-                "symbol": {"type": "string", "description": "Function or class name to find callers for"}
-            }
-        },
-        {
-            "name": "impact_analysis",
-            "description": "Analyze what would break if a function/class is changed (all downstream dependencies)",
-            "parameters": {
-                "symbol": {"type": "string", "description": "Function or class name to analyze"}
-            }
-        },
-        {
-            "name": "git_diff",
-            "description": "Get recent git changes",
-            "parameters": {
-                "file": {"type": "string", "description": "Optional: specific file", "required": False}
-            }
-        },
-        {
-            "name": "run_tests",
-            "description": "Run test suite",
-            "parameters": {
-                "test_file": {"type": "string", "description": "Optional: specific test file", "required": False}
-            }
+# Tools listed by /api/mcp/tools (RAG tools only when a RAG index exists)
+_BASE_TOOLS = [
+    {
+        "name": "read_file",
+        "description": "Read a file from the codebase",
+        "parameters": {
+            "path": {"type": "string", "description": "File path relative to codebase"}
         }
-    ]
-    
-    # Add RAG tools if RAG is available
+    },
+    {
+        "name": "analyze_file",
+        "description": "Analyze a single file for language, LOC, dependencies, and metrics",
+        "parameters": {
+            "path": {"type": "string", "description": "File path relative to codebase"}
+        }
+    },
+    {
+        "name": "analyze_codebase",
+        "description": "Get codebase structure (files, languages, LOC, dependencies)",
+        "parameters": {}
+    },
+    {
+        "name": "search_docs",
+        "description": "Search documentation for a topic",
+        "parameters": {
+            "query": {"type": "string"}
+        }
+    },
+    {
+        "name": "find_references",
+        "description": "Find all references to a symbol (function/class/var)",
+        "parameters": {
+            "symbol": {"type": "string"}
+        }
+    },
+    {
+        "name": "find_callers",
+        "description": "Find all functions/classes that call a given symbol (uses knowledge graph)",
+        "parameters": {
+            "symbol": {"type": "string", "description": "Function or class name to find callers for"}
+        }
+    },
+    {
+        "name": "impact_analysis",
+        "description": "Analyze what would break if a function/class is changed (all downstream dependencies)",
+        "parameters": {
+            "symbol": {"type": "string", "description": "Function or class name to analyze"}
+        }
+    },
+    {
+        "name": "git_diff",
+        "description": "Get recent git changes",
+        "parameters": {
+            "file": {"type": "string", "description": "Optional: specific file", "required": False}
+        }
+    },
+    {
+        "name": "run_tests",
+        "description": "Run test suite",
+        "parameters": {
+            "test_file": {"type": "string", "description": "Optional: specific test file", "required": False}
+        }
+    }
+]
+
+_RAG_TOOLS = [
+    {
+        "name": "rag_search",
+        "description": "Semantic search in codebase using RAG. Returns relevant code snippets with similarity scores.",
+        "parameters": {
+            "query": {"type": "string", "description": "Search query"},
+            "top_k": {"type": "integer", "description": "Number of results (default: 5)", "required": False}
+        }
+    },
+    {
+        "name": "rag_query",
+        "description": "RAG query: Retrieve relevant context and generate an answer using LLM. Use when you need a comprehensive answer based on codebase knowledge.",
+        "parameters": {
+            "question": {"type": "string", "description": "Question to answer"},
+            "top_k": {"type": "integer", "description": "Number of documents to retrieve (default: 5)", "required": False}
+        }
+    }
+]
+
+# Seconds the serialized tool list is served before RAG availability is re-checked
+TOOLS_CACHE_TTL = 5.0
+
+# (checked_at, rag_available, JSON body) for /api/mcp/tools
+_tools_cache: Optional[Tuple[float, bool, bytes]] = None
+
+
+def _rag_tools_available() -> bool:
+    """RAG tools are listed when the FAISS service imports and its index exists"""
     try:
         from orchestrator.rag_service_faiss import RAGServiceFAISS
-        import os
         index_path = os.getenv("RAG_INDEX_PATH", "data/rag_indexes/codebase.index")
-        if os.path.exists(index_path):
-            tools.extend([
-                {
-                    "name": "rag_search",
-                    "description": "Semantic search in codebase using RAG. Returns relevant code snippets with similarity scores.",
-                    "parameters": {
-                        "query": {"type": "string", "description": "Search query"},
-                        "top_k": {"type": "integer", "description": "Number of results (default: 5)", "required": False}
-                    }
-                },
-                {
-                    "name": "rag_query",
-                    "description": "RAG query: Retrieve relevant context and generate an answer using LLM. Use when you need a comprehensive answer based on codebase knowledge.",
-                    "parameters": {
-                        "question": {"type": "string", "description": "Question to answer"},
-                        "top_k": {"type": "integer", "description": "Number of documents to retrieve (default: 5)", "required": False}
-                    }
-                }
-            ])
+        return os.path.exists(index_path)
     except (ImportError, Exception):
         # RAG not available - tools list stays as is
-        pass
+        return False
+
+
+def _tools_json() -> bytes:
+    """Serialized tool list, rebuilt only when RAG availability changes"""
+    global _tools_cache
+    now = time.monotonic()
+    cached = _tools_cache
+    if cached is not None and now - cached[0] < TOOLS_CACHE_TTL:
+        return cached[2]
     
-    return {"tools": tools}
+    rag_available = _rag_tools_available()
+    if cached is not None and cached[1] == rag_available:
+        body = cached[2]
+    else:
+        tools = _BASE_TOOLS + _RAG_TOOLS if rag_available else _BASE_TOOLS
+        body = orjson.dumps({"tools": tools}) if ORJSON_AVAILABLE else json.dumps({"tools": tools}).encode('utf-8')
+    _tools_cache = (now, rag_available, body)
+    return body
+
+
+@app.get("/api/mcp/tools")
+async def list_tools():
+    """List available MCP tools"""
+    return Response(content=_tools_json(), media_type="application/json")
 
 
 @app.post("/api/mcp/tool")
@@ -863,36 +1611,36 @@ async def call_tool(request: ToolRequest):
         if request.tool == "read_file":
             if "path" not in request.args:
                 raise HTTPException(status_code=400, detail="Missing 'path' parameter")
-            result = mcp_server.read_file(request.args["path"])
+            result = await asyncio.to_thread(mcp_server.read_file, request.args["path"])
             return {"result": result}
         
         elif request.tool == "analyze_file":
             if "path" not in request.args:
                 raise HTTPException(status_code=400, detail="Missing 'path' parameter")
-            result = mcp_server.analyze_file(request.args["path"])
+            result = await asyncio.to_thread(mcp_server.analyze_file, request.args["path"])
             return {"result": result}
         
         elif request.tool == "analyze_codebase":
-            result = mcp_server.analyze_codebase()
+            result = await asyncio.to_thread(mcp_server.analyze_codebase)
             return {"result": result}
         
         elif request.tool == "search_docs":
             if "query" not in request.args:
                 raise HTTPException(status_code=400, detail="Missing 'query' parameter")
-            result = mcp_server.search_docs(request.args["query"])
+            result = await asyncio.to_thread(mcp_server.search_docs, request.args["query"])
             return {"result": result}
         
         elif request.tool == "find_references":
             if "symbol" not in request.args:
                 raise HTTPException(status_code=400, detail="Missing 'symbol' parameter")
-            result = mcp_server.find_references(request.args["symbol"])
+            result = await asyncio.to_thread(mcp_server.find_references, request.args["symbol"])
             return {"result": result}
         
         elif request.tool == "find_callers":
             if "symbol" not in request.args:
                 raise HTTPException(status_code=400, detail="Missing 'symbol' parameter")
             # Load graph from Redis
-            callers = mcp_server.find_callers(request.args["symbol"])
+            callers = await asyncio.to_thread(mcp_server.find_callers, request.args["symbol"])
             if not callers:
                 return {"result": [], "error": "Code graph not available. Run codebase indexing first."}
             return {"result": callers}
@@ -900,17 +1648,17 @@ async def call_tool(request: ToolRequest):
         elif request.tool == "impact_analysis":
             if "symbol" not in request.args:
                 raise HTTPException(status_code=400, detail="Missing 'symbol' parameter")
-            impacts = mcp_server.impact_analysis(request.args["symbol"])
+            impacts = await asyncio.to_thread(mcp_server.impact_analysis, request.args["symbol"])
             if not impacts:
                 return {"result": [], "error": "Code graph not available. Run codebase indexing first."}
             return {"result": impacts}
         
         elif request.tool == "git_diff":
-            result = mcp_server.git_diff(request.args.get("file"))
+            result = await asyncio.to_thread(mcp_server.git_diff, request.args.get("file"))
             return {"result": result}
         
         elif request.tool == "run_tests":
-            result = mcp_server.run_tests(request.args.get("test_file"))
+            result = await asyncio.to_thread(mcp_server.run_tests, request.args.get("test_file"))
             return {"result": result}
         
         # RAG tools (agentic - only called when agents need them)
@@ -938,25 +1686,65 @@ async def call_tool(request: ToolRequest):
 
 
 # RAG tool implementations (lazy-loaded, optional)
-_rag_service_cache = None
+
+# Seconds a missing RAG index / unavailable service is remembered before re-checking
+RAG_RECHECK_TTL = 30.0
+
+_UNSET = object()
+# _UNSET until first checked, then the RAGServiceFAISS instance or None
+_rag_service_cache: Any = _UNSET
+_rag_checked_at = 0.0
+_rag_load_lock = threading.Lock()
+
+
+def _try_load_rag():
+    """Build the RAG service, or None when it is not importable or not indexed"""
+    try:
+        from orchestrator.rag_service_faiss import RAGServiceFAISS
+        index_path = os.getenv("RAG_INDEX_PATH", "data/rag_indexes/codebase.index")
+        if not os.path.exists(index_path):
+            return None
+        return RAGServiceFAISS(
+            embedding_model=os.getenv("EMBEDDING_MODEL", "nomic-embed-text-v1.5"),
+            index_path=index_path
+        )
+    except (ImportError, Exception) as e:
+        logger.debug(f"RAG service unavailable: {e}")
+        return None
+
 
 def _get_rag_service():
     """Lazy load RAG service if available"""
-    global _rag_service_cache
-    if _rag_service_cache is None:
-        try:
-            from orchestrator.rag_service_faiss import RAGServiceFAISS
-            import os
-            index_path = os.getenv("RAG_INDEX_PATH", "data/rag_indexes/codebase.index")
-            if os.path.exists(index_path):
-                _rag_service_cache = RAGServiceFAISS(
-                    embedding_model=os.getenv("EMBEDDING_MODEL", "nomic-embed-text-v1.5"),
-                    index_path=index_path
-                )
-        except (ImportError, Exception) as e:
-            # RAG not available - return None
-            _rag_service_cache = False  # Mark as checked
-    return _rag_service_cache if _rag_service_cache else None
+    global _rag_service_cache, _rag_checked_at
+    cached = _rag_service_cache
+    if cached is not _UNSET and (cached is not None or time.monotonic() - _rag_checked_at < RAG_RECHECK_TTL):
+        return cached
+    with _rag_load_lock:
+        # Another thread may have loaded it while we waited
+        if _rag_service_cache is _UNSET or (
+            _rag_service_cache is None and time.monotonic() - _rag_checked_at >= RAG_RECHECK_TTL
+        ):
+            _rag_service_cache = _try_load_rag()
+            _rag_checked_at = time.monotonic()
+        return _rag_service_cache
+
+_hybrid_search_cache = None
+
+def _invalidate_hybrid_search():
+    """Drop the shared HybridSearch's cached keyword searches (files may have changed)"""
+    hybrid_search = _hybrid_search_cache
+    if hybrid_search is not None:
+        hybrid_search.invalidate_cache()
+
+def _get_hybrid_search(rag):
+    """Get or create the shared HybridSearch (keeps its keyword cache warm)"""
+    global _hybrid_search_cache
+    if _hybrid_search_cache is None or _hybrid_search_cache.rag is not rag:
+        from orchestrator.hybrid_search import HybridSearch
+        if _hybrid_search_cache is not None:
+            _hybrid_search_cache.close()
+        _hybrid_search_cache = HybridSearch(rag_service=rag, mcp_client=mcp_server)
+    return _hybrid_search_cache
 
 async def _call_rag_search(query: str, top_k: int = 5, hybrid: bool = True) -> str:
     """
@@ -971,9 +1759,8 @@ async def _call_rag_search(query: str, top_k: int = 5, hybrid: bool = True) -> s
         # Use hybrid search if enabled and MCP is available
         if hybrid:
             try:
-                from orchestrator.hybrid_search import HybridSearch
-                hybrid_search = HybridSearch(rag_service=rag, mcp_client=mcp_server)
-                results = hybrid_search.search(query, top_k=top_k)
+                hybrid_search = _get_hybrid_search(rag)
+                results = await asyncio.to_thread(hybrid_search.search, query, top_k=top_k)
                 
                 if not results:
                     return f" No relevant documents found for: {query}"
@@ -994,7 +1781,7 @@ async def _call_rag_search(query: str, top_k: int = 5, hybrid: bool = True) -> s
                 logger.warning(f"Hybrid search failed, using semantic-only: {e}")
         
         # Fallback: Semantic-only search
-        results = rag.search(query, top_k=top_k)
+        results = await asyncio.to_thread(rag.search, query, top_k=top_k)
         if not results:
             return f" No relevant documents found for: {query}"
         
@@ -1030,7 +1817,7 @@ async def _call_rag_query(question: str, top_k: int = 5) -> str:
 async def read_file_endpoint(request: ReadFileRequest):
     """Read a file from the codebase"""
     try:
-        result = mcp_server.read_file(request.path)
+        result = await asyncio.to_thread(mcp_server.read_file, request.path)
         return {"result": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1040,45 +1827,48 @@ async def read_file_endpoint(request: ReadFileRequest):
 async def analyze_file_endpoint(request: AnalyzeFileRequest):
     """Analyze a single file"""
     try:
-        result = mcp_server.analyze_file(request.path)
+        result = await asyncio.to_thread(mcp_server.analyze_file, request.path)
         return {"result": result}
     except (ValueError, FileNotFoundError) as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/api/mcp/analyze_codebase")
-async def analyze_codebase_endpoint():
-    """Get codebase structure"""
-    result = mcp_server.analyze_codebase()
-    return {"result": result}
+async def analyze_codebase_endpoint(request: Request):
+    """Get codebase structure (supports If-None-Match revalidation)"""
+    result = await asyncio.to_thread(mcp_server.analyze_codebase)
+    etag = mcp_server.analysis_etag()
+    headers = {"ETag": etag} if etag else {}
+    if etag and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return _JSONResponse({"result": result}, headers=headers)
 
 
 @app.post("/api/mcp/search_docs")
 async def search_docs_endpoint(request: SearchDocsRequest):
     """Search documentation"""
-    result = mcp_server.search_docs(request.query)
+    result = await asyncio.to_thread(mcp_server.search_docs, request.query)
     return {"result": result}
 
 
 @app.post("/api/mcp/find_references")
 async def find_references_endpoint(request: FindReferencesRequest):
     """Find references to a symbol"""
-    result = mcp_server.find_references(request.symbol)
+    result = await asyncio.to_thread(mcp_server.find_references, request.symbol)
     return {"result": result}
 
 
 @app.post("/api/mcp/git_diff")
 async def git_diff_endpoint(request: GitDiffRequest):
     """Get git diff"""
-    result = mcp_server.git_diff(request.file)
+    result = await asyncio.to_thread(mcp_server.git_diff, request.file)
     return {"result": result}
 
 
 @app.post("/api/mcp/run_tests")
 async def run_tests_endpoint(request: RunTestsRequest):
-    """Run test suite"""
-    result = mcp_server.run_tests(request.test_file)
-    return {"result": result}
+    """Run test suite, streaming output as plain text (exit code last)"""
+    return StreamingResponse(mcp_server.stream_tests(request.test_file), media_type="text/plain")
 
 
 if __name__ == "__main__":
@@ -701,12 +701,12 @@ class Orchestrator:
                     "id": f"ee_subtask_{i+1}",
                     "description": subtask.description,
                     "assigned_to": "coder",
-                    "target_modules": subtask.target_modules,
-                    "preserves_narratives": subtask.relevant_narratives,
-                    "dependencies": subtask.dependencies,
-                    "warnings": subtask.warnings,
+                    "target_modules": list(subtask.target_modules),
+                    "preserves_narratives": list(subtask.relevant_narratives),
+                    "dependencies": list(subtask.dependencies),
+                    "warnings": list(subtask.warnings),
                     "confidence": subtask.confidence,
-                    "preserves_patterns": subtask.preserves_patterns
+                    "preserves_patterns": list(subtask.preserves_patterns)
                 })
             
             return {
@@ -958,7 +958,8 @@ class Orchestrator:
                         ],
                         "temperature": temperature,
                         "max_tokens": 4096,
-                        "stream": False
+                        "stream": False,
+                        "cache_prompt": True
                     }
                     try:
                         response = await client.post(self.endpoints[agent], json=payload)
@@ -1226,7 +1227,9 @@ Vote for the BEST candidate that preserves narrative coherence. Reply with only:
                 ],
                 "temperature": temperature,
                 "max_tokens": max_tokens,
-                "stream": True
+                "stream": True,
+                # Reuse KV cache for the shared prompt prefix (llama.cpp)
+                "cache_prompt": True
             }
 
             try:
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the Expositional Engineering Planner
+
+Tests:
+1. Warning-to-module indexing (Aho-Corasick and substring fallback)
+2. Narrative context augmentation of subtasks
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+import orchestrator.ee_planner as ee_planner
+from orchestrator.ee_planner import EEPlannerAgent
+
+
+@pytest.fixture(params=["ahocorasick", "substring"])
+def planner(request, monkeypatch):
+    """Planner without a world model, run against both matching backends"""
+    if request.param == "ahocorasick":
+        if not ee_planner.AHOCORASICK_AVAILABLE:
+            pytest.skip("pyahocorasick not installed")
+    else:
+        monkeypatch.setattr(ee_planner, "AHOCORASICK_AVAILABLE", False)
+    return EEPlannerAgent.__new__(EEPlannerAgent)
+
+
+def _reference_warnings(target_modules, warnings):
+    """Original per-subtask substring matching"""
+    matched = []
+    for module in target_modules:
+        for warning in warnings:
+            if module in warning:
+                matched.append(warning)
+    return matched
+
+
+WARNINGS = [
+    "[WARNING]  Critical dependency: a → ab is part of 'Auth Flow' narrative",
+    "[WARNING]  Business narrative 'Ab Flow' may be affected. Consider including modules: ab",
+    "[WARNING]  auth calls db directly",
+    "[WARNING]  nothing to see here",
+]
+
+
+class TestWarningIndex:
+    """Test module -> warnings index"""
+
+    def test_overlapping_module_names(self, planner):
+        index = planner._index_warnings_by_module({"a", "ab"}, WARNINGS)
+
+        for module in ("a", "ab"):
+            assert index.get(module, []) == _reference_warnings([module], WARNINGS)
+
+    def test_warning_naming_two_modules(self, planner):
+        index = planner._index_warnings_by_module({"auth", "db"}, WARNINGS)
+
+        assert index["auth"] == [WARNINGS[2]]
+        assert index["db"] == [WARNINGS[2]]
+
+    def test_empty_inputs(self, planner):
+        assert planner._index_warnings_by_module(set(), WARNINGS) == {}
+        assert planner._index_warnings_by_module({"a"}, []) == {}
+
+
+class TestNarrativeAugmentation:
+    """Test subtask augmentation with EE context"""
+
+    def test_subtask_warnings_match_reference(self, planner):
+        raw_subtasks = {"subtasks": [
+            {"description": "one", "target_modules": ["a", "ab"]},
+            {"description": "two", "target_modules": ["auth", "db"]},
+            {"description": "three", "target_modules": ["missing"]},
+        ]}
+        context = {"melodic_lines": [], "patterns": [], "warnings": WARNINGS}
+
+        enhanced = planner._augment_with_narrative_context(raw_subtasks, context)
+
+        assert len(enhanced) == 3
+        for subtask, raw in zip(enhanced, raw_subtasks["subtasks"]):
+            assert list(subtask.warnings) == _reference_warnings(raw["target_modules"], WARNINGS)
+            assert subtask.target_modules == tuple(raw["target_modules"])
+
+
+    def test_narratives_stored_by_name_and_hashable(self, planner):
+        from orchestrator.ee_world_model import MelodicLine
+
+        raw_subtasks = {"subtasks": [
+            {"description": "one", "target_modules": ["auth"], "preserves_narratives": ["Auth Flow", "Gone"]},
+        ]}
+        context = {
+            "melodic_lines": [MelodicLine("Auth Flow", ["auth", "db"], 0.5, 0.4, "login", [("auth", "db")])],
+            "patterns": [],
+            "warnings": [],
+        }
+
+        (subtask,) = planner._augment_with_narrative_context(raw_subtasks, context)
+
+        assert subtask.relevant_narratives == ("Auth Flow",)
+        assert {subtask: 1}[subtask] == 1
+
+class TestNarrativePrompt:
+    """Test narrative prompt construction"""
+
+    @pytest.fixture
+    def context(self):
+        from orchestrator.ee_world_model import MelodicLine, ArchitecturalPattern
+
+        return {
+            "melodic_lines": [MelodicLine("Auth Flow", ["auth", "db"], 0.5, 0.4, "login", [("auth", "db")])],
+            "patterns": [ArchitecturalPattern("MVC", [{"module": "auth"}], 0.7)],
+            "modules": ["auth", "db"],
+            "confidence": {"auth": 0.6, "db": 0.4},
+            "dependencies": [{"from": "auth", "to": "db", "critical": True}],
+            "warnings": ["auth calls db"],
+        }
+
+    def test_full_prompt_contains_instructions(self, planner, context):
+        prompt = planner._construct_narrative_prompt("add 2FA", context)
+
+        assert "TASK: add 2FA" in prompt
+        assert ee_planner._NARRATIVE_INSTRUCTIONS in prompt
+        assert prompt.endswith("Begin:\n")
+        assert '"subtasks": [' in prompt
+        assert "- auth (relevance: 0.600)" in prompt
+        assert "- auth → db [🔴 CRITICAL]" in prompt
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Tests for the Expositional Engineering Codebase World Model
+
+Tests:
+1. Zellner-Slow Bayesian updater (posteriors, top-k, history)
+2. World model construction from a small on-disk codebase
+3. Hierarchical queries (modules, dependencies, warnings)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+from orchestrator.ee_world_model import (
+    ZellnerSlowBayesianUpdater,
+    CodebaseWorldModel,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_world_model_cache(monkeypatch):
+    """Keep tests off the user's on-disk world model cache"""
+    import orchestrator.ee_world_model as world_model
+    monkeypatch.setattr(world_model, "WORLD_MODEL_CACHE_DIR", "")
+
+
+@pytest.fixture
+def sample_codebase(tmp_path):
+    """Small codebase with cross-module calls"""
+    (tmp_path / "auth.py").write_text(
+        "import db\n"
+        "\n"
+        "def login_user(name):\n"
+        "    user = db.load_user(name)\n"
+        "    return check_password(user)\n"
+        "\n"
+        "def check_password(user):\n"
+        "    return bool(user)\n"
+        "\n"
+        "class Session:\n"
+        "    def start_session(self):\n"
+        "        return login_user('x')\n"
+    )
+    (tmp_path / "db.py").write_text(
+        "def load_user(name):\n"
+        "    return fetch_row(name)\n"
+        "\n"
+        "def fetch_row(key):\n"
+        "    return {'key': key}\n"
+    )
+    (tmp_path / "broken.py").write_text(
+        "def ok_function(a):\n"
+        "    pass\n"
+        "def broken(:\n"
+    )
+    return tmp_path
+
+
+class TestBayesianUpdater:
+    """Test Zellner-Slow Bayesian updater"""
+
+    def test_uniform_priors(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b", "c", "d"])
+        for module in ["a", "b", "c", "d"]:
+            assert updater.get_posterior(module) == pytest.approx(0.25)
+        assert updater.get_posterior("missing") == 0.0
+
+    def test_update_normalises(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b", "c"])
+        updater.update({"a": 0.9, "b": 0.1})
+
+        assert updater.get_posterior("a") == pytest.approx(0.9)
+        assert updater.get_posterior("b") == pytest.approx(0.1)
+        # Unobserved modules drop out of the posterior
+        assert updater.get_posterior("c") == 0.0
+        assert sum(updater.posteriors.values()) == pytest.approx(1.0)
+
+    def test_zero_evidence_keeps_beliefs(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b"])
+        updater.update({"a": 0.0, "unknown": 1.0})
+
+        assert updater.get_posterior("a") == pytest.approx(0.5)
+        assert updater.get_posterior("b") == pytest.approx(0.5)
+
+    def test_top_modules_ordered(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b", "c", "d"])
+        updater.update({"a": 0.1, "b": 0.6, "c": 0.3})
+
+        top = updater.get_top_modules(k=2)
+        assert [module for module, _ in top] == ["b", "c"]
+        assert top[0][1] == pytest.approx(0.6)
+
+    def test_history_recorded(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b"])
+        updater.update({"a": 0.5, "b": 0.5})
+        updater.update({"a": 0.8, "b": 0.2})
+        assert len(updater.history) == 2
+
+    def test_empty_modules(self):
+        updater = ZellnerSlowBayesianUpdater([])
+        updater.update({"a": 1.0})
+        assert updater.get_top_modules() == []
+        assert updater.posteriors == {}
+
+
+class TestCodebaseWorldModel:
+    """Test world model construction and queries"""
+
+    def test_structural_layer(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+
+        assert set(model.L1_module_registry) == {"auth", "db", "broken"}
+        auth = model.L1_module_registry["auth"]
+        assert {f["name"] for f in auth.functions} == {
+            "login_user", "check_password", "start_session"
+        }
+        assert [c["name"] for c in auth.classes] == ["Session"]
+        assert "db" in auth.imports
+
+        login = next(f for f in auth.functions if f["name"] == "login_user")
+        assert "load_user" in login["calls"]
+        assert "check_password" in login["calls"]
+
+    def test_module_record_columns(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        db = model.L1_module_registry["db"]
+
+        assert db.names == ["load_user", "fetch_row"]
+        assert db.lines.tolist() == [1, 4]
+        assert db.calls_offsets.tolist() == [0, 1, 1]
+        assert db.calls_of(0) == ["fetch_row"]
+        assert db.calls_of(1) == []
+
+    def test_syntax_error_fallback(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+
+        broken = model.L1_module_registry["broken"]
+        assert [(f["name"], f["line"]) for f in broken.functions] == [("ok_function", 1)]
+
+    def test_query_with_context(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        context = model.query_with_context("fix login for users")
+
+        for key in ("code", "melodic_lines", "patterns", "modules",
+                    "dependencies", "confidence", "warnings"):
+            assert key in context
+        assert set(context["modules"]) <= set(model.L1_module_registry)
+        for module, confidence in context["confidence"].items():
+            assert 0.0 <= confidence <= 1.0
+
+    def test_query_melodic_lines_matches_scan(self, sample_codebase):
+        from orchestrator.ee_world_model import MelodicLine
+
+        def reference(lines, task):
+            task_lower = task.lower()
+            scored = []
+            for line in lines:
+                score = 0.0
+                if any(w in line.name.lower() for w in task_lower.split()):
+                    score += 0.5
+                if any(w in line.business_description.lower() for w in task_lower.split()):
+                    score += 0.3
+                score += line.coherence_score * 0.2
+                scored.append((line, score))
+            scored.sort(key=lambda x: x[1], reverse=True)
+            return [line for line, score in scored[:5] if score > 0.1]
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        model.L3_melodic_lines = [
+            MelodicLine(f"{name} Flow", [name], coherence, 0.5, desc, [])
+            for name, coherence, desc in [
+                ("Authentication", 0.9, "user login handling"),
+                ("Database", 0.3, "query persistence"),
+                ("Billing", 0.8, "invoice authoring"),
+                ("Cache", 0.7, "warm lookups"),
+                ("Search", 0.2, "indexing"),
+                ("Logging", 0.6, "audit trail"),
+                ("Metrics", 0.6, "counters"),
+                ("Queue", 0.4, "background jobs"),
+            ]
+        ]
+        model._index_melodic_lines()
+
+        for task in ["fix auth login", "Query the DATABASE", "nothing relevant",
+                     "flow", "author", ""]:
+            assert model._query_melodic_lines(task) == reference(model.L3_melodic_lines, task)
+
+    def test_critical_dependency_lookup(self, sample_codebase):
+        from orchestrator.ee_world_model import MelodicLine
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        model.L3_melodic_lines = [
+            MelodicLine("Auth Flow", ["auth", "db"], 0.5, 0.4, "login", [("auth", "db")]),
+            MelodicLine("Db Flow", ["db", "cache"], 0.5, 0.4, "rows", [("db", "cache")]),
+        ]
+        model._index_melodic_lines()
+
+        assert model._is_critical_dependency("auth.login_user", "db.load_user")
+        assert model._is_critical_dependency("db.load_user", "cache.get")
+        assert not model._is_critical_dependency("db.load_user", "auth.login_user")
+
+    def test_concept_graph_into_target(self, sample_codebase):
+        import networkx as nx
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        target = nx.DiGraph()
+        expected = nx.DiGraph()
+        for module, record in model.L1_module_registry.items():
+            returned = model._extract_concept_graph(module, record, target_graph=target)
+            assert returned is target
+            expected = nx.compose(expected, model._extract_concept_graph(module, record))
+
+        assert dict(target.nodes(data=True)) == dict(expected.nodes(data=True))
+        assert set(target.edges()) == set(expected.edges())
+
+    def test_fetch_code(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        (sample_codebase / "db.py").write_text("x = 1\n" * 1000)
+
+        code = model._fetch_code(["auth", "unknown", "db"])
+
+        assert code.index("# Module: auth") < code.index("# Module: db")
+        assert "def login_user(name):" in code
+        db_snippet = code[code.index("# Module: db"):]
+        assert db_snippet.count("x = 1") == 2000 // len("x = 1\n")
+        assert model._fetch_code(["unknown"]) == "\n\n" + "=" * 80
+
+    def test_extract_dependencies(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        assert set(model._module_to_nodes["db"]) == {"db.load_user", "db.fetch_row"}
+
+        # Resolved cross-module call (unqualified calls stay bare names)
+        model.L1_call_graph.add_edge("auth.login_user", "db.load_user", weight=1.0)
+        model._freeze_call_graph()
+        deps = model._extract_dependencies(["auth", "db"])
+
+        assert [(d["from"], d["to"], d["function"], d["calls"]) for d in deps] == [
+            ("auth", "db", "auth.login_user", "db.load_user")
+        ]
+        assert model._extract_dependencies(["auth"]) == []
+
+    def test_frozen_call_graph_matches_networkx(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        graph = model.L1_call_graph
+
+        assert model._node_list == list(graph.nodes())
+        for i, node in enumerate(model._node_list):
+            succ = model._succ_indices[model._succ_indptr[i]:model._succ_indptr[i + 1]]
+            assert [model._node_list[j] for j in succ] == list(graph.successors(node))
+        assert model._node_module[model._node_idx["db.load_user"]] == "db"
+
+    def test_thematic_pagerank_matches_reference(self, sample_codebase):
+        import networkx as nx
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        graph = nx.DiGraph()
+        graph.add_node("m.load_user", module="m", name="load_user")
+        graph.add_node("m.load_config", module="m", name="load_config")
+        graph.add_node("n.save_user", module="n", name="save_user")
+        graph.add_node("n.user", module="n", name="user")
+        graph.add_edge("m.load_user", "m.load_config", weight=1.0)
+        graph.add_edge("m.load_user", "n.save_user", weight=2.0)
+        graph.add_edge("n.save_user", "n.user", weight=1.0)
+
+        scores = model._thematic_pagerank(graph, alpha=0.85)
+
+        # Spec Algorithm 3.1 over edge weights w · theme_weight = 0.5, 0.667,
+        # 0.75: no teleport of dangling mass, so scores sum to less than 1
+        expected = {
+            "m.load_user": 0.0375,
+            "m.load_config": 0.051161,
+            "n.save_user": 0.055714,
+            "n.user": 0.084857,
+        }
+        for node, score in expected.items():
+            assert scores[node] == pytest.approx(score, abs=1e-5)
+
+    def test_thematic_pagerank_empty_graph(self, sample_codebase):
+        import networkx as nx
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        assert model._thematic_pagerank(nx.DiGraph()) == {}
+
+    def test_theme_weight_jaccard(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+
+        # {load, user} vs {save, user}: 1 shared of 3 tokens, cross-module
+        weight = model._compute_theme_weight(
+            {"name": "load_user", "module": "a"},
+            {"name": "Save_User", "module": "b"},
+        )
+        assert weight == pytest.approx(1 / 3)
+
+        # Same module boosts by 1.5x, capped at 1.0
+        same = model._compute_theme_weight(
+            {"name": "load_user", "module": "a"},
+            {"name": "save_user", "module": "a"},
+        )
+        assert same == pytest.approx(0.5)
+        capped = model._compute_theme_weight(
+            {"name": "load_user", "module": "a"},
+            {"name": "load_user", "module": "a"},
+        )
+        assert capped == 1.0
+
+    def test_parallel_parse_matches_serial(self, sample_codebase, monkeypatch):
+        import orchestrator.ee_world_model as world_model
+
+        serial = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        monkeypatch.setattr(world_model, "PARALLEL_PARSE_MIN_FILES", 1)
+        parallel = CodebaseWorldModel(codebase_path=str(sample_codebase))
+
+        assert parallel.L1_module_registry.keys() == serial.L1_module_registry.keys()
+        for module, record in serial.L1_module_registry.items():
+            other = parallel.L1_module_registry[module]
+            assert (other.path, other.functions, other.classes, other.imports) == \
+                (record.path, record.functions, record.classes, record.imports)
+        assert set(parallel.L1_call_graph.edges()) == set(serial.L1_call_graph.edges())
+
+    def test_concept_graph_resolves_local_calls(self, sample_codebase):
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        graph = model._extract_concept_graph("auth", model.L1_module_registry["auth"])
+
+        assert graph.has_edge("auth.login_user", "auth.check_password")
+        assert graph.has_edge("auth.start_session", "auth.login_user")
+        # Calls into other modules are not resolved at this level
+        assert not any(v.endswith("load_user") for _, v in graph.edges())
+        assert graph.nodes["auth.Session"]["type"] == "class"
+
+    def test_pagerank_kernels_agree(self, sample_codebase):
+        import networkx as nx
+        import orchestrator.ee_world_model as world_model
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        graph = nx.gnp_random_graph(40, 0.1, seed=7, directed=True)
+        graph = nx.relabel_nodes(graph, {i: f"m{i % 3}.fn_{i % 5}_{i}" for i in graph})
+        for node in graph:
+            module, name = node.split(".")
+            graph.nodes[node].update(module=module, name=name)
+
+        nodes = list(graph.nodes())
+        csr = model._build_pagerank_csr(graph, nodes)
+        expected = world_model._pagerank_iterate_numpy(*csr, 0.85, 1e-10, 500)
+
+        loop = world_model._pagerank_iterate_kernel(*csr, 0.85, 1e-10, 500)
+        assert loop == pytest.approx(expected, abs=1e-8)
+        if world_model.NUMBA_AVAILABLE:
+            jit = world_model._pagerank_iterate_jit(*csr, 0.85, 1e-10, 500)
+            assert jit == pytest.approx(expected, abs=1e-8)
+
+    def test_longest_path(self, sample_codebase):
+        import networkx as nx
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        dag = nx.DiGraph([("a.f", "b.g"), ("b.g", "c.h"), ("a.f", "c.h"), ("c.h", "d.i")])
+        assert model._longest_path(dag, {}) == ["a.f", "b.g", "c.h", "d.i"]
+
+        cyclic = nx.DiGraph([("a.f", "b.g"), ("b.g", "a.f"), ("b.g", "c.h")])
+        scores = {"a.f": 0.5, "b.g": 0.3, "c.h": 0.2}
+        assert model._longest_path(cyclic, scores) == ["a.f", "b.g", "c.h"]
+
+        line = model._extract_melodic_line(set(dag), dag, {})
+        assert line.critical_paths == [("a", "b"), ("b", "c"), ("c", "d")]
+
+    def test_disk_cache_roundtrip(self, sample_codebase, tmp_path_factory, monkeypatch):
+        import orchestrator.ee_world_model as world_model
+
+        cache_dir = tmp_path_factory.mktemp("cache")
+        monkeypatch.setattr(world_model, "WORLD_MODEL_CACHE_DIR", str(cache_dir))
+        built = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        assert len(list(cache_dir.glob("*.pkl"))) == 1
+
+        monkeypatch.setattr(CodebaseWorldModel, "_build_structural_layer",
+                            lambda self, files=None: pytest.fail("cache not used"))
+        cached = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        assert set(cached.L1_module_registry) == set(built.L1_module_registry)
+        assert list(cached.L1_call_graph.edges()) == list(built.L1_call_graph.edges())
+        assert cached._node_list == built._node_list
+        assert cached.belief_updater.modules == built.belief_updater.modules
+
+        # Touching a file changes the key and forces a rebuild
+        monkeypatch.undo()
+        monkeypatch.setattr(world_model, "WORLD_MODEL_CACHE_DIR", str(cache_dir))
+        (sample_codebase / "db.py").write_text("def load_user(name):\n    return name\n")
+        rebuilt = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        assert "db.fetch_row" not in rebuilt.L1_call_graph
+        assert len(list(cache_dir.glob("*.pkl"))) == 2
+
+    def test_disk_cache_ignores_corrupt_file(self, sample_codebase, tmp_path_factory, monkeypatch):
+        import orchestrator.ee_world_model as world_model
+
+        cache_dir = tmp_path_factory.mktemp("cache")
+        monkeypatch.setattr(world_model, "WORLD_MODEL_CACHE_DIR", str(cache_dir))
+        CodebaseWorldModel(codebase_path=str(sample_codebase))
+        (cache_file,) = cache_dir.glob("*.pkl")
+        cache_file.write_bytes(b"not a pickle")
+
+        model = CodebaseWorldModel(codebase_path=str(sample_codebase))
+        assert "auth" in model.L1_module_registry
+
+    def test_parallel_parse_process_exits(self, sample_codebase):
+        import subprocess
+        import textwrap
+
+        repo_root = os.path.join(os.path.dirname(__file__), '..')
+        script = textwrap.dedent(f"""
+            import orchestrator.ee_world_model as world_model
+            world_model.PARALLEL_PARSE_MIN_FILES = 1
+            for _ in range(2):
+                model = world_model.CodebaseWorldModel(codebase_path={str(sample_codebase)!r}, use_cache=False)
+                assert "auth" in model.L1_module_registry
+        """)
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=repo_root,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.returncode == 0, result.stderr
+
+
+class TestBayesianUpdaterTopK:
+    """Test top-k selection and history alignment"""
+
+    def test_top_modules_partial_selection(self):
+        modules = [f"m{i}" for i in range(50)]
+        updater = ZellnerSlowBayesianUpdater(modules)
+        updater.update({f"m{i}": float(i + 1) for i in range(50)})
+
+        top = updater.get_top_modules(k=3)
+        assert [module for module, _ in top] == ["m49", "m48", "m47"]
+        assert updater.get_top_modules(k=100)[-1][0] == "m0"
+        assert updater.get_top_modules(k=0) == []
+
+    def test_top_modules_ties_keep_module_order(self):
+        modules = [f"m{i}" for i in range(40)]
+        updater = ZellnerSlowBayesianUpdater(modules)
+        updater.update({m: (2.0 if m in ("m3", "m30") else 1.0) for m in modules})
+
+        expected = sorted(updater.posteriors.items(), key=lambda x: x[1], reverse=True)[:5]
+        assert [m for m, _ in updater.get_top_modules(k=5)] == [m for m, _ in expected]
+        assert [m for m, _ in expected] == ["m3", "m30", "m0", "m1", "m2"]
+
+    def test_history_aligned_with_modules(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b", "c"])
+        updater.update({"b": 1.0})
+
+        snapshot = updater.history[-1]
+        assert snapshot["likelihoods"][updater.module_idx["b"]] == pytest.approx(1.0)
+        assert snapshot["posteriors"][updater.module_idx["b"]] == pytest.approx(1.0)
+        assert snapshot["posteriors"][updater.module_idx["a"]] == 0.0
+
+
+    def test_history_bounded(self):
+        updater = ZellnerSlowBayesianUpdater(["a", "b"], history_cap=3)
+        for i in range(10):
+            updater.update({"a": 1.0, "b": float(i + 1)})
+
+        assert len(updater.history) == 3
+        assert updater.history[-1]["likelihoods"].tolist() == [1.0, 10.0]
+
+    def test_history_file(self, tmp_path):
+        import json
+
+        path = tmp_path / "history.ndjson"
+        updater = ZellnerSlowBayesianUpdater(["a", "b"], history_cap=1, history_file=str(path))
+        for _ in range(3):
+            updater.update({"a": 1.0, "b": 3.0})
+        updater.close()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(lines) == 3
+        assert lines[0]["likelihoods"] == [1.0, 3.0]
+        assert lines[0]["posteriors"] == pytest.approx([0.25, 0.75], abs=1e-3)
+
+class TestParseCodeStructure:
+    """Test AST structure extraction"""
+
+    def test_breadth_first_order(self):
+        from orchestrator.ee_world_model import _parse_code_structure
+
+        source = (
+            "class Service:\n"
+            "    def handle(self):\n"
+            "        def inner():\n"
+            "            return helper()\n"
+            "        return inner()\n"
+            "\n"
+            "def helper():\n"
+            "    return len([])\n"
+        )
+        parsed = _parse_code_structure(source, "service.py")
+
+        # Same ordering as ast.walk: shallower definitions first
+        assert [f["name"] for f in parsed["functions"]] == ["helper", "handle", "inner"]
+        handle = parsed["functions"][1]
+        # Calls in nested functions are credited to every enclosing function
+        assert sorted(handle["calls"]) == ["helper", "inner"]
+        assert parsed["functions"][2]["calls"] == ["helper"]
+
+    def test_module_name_for(self, tmp_path):
+        from orchestrator.ee_world_model import _module_name_for
+
+        root = str(tmp_path)
+        assert _module_name_for(str(tmp_path / "pkg" / "auth.py"), root) == "pkg.auth"
+        assert _module_name_for(str(tmp_path / "pkg.py" / "mod.py"), root) == "pkg.py.mod"
+        assert _module_name_for(str(tmp_path / "README"), root) == "README"
+        with pytest.raises(ValueError):
+            _module_name_for("/elsewhere/x.py", root)
+
+    def test_regex_fallback_line_numbers(self):
+        from orchestrator.ee_world_model import _parse_code_structure
+
+        source = "def first(a):\n    pass\n\n\ndef second(b, c):\n    x = (\ndef broken(:\n\n  def nested():\n"
+        parsed = _parse_code_structure(source, "broken.py")
+
+        assert [(f['name'], f['line']) for f in parsed['functions']] == [
+            ("first", 1), ("second", 5), ("broken", 7)
+        ]
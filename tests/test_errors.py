@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the Error Handling System
+
+Tests:
+1. UserError construction and user-facing formatting
+2. create_user_error logging
+3. Conversion helpers and convenience factories
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import logging
+import pytest
+from orchestrator.errors import (
+    ErrorCategory,
+    ErrorLevel,
+    UserError,
+    create_user_error,
+    ensure_user_error,
+    file_not_found_error,
+)
+
+
+class TestUserError:
+    """Test UserError formatting"""
+
+    def test_format_for_user(self):
+        error = UserError(
+            "Disk full",
+            category=ErrorCategory.RESOURCE,
+            suggestions=["Free some space"],
+            context={"path": "/tmp", "sizes": [1, 2]},
+            cause=OSError("ENOSPC"),
+        )
+
+        assert error.format_for_user() == (
+            "Error: Disk full\n"
+            "Category: resource\n"
+            "\nSuggestions:\n"
+            "  • Free some space\n"
+            "\nContext:\n"
+            "  path: /tmp\n"
+            "  sizes: [\n  1,\n  2\n]\n"
+            "\nOriginal error: OSError: ENOSPC"
+        )
+        assert str(error) == "Disk full"
+
+    def test_enum_members_are_strings(self):
+        import json
+
+        assert ErrorCategory.GIT == "git"
+        assert f"{ErrorLevel.MINOR}" == str(ErrorLevel.MINOR) == "minor"
+        assert json.dumps({"category": ErrorCategory.GIT}) == '{"category": "git"}'
+        assert repr(UserError("x", category=ErrorCategory.GIT)) == (
+            "UserError(message='x', category=git, level=error, recoverable=True)"
+        )
+
+    def test_attributes_stored_in_slots(self):
+        error = UserError("x", context={"a": 1}, code="E1")
+
+        assert vars(error) == {}
+        assert (error.code, error.context) == ("E1", {"a": 1})
+
+    def test_empty_defaults_shared_and_read_only(self):
+        first, second = UserError("a"), UserError("b", suggestions=[], context={})
+
+        assert first.suggestions == () and first.suggestions is second.suggestions
+        assert first.context is second.context
+        with pytest.raises(TypeError):
+            first.context["key"] = "value"
+
+    def test_format_minimal(self):
+        assert UserError("Oops").format_for_user() == "Error: Oops"
+
+
+@pytest.fixture(autouse=True)
+def fresh_log_budget(monkeypatch):
+    """Isolate the error-storm log budget between tests"""
+    import orchestrator.errors as errors
+    monkeypatch.setattr(errors, "_log_budget", {})
+
+
+class TestCreateUserError:
+    """Test error creation and logging"""
+
+    def test_logs_with_extra(self, caplog):
+        with caplog.at_level(logging.WARNING, logger="orchestrator.errors"):
+            create_user_error("bad input", category=ErrorCategory.VALIDATION,
+                              level=ErrorLevel.MINOR, context={"field": "x"})
+
+        (record,) = caplog.records
+        assert record.levelno == logging.WARNING
+        assert record.getMessage() == "User error: bad input"
+        assert record.category == "validation"
+        assert record.context == {"field": "x"}
+
+    def test_error_levels_log_as_error(self, caplog):
+        with caplog.at_level(logging.WARNING, logger="orchestrator.errors"):
+            create_user_error("boom", level=ErrorLevel.FATAL)
+
+        assert caplog.records[0].levelno == logging.ERROR
+
+    def test_error_storm_rate_limited(self, caplog, monkeypatch):
+        import orchestrator.errors as errors
+
+        clock = [100.0]
+        monkeypatch.setattr(errors.time, "monotonic", lambda: clock[0])
+        with caplog.at_level(logging.WARNING, logger="orchestrator.errors"):
+            for _ in range(25):
+                create_user_error("timeout", category=ErrorCategory.NETWORK)
+            create_user_error("other", category=ErrorCategory.NETWORK)
+            clock[0] += errors.LOG_BUDGET_WINDOW_SECONDS
+            create_user_error("timeout", category=ErrorCategory.NETWORK)
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert messages.count("User error: timeout") == errors.LOG_BUDGET_PER_WINDOW + 1
+        assert messages.count("User error: other") == 1
+        assert messages[-2:] == [
+            "Suppressed 15 repeats of user error: timeout",
+            "User error: timeout",
+        ]
+
+    def test_disabled_level_skips_logging(self, monkeypatch):
+        import orchestrator.errors as errors
+
+        calls = []
+        monkeypatch.setattr(errors.logger, "log", lambda *args, **kwargs: calls.append(args))
+        monkeypatch.setattr(errors.logger, "isEnabledFor", lambda level: level >= logging.ERROR)
+
+        error = create_user_error("quiet", level=ErrorLevel.WARNING)
+        create_user_error("loud", level=ErrorLevel.ERROR)
+
+        assert error.message == "quiet"
+        assert [args[0] for args in calls] == [logging.ERROR]
+
+
+class TestConversions:
+    """Test ensure_user_error and factories"""
+
+    def test_ensure_user_error(self):
+        original = UserError("already")
+        assert ensure_user_error(original) is original
+
+        converted = ensure_user_error(KeyError("missing"), category=ErrorCategory.CONFIG)
+        assert converted.message == "'missing'"
+        assert isinstance(converted.cause, KeyError)
+        assert converted.category == ErrorCategory.CONFIG
+
+    def test_ensure_user_error_default_message(self):
+        assert ensure_user_error(RuntimeError()).message == "An unexpected error occurred"
+        assert ensure_user_error(None, default_message="none").message == "none"
+
+    def test_ensure_user_error_stringifies_once(self):
+        class Counting(Exception):
+            calls = 0
+
+            def __str__(self):
+                Counting.calls += 1
+                return "counted"
+
+        assert ensure_user_error(Counting()).message == "counted"
+        assert Counting.calls == 1
+
+    def test_file_not_found_defaults(self):
+        error = file_not_found_error("a.py")
+
+        assert error.message == "File not found: a.py"
+        assert list(error.suggestions)[0] == "Check the file path is correct"
+        assert file_not_found_error("b.py").suggestions is error.suggestions
+        assert file_not_found_error("c.py", suggestions=["Look elsewhere"]).suggestions == ["Look elsewhere"]
+        assert error.context == {"path": "a.py"}
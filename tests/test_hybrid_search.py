@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Tests for Hybrid Search
+
+Tests:
+1. Keyword extraction from queries
+2. Parsing of find_references output in keyword search, caching and pool shutdown
+3. Merging and re-ranking of semantic + keyword results
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+from orchestrator.hybrid_search import HybridSearch
+
+
+REFS = {
+    "AuthService": (
+        "[DEF] orchestrator/auth.py:12 (definition)\n"
+        "[REF] orchestrator/api.py:40 (reference)\n"
+        "[REF] orchestrator/api.py:88 (reference)"
+    ),
+    "login": (
+        "[DEF] orchestrator/auth.py:30 (definition)\n"
+        "[REF] orchestrator/api.py:40 (reference)"
+    ),
+}
+
+
+class FakeMCP:
+    """Stands in for the MCP client's find_references"""
+
+    def __init__(self, refs=None):
+        self.refs = REFS if refs is None else refs
+        self.calls = []
+
+    def find_references(self, symbol):
+        self.calls.append(symbol)
+        return self.refs.get(symbol, f" No references found for '{symbol}'")
+
+
+class TestExtractKeywords:
+    """Test query -> keyword extraction"""
+
+    def test_drops_stop_words_and_short_words(self):
+        search = HybridSearch()
+        keywords = search._extract_keywords("how does the AuthService handle login in db")
+
+        assert keywords == ("AuthService", "handle", "login")
+
+    def test_memoised(self):
+        HybridSearch._extract_keywords.cache_clear()
+        first = HybridSearch()._extract_keywords("where is parse_config called")
+        second = HybridSearch()._extract_keywords("where is parse_config called")
+
+        assert first is second
+        assert HybridSearch._extract_keywords.cache_info().hits == 1
+
+
+class TestKeywordSearch:
+    """Test keyword search over find_references output"""
+
+    def test_parses_reference_lines(self):
+        search = HybridSearch(mcp_client=FakeMCP())
+        results = search.keyword_search("AuthService login", top_k=10)
+
+        assert [(r['file_path'], r['line_number'], r['ref_type']) for r in results] == [
+            ("orchestrator/auth.py", 12, "definition"),
+            ("orchestrator/auth.py", 30, "definition"),
+            ("orchestrator/api.py", 40, "reference"),
+            ("orchestrator/api.py", 88, "reference"),
+        ]
+        assert results[0]['score'] == 0.8
+        assert results[-1]['score'] == 0.6
+        # api.py:40 is referenced by both keywords; the first hit is kept
+        assert [r['keyword'] for r in results if r['line_number'] == 40] == ["AuthService"]
+
+    def test_skips_non_marker_lines(self):
+        refs = {"AuthService": (
+            "\n"
+            "Found 2 references:\n"
+            "[DEF] orchestrator/auth.py:12 (definition)\n"
+            "  [REF] indented.py:1 (reference)\n"
+            "[XYZ] other.py:3 (reference)\n"
+            "[REF]\nsplit.py:4 (reference)\n"
+            "[REF] windows.py:5 (reference)\r\n"
+        )}
+        search = HybridSearch(mcp_client=FakeMCP(refs=refs))
+        results = search.keyword_search("AuthService")
+
+        assert [(r['file_path'], r['line_number']) for r in results] == [
+            ("orchestrator/auth.py", 12), ("windows.py", 5)
+        ]
+
+    def test_repeated_query_served_from_cache(self):
+        mcp = FakeMCP()
+        search = HybridSearch(mcp_client=mcp)
+        first = search.keyword_search("AuthService login", top_k=10)
+        first[0]['score'] = -1  # callers get copies, not the cached dicts
+        second = search.keyword_search("AuthService login", top_k=10)
+
+        assert mcp.calls == ["AuthService", "login"]
+        assert second[0]['score'] == 0.8
+
+        search.invalidate_cache()
+        search.keyword_search("AuthService login", top_k=10)
+        assert len(mcp.calls) == 4
+
+    def test_failed_search_not_cached(self):
+        class FlakyMCP(FakeMCP):
+            def find_references(self, symbol):
+                self.calls.append(symbol)
+                if len(self.calls) == 1:
+                    raise ValueError("MCP unavailable")
+                return REFS.get(symbol, "")
+
+        mcp = FlakyMCP()
+        search = HybridSearch(mcp_client=mcp)
+        assert search.keyword_search("AuthService") == []
+        assert len(search.keyword_search("AuthService")) == 3
+        assert len(search.keyword_search("AuthService")) == 3
+        assert mcp.calls == ["AuthService", "AuthService"]
+
+    def test_cache_expires(self, monkeypatch):
+        import orchestrator.hybrid_search as hybrid_search
+
+        clock = [1000.0]
+        monkeypatch.setattr(hybrid_search.time, "time", lambda: clock[0])
+        mcp = FakeMCP()
+        search = HybridSearch(mcp_client=mcp, cache_ttl=10.0)
+        search.keyword_search("AuthService")
+        clock[0] += 11.0
+        search.keyword_search("AuthService")
+
+        assert mcp.calls == ["AuthService", "AuthService"]
+
+    def test_bytes_output(self):
+        text = REFS["AuthService"] + "\n[REF] orchestrator/caf\u00e9.py:3 (reference)"
+        expected = HybridSearch(mcp_client=FakeMCP(refs={"AuthService": text})).keyword_search("AuthService")
+
+        for buffer in (text.encode(), bytearray(text.encode()), memoryview(text.encode())):
+            search = HybridSearch(mcp_client=FakeMCP(refs={"AuthService": buffer}))
+            assert search.keyword_search("AuthService") == expected
+        assert expected[-1]['file_path'] == "orchestrator/caf\u00e9.py"
+
+    def test_keywords_queried_concurrently(self):
+        import threading
+
+        barrier = threading.Barrier(2, timeout=5)
+
+        class SlowMCP(FakeMCP):
+            def find_references(self, symbol):
+                barrier.wait()  # deadlocks unless both calls are in flight
+                return super().find_references(symbol)
+
+        mcp = SlowMCP()
+        search = HybridSearch(mcp_client=mcp)
+        results = search.keyword_search("AuthService login", top_k=10)
+
+        assert sorted(mcp.calls) == ["AuthService", "login"]
+        assert [r['keyword'] for r in results if r['line_number'] == 40] == ["AuthService"]
+
+    def test_close_shuts_down_pool(self):
+        search = HybridSearch(mcp_client=FakeMCP())
+        search.keyword_search("AuthService login")
+        pool = search._pool
+
+        search.close()
+        assert search._pool is None and pool._shutdown
+        search.close()  # idempotent
+
+    def test_no_references(self):
+        search = HybridSearch(mcp_client=FakeMCP(refs={}))
+        assert search.keyword_search("AuthService") == []
+
+    def test_without_mcp(self):
+        assert HybridSearch().keyword_search("AuthService") == []
+
+
+def _semantic(file_path, score, text="chunk"):
+    return {'text': text, 'score': score, 'metadata': {'file_path': file_path}}
+
+
+def _keyword(file_path, score, line_number=1):
+    return {'file_path': file_path, 'line_number': line_number, 'ref_type': 'reference',
+            'keyword': 'kw', 'score': score, 'source': 'keyword'}
+
+
+class TestMergeAndRerank:
+    """Test merging of semantic and keyword results"""
+
+    def test_hybrid_matches_boosted(self):
+        search = HybridSearch()
+        merged = search.merge_and_rerank(
+            [_semantic("a.py", 0.9), _semantic("b.py", 0.5)],
+            [_keyword("b.py", 0.8, line_number=7), _keyword("c.py", 0.6)],
+            top_k=5
+        )
+
+        assert [r['file_path'] for r in merged] == ["b.py", "a.py", "c.py"]
+        assert merged[0]['final_score'] == pytest.approx((0.5 * 0.6 + 0.8 * 0.4) * 1.2)
+        assert merged[0]['sources'] == ['semantic', 'keyword']
+        assert merged[0]['metadata']['line_number'] == 7
+        assert merged[1]['final_score'] == pytest.approx(0.9 * 0.6)
+        assert merged[2]['final_score'] == pytest.approx(0.6 * 0.4)
+
+    def test_top_k_keeps_input_order_on_ties(self):
+        search = HybridSearch()
+        semantic = [_semantic(f"f{i}.py", 0.5) for i in range(10)]
+        merged = search.merge_and_rerank(semantic, [], top_k=3)
+
+        assert [r['file_path'] for r in merged] == ["f0.py", "f1.py", "f2.py"]
+
+    def test_empty_inputs(self):
+        assert HybridSearch().merge_and_rerank([], [], top_k=5) == []
+
+    def test_single_source(self):
+        search = HybridSearch()
+        semantic_only = search.merge_and_rerank(
+            [_semantic("a.py", 0.5), _semantic("b.py", 0.9), _semantic("a.py", 0.7)], [], top_k=5
+        )
+        keyword_only = search.merge_and_rerank([], [_keyword("c.py", 0.6)], top_k=5)
+
+        # Repeat hits from the same backend still count as multiple sources
+        assert [(r['file_path'], r['sources']) for r in semantic_only] == [
+            ("b.py", ['semantic']), ("a.py", ['semantic', 'semantic'])
+        ]
+        assert semantic_only[1]['final_score'] == pytest.approx(0.7 * 0.6 * 1.2)
+        assert [(r['file_path'], r['final_score']) for r in keyword_only] == [
+            ("c.py", pytest.approx(0.6 * 0.4))
+        ]
+
+    def test_numpy_rerank_matches_python(self, monkeypatch):
+        import copy
+        import random
+        import orchestrator.hybrid_search as hybrid_search
+
+        rng = random.Random(3)
+        semantic = [_semantic(f"f{rng.randrange(150)}.py", round(rng.random(), 1)) for _ in range(200)]
+        keyword = [_keyword(f"f{rng.randrange(150)}.py", rng.choice([0.6, 0.8])) for _ in range(100)]
+        search = HybridSearch()
+
+        for top_k in (0, 5, 40, 500):
+            expected = search.merge_and_rerank(copy.deepcopy(semantic), copy.deepcopy(keyword), top_k)
+            monkeypatch.setattr(hybrid_search, "NUMPY_RERANK_MIN_RESULTS", 1)
+            actual = search.merge_and_rerank(copy.deepcopy(semantic), copy.deepcopy(keyword), top_k)
+            monkeypatch.undo()
+
+            assert [(r['file_path'], r['final_score']) for r in actual] == \
+                [(r['file_path'], r['final_score']) for r in expected]
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Tests for Kùzu Shared Workflow Memory
+
+Tests:
+1. Action writes (single, buffered and batched) and their PART_OF/LEADS_TO edges
+2. UTF-8 truncation of stored fields
+3. Low-durability mode
+4. Melodic line, agent context and swarm insight reads
+5. Statistics
+6. Background writer thread
+7. Schema initialisation
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+pytest.importorskip("kuzu")
+
+from orchestrator.kuzu_memory import SharedWorkflowMemory, _truncate_utf8
+
+
+@pytest.fixture
+def memory(tmp_path):
+    mem = SharedWorkflowMemory(db_path=str(tmp_path / "workflow_db"))
+    assert mem.enabled
+    mem.create_task("t1", "add login")
+    yield mem
+    mem.close()
+
+
+def _rows(memory, query, params=None):
+    result = memory.conn.execute(query, params or {})
+    rows = []
+    while result.has_next():
+        rows.append(result.get_next())
+    return rows
+
+
+def _chain(memory, task_id):
+    """(prev agent, curr agent) pairs along LEADS_TO edges in a task"""
+    return sorted(_rows(memory, """
+        MATCH (a:AgentAction)-[:LEADS_TO]->(b:AgentAction)
+        WHERE a.task_id = $task_id
+        RETURN a.agent, b.agent
+    """, {"task_id": task_id}))
+
+
+class TestAddAction:
+    """Test action nodes and edges"""
+
+    def test_single_actions_form_melodic_line(self, memory):
+        first = memory.add_action("t1", "planner", "plan", "in", "out", "because")
+        second = memory.add_action("t1", "coder", "generate_code", "in", "out", "then")
+
+        assert first and second and first != second
+        assert _rows(memory, """
+            MATCH (a:AgentAction)-[:PART_OF]->(t:Task {task_id: 't1'}) RETURN count(a)
+        """) == [[2]]
+        assert _chain(memory, "t1") == [["planner", "coder"]]
+        causal = _rows(memory, "MATCH ()-[r:LEADS_TO]->() RETURN r.causal_reasoning")
+        assert causal == [["coder builds on planner's output: then"]]
+
+    def test_buffered_actions_visible_to_reads(self, memory):
+        memory.add_action("t1", "planner", "plan", "in", "out", "r", flush=False)
+        memory.add_action("t1", "coder", "generate_code", "in", "out", "r", flush=False)
+
+        assert len(memory._pending_actions) == 2
+        assert memory.get_melodic_line("t1") is not None
+        assert memory._pending_actions == []
+        assert _chain(memory, "t1") == [["planner", "coder"]]
+
+    def test_batch_links_within_batch_and_to_stored_actions(self, memory):
+        memory.create_task("t2", "fix bug")
+        memory.add_action("t1", "preprocessor", "preprocess", "in", "out", "r")
+
+        ids = memory.add_actions_batch([
+            dict(task_id="t1", agent="planner", action_type="plan",
+                 input_data="in", output_data="out", reasoning="r"),
+            dict(task_id="t2", agent="planner", action_type="plan",
+                 input_data="in", output_data="out", reasoning="r"),
+            dict(task_id="t1", agent="coder", action_type="generate_code",
+                 input_data="in", output_data="out", reasoning="r"),
+            dict(task_id="t1", agent="reviewer", action_type="review",
+                 input_data="in", output_data="out", reasoning="r", link_to_previous=False),
+        ])
+
+        assert len(set(ids)) == 4 and None not in ids
+        assert _chain(memory, "t1") == [["planner", "coder"], ["preprocessor", "planner"]]
+        assert _chain(memory, "t2") == []
+
+    def test_failed_write_traceback_only_in_debug(self, memory, caplog):
+        import logging
+
+        first_id = memory.add_action("t1", "planner", "plan", "in", "out", "r")
+        memory._new_action_id = lambda task_id, agent: first_id
+
+        with caplog.at_level(logging.INFO, logger="orchestrator.kuzu_memory"):
+            assert memory.add_action("t1", "coder", "generate_code", "in", "out", "r") is None
+        with caplog.at_level(logging.DEBUG, logger="orchestrator.kuzu_memory"):
+            assert memory.add_action("t1", "coder", "generate_code", "in", "out", "r") is None
+
+        errors = [record for record in caplog.records if record.levelno == logging.ERROR]
+        assert [bool(record.exc_info) for record in errors] == [False, True]
+
+    def test_previous_action_tracked_in_process(self, memory, monkeypatch):
+        lookups = []
+        real_find = memory._find_previous_action
+        monkeypatch.setattr(memory, "_find_previous_action",
+                            lambda task_id: lookups.append(task_id) or real_find(task_id))
+
+        memory.add_action("t1", "planner", "plan", "in", "out", "r")
+        memory.add_action("t1", "coder", "generate_code", "in", "out", "r")
+        memory.add_action("t1", "reviewer", "review", "in", "out", "r")
+
+        assert lookups == ["t1"]
+        assert _chain(memory, "t1") == [["coder", "reviewer"], ["planner", "coder"]]
+
+    def test_previous_action_found_after_restart(self, tmp_path):
+        db_path = str(tmp_path / "restart_db")
+        mem = SharedWorkflowMemory(db_path=db_path)
+        mem.create_task("t1", "add login")
+        mem.add_action("t1", "planner", "plan", "in", "out", "r")
+        mem.close()
+
+        reopened = SharedWorkflowMemory(db_path=db_path)
+        reopened.add_action("t1", "coder", "generate_code", "in", "out", "r")
+        assert _chain(reopened, "t1") == [["planner", "coder"]]
+        reopened.close()
+
+    def test_same_millisecond_ids_unique(self, memory, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        monkeypatch.setattr(kuzu_memory.time, "time", lambda: 1000.0)
+        ids = memory.add_actions_batch([
+            dict(task_id="t1", agent="coder", action_type="generate_code",
+                 input_data="in", output_data="out", reasoning="r")
+            for _ in range(3)
+        ])
+
+        assert len(set(ids)) == 3
+
+    def test_failed_batch_rolled_back(self, memory, capsys):
+        first_id = memory.add_action("t1", "planner", "plan", "in", "out", "r")
+        # Reusing a stored primary key makes the node insert fail
+        memory._new_action_id = lambda task_id, agent: first_id
+
+        ids = memory.add_actions_batch([
+            dict(task_id="t1", agent="coder", action_type="generate_code",
+                 input_data="in", output_data="out", reasoning="r")
+        ])
+
+        assert ids == [None]
+        assert memory._pending_actions == []
+        assert "Traceback" not in capsys.readouterr().err
+        assert _rows(memory, "MATCH (a:AgentAction) RETURN count(a)") == [[1]]
+        assert _rows(memory, "MATCH ()-[r:LEADS_TO]->() RETURN count(r)") == [[0]]
+
+
+    def test_bad_row_in_batch_loses_only_itself(self, memory):
+        first_id = memory.add_action("t1", "planner", "plan", "in", "out", "r")
+        real_new_id = memory._new_action_id
+        # The second action reuses a stored primary key, so only its insert fails
+        ids = iter([None, first_id, None])
+        memory._new_action_id = lambda task_id, agent: next(ids) or real_new_id(task_id, agent)
+
+        result = memory.add_actions_batch([
+            dict(task_id="t1", agent=agent, action_type="step",
+                 input_data="in", output_data="out", reasoning="r")
+            for agent in ("coder", "reviewer", "tester")
+        ])
+
+        assert result[1] is None and None not in (result[0], result[2])
+        assert _rows(memory, "MATCH (a:AgentAction) RETURN count(a)") == [[3]]
+        assert _chain(memory, "t1") == [["coder", "tester"], ["planner", "coder"]]
+
+class TestTruncateUtf8:
+    """Test byte-bounded truncation"""
+
+    def test_short_text_returned_as_is(self):
+        for text in ("plain", "caf\u00e9", "\U0001F600" * 3):
+            assert _truncate_utf8(text, 20) is text
+
+    def test_ascii_sliced_by_length(self):
+        assert _truncate_utf8("x" * 30, 20) == "x" * 20
+
+    def test_multibyte_cut_on_character_boundary(self):
+        text = "\u00e9" * 15  # 30 bytes
+        assert _truncate_utf8(text, 21) == "\u00e9" * 10
+        assert _truncate_utf8("\U0001F600" * 10, 10) == "\U0001F600" * 2
+
+
+class TestDurability:
+    """Test durability settings"""
+
+    def test_low_durability_persists_after_close(self, tmp_path):
+        db_path = str(tmp_path / "workflow_db")
+        mem = SharedWorkflowMemory(db_path=db_path, durability="low")
+        assert _rows(mem, 'CALL current_setting("auto_checkpoint") RETURN *') == [["False"]]
+        mem.create_task("t1", "add login")
+        mem.add_action("t1", "planner", "plan", "in", "out", "r")
+        mem.close()
+
+        reopened = SharedWorkflowMemory(db_path=db_path)
+        assert _rows(reopened, 'CALL current_setting("auto_checkpoint") RETURN *') == [["True"]]
+        assert _rows(reopened, "MATCH (a:AgentAction) RETURN a.agent") == [["planner"]]
+        reopened.close()
+
+
+class TestReads:
+    """Test reads of the stored melodic line"""
+
+    @pytest.fixture
+    def memory(self, memory, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        clock = [1000.0]
+        monkeypatch.setattr(kuzu_memory.time, "time", lambda: clock[0])
+        for agent, action_type, output in [
+            ("preprocessor", "preprocess", "normalised request"),
+            ("planner", "plan", "x" * 300),
+            ("coder_1", "swarm_code", "approach one"),
+            ("coder_2", "swarm_code", "approach two"),
+        ]:
+            memory.add_action("t1", agent, action_type, "in", output, f"{agent} reasoning")
+            clock[0] += 1
+        return memory
+
+    def test_context_for_agent(self, memory):
+        context = memory.get_context_for_agent("t1", "coder")
+
+        assert context.startswith("[MELODIC LINE - Previous agent reasoning]")
+        assert context.index("PREPROCESSOR: preprocessor reasoning") < context.index("PLANNER:")
+        assert f"  Output: {'x' * 200}..." in context
+        assert context.endswith("[END MELODIC LINE]\n")
+        assert memory.get_context_for_agent("missing", "coder") == ""
+
+    def test_context_cached_until_next_action(self, memory, monkeypatch):
+        first = memory.get_context_for_agent("t1", "coder")
+        executed = []
+        real_execute = memory.conn.execute
+        monkeypatch.setattr(memory.conn, "execute",
+                            lambda *args: executed.append(args[0]) or real_execute(*args))
+
+        assert memory.get_context_for_agent("t1", "reviewer") == first
+        assert executed == []
+
+        memory.add_action("t1", "reviewer", "review", "in", "looks good", "approved")
+        executed.clear()
+        second = memory.get_context_for_agent("t1", "coder")
+        assert "REVIEWER: approved" in second
+        assert len(executed) == 1
+
+    def test_context_cache_expires_for_external_writes(self, memory, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        clock = [50.0]
+        monkeypatch.setattr(kuzu_memory.time, "monotonic", lambda: clock[0])
+        memory.get_context_for_agent("t1", "coder")
+
+        # Another writer adds an action this instance doesn't know about
+        memory.conn.execute("""
+            MATCH (t:Task {task_id: 't1'})
+            CREATE (:AgentAction {action_id: 'ext', task_id: 't1', agent: 'external',
+                                  action_type: 'x', input_data: '', output_data: 'o',
+                                  reasoning: 'from elsewhere', temperature: 0.0,
+                                  created_at: 5000})-[:PART_OF]->(t)
+        """)
+        assert "EXTERNAL:" not in memory.get_context_for_agent("t1", "coder")
+
+        clock[0] += kuzu_memory.CONTEXT_CACHE_TTL
+        assert "EXTERNAL: from elsewhere" in memory.get_context_for_agent("t1", "coder")
+
+    def test_context_truncated_to_budget(self, memory, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        monkeypatch.setattr(kuzu_memory, "CONTEXT_TOKENS_PER_ROW", 1)
+        context = memory.get_context_for_agent("t1", "coder", max_tokens=30)
+
+        # The newest actions are kept; the note sits where the older ones were
+        assert context.index("... (earlier actions truncated)") < context.index("CODER_1:")
+        assert context.index("CODER_1:") < context.index("CODER_2:")
+        assert "PLANNER:" not in context
+
+    def test_context_rows_capped_by_budget(self, memory, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        monkeypatch.setattr(kuzu_memory, "CONTEXT_TOKENS_PER_ROW", 2000)
+        context = memory.get_context_for_agent("t1", "coder", max_tokens=4000)
+
+        assert "... (earlier actions truncated)" in context
+        assert [agent for agent in ("PREPROCESSOR", "PLANNER", "CODER_1", "CODER_2")
+                if f"{agent}:" in context] == ["CODER_1", "CODER_2"]
+
+    def test_melodic_line(self, memory):
+        line = memory.get_melodic_line("t1")
+
+        assert [step["agent"] for step in line] == ["preprocessor", "planner", "coder_1", "coder_2"]
+        assert line[0] == {
+            "agent": "preprocessor",
+            "action_type": "preprocess",
+            "reasoning": "preprocessor reasoning",
+            "output": "normalised request",
+            "timestamp": 1000
+        }
+        assert memory.get_melodic_line("missing") == []
+
+    def test_swarm_insights(self, memory):
+        insights = memory.get_swarm_insights("t1", exclude_agent="coder_1")
+
+        assert "coder_2: coder_2 reasoning" in insights
+        assert "coder_1" not in insights
+        assert "planner" not in insights
+        assert memory.get_swarm_insights("missing") == "No other swarm members have contributed yet."
+
+    def test_swarm_insights_newest_first_and_limited(self, memory):
+        insights = memory.get_swarm_insights("t1")
+        assert insights.index("coder_2:") < insights.index("coder_1:")
+
+        limited = memory.get_swarm_insights("t1", limit=1)
+        assert "coder_2:" in limited and "coder_1:" not in limited
+
+
+class TestStats:
+    """Test workflow memory statistics"""
+
+    def test_counts(self, memory):
+        assert memory.get_stats()["total_tasks"] == 1
+        assert memory.get_stats()["swarm_coordination_links"] == 0
+
+        first = memory.add_action("t1", "coder_1", "swarm_code", "in", "out", "r")
+        second = memory.add_action("t1", "coder_2", "swarm_code", "in", "out", "r", flush=False)
+        memory.add_swarm_coordination(first, second, "built_on")
+
+        assert memory.get_stats() == {
+            "enabled": True,
+            "db_path": memory.db_path,
+            "total_tasks": 1,
+            "total_actions": 2,
+            "melodic_line_links": 1,
+            "swarm_coordination_links": 1
+        }
+
+
+class TestBackgroundWrites:
+    """Test queued writes through the writer thread"""
+
+    @pytest.fixture
+    def memory(self, tmp_path):
+        mem = SharedWorkflowMemory(db_path=str(tmp_path / "workflow_db"), background_writes=True)
+        mem.create_task("t1", "add login")
+        yield mem
+        mem.close()
+
+    def test_reads_wait_for_queued_actions(self, memory):
+        agents = ["preprocessor", "planner", "coder", "reviewer"]
+        ids = [memory.add_action("t1", agent, "step", "in", "out", "r") for agent in agents]
+
+        assert len(set(ids)) == 4
+        assert [step["agent"] for step in memory.get_melodic_line("t1")] == agents
+        assert len(_chain(memory, "t1")) == 3
+
+    def test_concurrent_writers(self, memory):
+        import threading
+
+        tasks = [f"task_{i}" for i in range(4)]
+        for task_id in tasks:
+            memory.create_task(task_id, "parallel")
+
+        def write(task_id):
+            for step in range(20):
+                memory.add_action(task_id, f"agent_{step}", "step", "in", "out", "r")
+
+        threads = [threading.Thread(target=write, args=(task_id,)) for task_id in tasks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = memory.get_stats()
+        assert stats["total_actions"] == 80
+        assert stats["melodic_line_links"] == 76
+        for task_id in tasks:
+            # Each task's chain follows its own write order
+            assert ("agent_0", "agent_1") in [tuple(pair) for pair in _chain(memory, task_id)]
+
+    def test_close_stops_writer(self, tmp_path):
+        mem = SharedWorkflowMemory(db_path=str(tmp_path / "writer_db"), background_writes=True)
+        writer = mem._writer
+        mem.create_task("t1", "add login")
+        mem.add_action("t1", "planner", "plan", "in", "out", "r")
+        mem.close()
+
+        assert not writer.is_alive()
+        reopened = SharedWorkflowMemory(db_path=str(tmp_path / "writer_db"))
+        assert [step["agent"] for step in reopened.get_melodic_line("t1")] == ["planner"]
+        reopened.close()
+
+
+class TestSchema:
+    """Test schema creation and the version sentinel"""
+
+    def test_sentinel_skips_catalog_probe(self, tmp_path, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        db_path = tmp_path / "workflow_db"
+        SharedWorkflowMemory(db_path=str(db_path)).close()
+        assert (db_path / kuzu_memory.SCHEMA_SENTINEL).read_text().strip() == str(kuzu_memory.SCHEMA_VERSION)
+
+        # A table that only a catalog probe would notice is missing
+        monkeypatch.setattr(kuzu_memory, "_SCHEMA_DDL", (
+            ("Extra", "CREATE NODE TABLE Extra(id STRING, PRIMARY KEY(id))"),
+        ))
+        reopened = SharedWorkflowMemory(db_path=str(db_path))
+        assert "Extra" not in {row[0] for row in _rows(reopened, "CALL show_tables() RETURN name")}
+        assert reopened.create_task("t1", "add login")
+        reopened.close()
+
+    def test_missing_tables_created_when_version_changes(self, tmp_path, monkeypatch):
+        import orchestrator.kuzu_memory as kuzu_memory
+
+        db_path = tmp_path / "workflow_db"
+        monkeypatch.setattr(kuzu_memory, "_SCHEMA_DDL", kuzu_memory._SCHEMA_DDL[:2])
+        SharedWorkflowMemory(db_path=str(db_path)).close()
+        monkeypatch.undo()
+
+        monkeypatch.setattr(kuzu_memory, "SCHEMA_VERSION", kuzu_memory.SCHEMA_VERSION + 1)
+        mem = SharedWorkflowMemory(db_path=str(db_path))
+        tables = {row[0] for row in _rows(mem, "CALL show_tables() RETURN name")}
+        assert tables == {"Task", "AgentAction", "PART_OF", "LEADS_TO", "COORDINATES_WITH"}
+        assert (db_path / kuzu_memory.SCHEMA_SENTINEL).read_text().strip() == str(kuzu_memory.SCHEMA_VERSION)
+        mem.close()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Tests for the MCP Client Wrapper
+
+Tests:
+1. Tool queries over a pooled HTTP client
+2. Async tool methods and their synchronous wrappers
+3. read_file caching
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import httpx
+import pytest
+import orchestrator.mcp_client_wrapper as mcp_client_wrapper
+from orchestrator.mcp_client_wrapper import MCPClientWrapper
+
+
+class FakeMCPServer:
+    """Answers /api/mcp/tool requests and counts clients created"""
+
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.requests = []
+        self.clients = 0
+
+    def handler(self, request):
+        body = json.loads(request.content)
+        self.requests.append((request.url.path, body["tool"], body["args"]))
+        if body["tool"] not in self.results:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"result": self.results[body["tool"]]})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeMCPServer({
+        "read_file": "print('hi')\n",
+        "analyze_codebase": json.dumps({"key_files": [{"path": "a.py"}, {"path": ""}]}),
+    })
+    real_client = httpx.AsyncClient
+
+    def make_client(**kwargs):
+        fake.clients += 1
+        return real_client(transport=httpx.MockTransport(fake.handler), **kwargs)
+
+    monkeypatch.setattr(mcp_client_wrapper.httpx, "AsyncClient", make_client)
+    return fake
+
+
+class TestQueryMCP:
+    """Test tool queries"""
+
+    async def test_client_reused_across_calls(self, server):
+        async with MCPClientWrapper(mcp_url="http://mcp.test") as wrapper:
+            assert await wrapper._query_mcp("read_file", {"path": "a.py"}) == "print('hi')\n"
+            assert await wrapper._query_mcp("read_file", {"path": "b.py"}) == "print('hi')\n"
+
+        assert server.clients == 1
+        assert server.requests[0] == ("/api/mcp/tool", "read_file", {"path": "a.py"})
+        assert wrapper._client is None
+
+    async def test_error_status_returns_empty(self, server):
+        wrapper = MCPClientWrapper(mcp_url="http://mcp.test")
+        assert await wrapper._query_mcp("find_references", {"symbol": "x"}) == ""
+        await wrapper.aclose()
+
+
+class TestToolMethods:
+    """Test async tool methods and sync wrappers"""
+
+    async def test_async_methods(self, server):
+        async with MCPClientWrapper(mcp_url="http://mcp.test") as wrapper:
+            assert await wrapper.read_file_async("a.py") == "print('hi')\n"
+            assert (await wrapper.analyze_codebase_async())["key_files"][0] == {"path": "a.py"}
+
+    def test_sync_wrappers_share_one_loop_and_client(self, server):
+        wrapper = MCPClientWrapper(mcp_url="http://mcp.test")
+        try:
+            assert wrapper.read_file("a.py") == "print('hi')\n"
+            assert wrapper.list_files(".") == ["a.py"]
+            assert wrapper.read_file("b.py") == "print('hi')\n"
+            assert wrapper._client_loop is mcp_client_wrapper._shared_loop
+        finally:
+            wrapper.close()
+
+        assert wrapper._client is None
+        assert server.clients == 1
+
+    def test_wrappers_share_background_loop(self, server):
+        first = MCPClientWrapper(mcp_url="http://mcp.test")
+        second = MCPClientWrapper(mcp_url="http://mcp.test")
+        first.read_file("a.py")
+        first.close()
+
+        # Closing one wrapper leaves the shared loop running for the other
+        assert second.read_file("a.py") == "print('hi')\n"
+        assert second._client_loop is mcp_client_wrapper._shared_loop
+        second.close()
+
+    def test_sync_call_timeout(self, server, monkeypatch):
+        import asyncio
+
+        async def hang(file_path):
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(mcp_client_wrapper, "SYNC_CALL_TIMEOUT", 0.05)
+        wrapper = MCPClientWrapper(mcp_url="http://mcp.test")
+        monkeypatch.setattr(wrapper, "read_file_async", hang)
+
+        assert wrapper.read_file("a.py") == ""
+
+    async def test_sync_wrapper_inside_running_loop(self, server):
+        wrapper = MCPClientWrapper(mcp_url="http://mcp.test")
+        try:
+            assert wrapper.read_file("a.py") == "print('hi')\n"
+        finally:
+            wrapper.close()
+
+    async def test_client_from_running_loop_closed_on_that_loop(self, server):
+        import asyncio
+
+        wrapper = MCPClientWrapper(mcp_url="http://mcp.test")
+        wrapper.read_file("a.py")
+        old_client = wrapper._client
+
+        assert await wrapper.read_file_async("b.py") == "print('hi')\n"
+        assert wrapper._client is not old_client
+        for _ in range(100):
+            if old_client.is_closed:
+                break
+            await asyncio.sleep(0.01)
+        assert old_client.is_closed
+        await wrapper.aclose()
+
+    def test_client_from_closed_loop_releases_connections(self):
+        import asyncio
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        disconnected = threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client pools the connection
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                body = json.dumps({"result": "ok"}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def finish(self):
+                super().finish()
+                disconnected.set()
+
+            def log_message(self, *args):
+                pass
+
+        http_server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        wrapper = MCPClientWrapper(mcp_url=f"http://127.0.0.1:{http_server.server_port}")
+        try:
+            assert asyncio.run(wrapper.read_file_async("a.py")) == "ok"
+            assert not disconnected.is_set()
+
+            # The first loop is closed, so the pooled connection is shut down directly
+            assert asyncio.run(wrapper.read_file_async("b.py")) == "ok"
+            assert disconnected.wait(timeout=5)
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+
+    def test_unparseable_analysis(self, server):
+        server.results["analyze_codebase"] = "not json"
+        wrapper = MCPClientWrapper(mcp_url="http://mcp.test")
+        try:
+            assert wrapper.analyze_codebase() == {"key_files": [], "total_files": 0}
+            assert wrapper.list_files(".") == []
+        finally:
+            wrapper.close()
+
+
+class TestReadFileCache:
+    """Test the read_file TTL/LRU cache"""
+
+    async def test_repeat_reads_cached_until_ttl(self, server, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr(mcp_client_wrapper.time, "monotonic", lambda: clock[0])
+        async with MCPClientWrapper(mcp_url="http://mcp.test") as wrapper:
+            await wrapper.read_file_async("a.py")
+            await wrapper.read_file_async("a.py")
+            assert len(server.requests) == 1
+
+            clock[0] += mcp_client_wrapper.READ_FILE_CACHE_TTL
+            await wrapper.read_file_async("a.py")
+            assert len(server.requests) == 2
+
+            wrapper.invalidate_cache()
+            await wrapper.read_file_async("a.py")
+            assert len(server.requests) == 3
+
+    async def test_lru_bound_and_failures_not_cached(self, server, monkeypatch):
+        monkeypatch.setattr(mcp_client_wrapper, "READ_FILE_CACHE_SIZE", 2)
+        async with MCPClientWrapper(mcp_url="http://mcp.test") as wrapper:
+            for path in ("a.py", "b.py", "a.py", "c.py"):
+                await wrapper.read_file_async(path)
+            assert list(wrapper._cache) == ["a.py", "c.py"]
+
+            del server.results["read_file"]
+            wrapper.invalidate_cache()
+            assert await wrapper.read_file_async("a.py") == ""
+            assert not wrapper._cache
@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+"""
+Tests for the MCP Codebase Server
+
+Tests:
+1. analyze_codebase structure, caching and invalidation, dependency extraction
+2. analyze_codebase endpoint ETag revalidation
+3. Byte-level line counting
+4. scandir file walker
+5. find_references
+6. git_diff, run_tests and streamed test runs
+7. Cached tool list
+8. Blocking work offloaded from endpoints
+9. Indexed search_docs
+10. read_file
+11. Persistent result cache
+12. Lazy RAG service loading
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+from pathlib import Path
+
+pytest.importorskip("fastapi")
+
+import orchestrator.mcp_server as mcp_server_module
+from orchestrator.mcp_server import CodebaseMCPServer
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "app.py").write_text("import os\nimport requests\n\nprint('hi')\n")
+    (tmp_path / "README.md").write_text("# Demo\n")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "dep.js").write_text("module.exports = 1\n")
+    return tmp_path
+
+
+class TestAnalyzeCodebaseCache:
+    """Test the analyze_codebase result cache"""
+
+    def test_repeat_calls_skip_the_walk(self, codebase, monkeypatch):
+        server = CodebaseMCPServer(str(codebase))
+        first = server.analyze_codebase()
+        assert first["total_files"] == 2
+        assert first["total_lines_of_code"] == 7
+
+        monkeypatch.setattr(server, "_analyze_codebase_uncached", lambda: pytest.fail("tree re-walked"))
+        first["total_files"] = -1  # callers get copies, not the cached dict
+        assert server.analyze_codebase()["total_files"] == 2
+
+    def test_new_top_level_entry_invalidates(self, codebase):
+        server = CodebaseMCPServer(str(codebase))
+        server.analyze_codebase()
+        signature = server._tree_signature()
+
+        (codebase / "extra.py").write_text("x = 1\n")
+        os.utime(codebase, ns=(0, signature + 1))
+        assert server.analyze_codebase()["total_files"] == 3
+
+    def test_ttl_expiry_and_explicit_invalidation(self, codebase, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr(mcp_server_module.time, "monotonic", lambda: clock[0])
+        server = CodebaseMCPServer(str(codebase))
+        server.analyze_codebase()
+
+        # Deep edits don't move top-level mtimes; the TTL bounds their staleness
+        (codebase / "pkg" / "app.py").write_text("print('hi')\n")
+        assert server.analyze_codebase()["total_lines_of_code"] == 7
+        clock[0] += mcp_server_module.ANALYZE_CACHE_TTL
+        assert server.analyze_codebase()["total_lines_of_code"] == 4
+
+        (codebase / "pkg" / "app.py").write_text("")
+        server.invalidate_analysis_cache()
+        assert server.analysis_etag() is None
+        assert server.analyze_codebase()["total_lines_of_code"] == 2
+
+
+class TestReadFile:
+    """Test read_file"""
+
+    def test_large_non_python_file_truncated_from_mmap(self, codebase, monkeypatch):
+        monkeypatch.setattr(mcp_server_module, "MMAP_MIN_SIZE", 1024)
+        monkeypatch.setattr(mcp_server_module, "MAX_FILE_SIZE_FOR_CHUNKING", 10)
+        (codebase / "big.md").write_text("\u00e9" * 2000)
+        server = CodebaseMCPServer(str(codebase))
+
+        assert server.read_file("big.md") == "\u00e9" * 10 + "\n\n... (truncated, file too large: 4000 bytes)"
+        assert server.read_file("big.md", chunked=False) == "\u00e9" * 2000
+        assert server.read_file("README.md") == "# Demo\n"
+
+    def test_python_chunks_cached_until_file_changes(self, codebase, monkeypatch):
+        monkeypatch.setattr(mcp_server_module, "MAX_FILE_SIZE_FOR_CHUNKING", 10)
+        path = codebase / "pkg" / "mod.py"
+        path.write_text("def alpha():\n    return 1\n")
+        server = CodebaseMCPServer(str(codebase))
+        calls = []
+        chunk = server._chunk_file
+        monkeypatch.setattr(server, "_chunk_file", lambda *args: calls.append(args) or chunk(*args))
+
+        first = server.read_file("pkg/mod.py")
+        assert "FUNCTION: alpha (lines 1-2)" in first
+        assert server.read_file("pkg/mod.py") == first
+        assert len(calls) == 1
+
+        path.write_text("class Beta:\n    pass\n")
+        os.utime(path, ns=(0, 10**9))
+        assert "CLASS: Beta (lines 1-2)" in server.read_file("pkg/mod.py")
+        assert len(calls) == 2
+
+    def test_javascript_chunked_with_tree_sitter(self, codebase, monkeypatch):
+        pytest.importorskip("tree_sitter_languages")
+        monkeypatch.setattr(mcp_server_module, "MAX_FILE_SIZE_FOR_CHUNKING", 10)
+        (codebase / "app.js").write_text(
+            "function alpha() {\n  return 1;\n}\n\nclass Beta {\n  run() {}\n}\n"
+        )
+        result = CodebaseMCPServer(str(codebase)).read_file("app.js")
+
+        assert "(chunked into 3 semantic units)" in result
+        assert "FUNCTION: alpha (lines 1-3)" in result
+        assert "CLASS: Beta (lines 5-7)" in result
+        assert "FUNCTION: run (lines 6-6)" in result
+
+    def test_chunking_without_tree_sitter(self, codebase, monkeypatch):
+        monkeypatch.setattr(mcp_server_module, "TREE_SITTER_AVAILABLE", False)
+        mcp_server_module._tree_sitter_chunker.cache_clear()
+        server = CodebaseMCPServer(str(codebase))
+        try:
+            py_chunks = server._chunk_file(Path("m.py"), "async def alpha():\n    pass\n")
+            assert [(c["chunk_type"], c["name"]) for c in py_chunks] == [("function", "alpha")]
+            assert not server._is_chunkable(".js")
+            assert [c["chunk_type"] for c in server._chunk_file(Path("m.py"), "def (:\n")] == ["block"]
+        finally:
+            mcp_server_module._tree_sitter_chunker.cache_clear()
+
+    def test_path_traversal_rejected(self, codebase):
+        with pytest.raises(ValueError):
+            CodebaseMCPServer(str(codebase / "pkg")).read_file("../README.md")
+
+    def test_sibling_with_shared_prefix_rejected(self, codebase):
+        (codebase / "pkg-secrets").mkdir()
+        (codebase / "pkg-secrets" / "key.txt").write_text("secret")
+        server = CodebaseMCPServer(str(codebase / "pkg"))
+
+        with pytest.raises(ValueError):
+            server.read_file("../pkg-secrets/key.txt")
+        with pytest.raises(ValueError):
+            server.analyze_file("../pkg-secrets/key.txt")
+
+
+class TestAnalyzeCodebase:
+    """Test the analyze_codebase structure"""
+
+    def test_structure(self, codebase):
+        (codebase / "pkg" / "package.json").write_text("{}")
+        (codebase / "pkg" / "blob.bin").write_bytes(b"\x00\n\n")
+        result = CodebaseMCPServer(str(codebase)).analyze_codebase()
+
+        assert result["total_files"] == 4
+        assert result["files_by_language"] == {"Python": 1, "Markdown": 1, "JSON": 1, "Other": 1}
+        assert {key: sorted(paths) for key, paths in result["directories"].items()} == {
+            ".": ["README.md"],
+            "pkg": ["pkg/app.py", "pkg/blob.bin", "pkg/package.json"],
+        }
+        assert sorted(f["path"] for f in result["key_files"]) == ["README.md", "pkg/app.py", "pkg/package.json"]
+        # Other-language files are not line counted
+        assert result["total_lines_of_code"] == 5 + 2 + 1
+        assert [(d["name"], d["source"], d["is_external"]) for d in result["dependencies"]] == [
+            ("os", "pkg/app.py", False), ("requests", "pkg/app.py", True)
+        ]
+
+
+    def test_parallel_measurement_matches_serial(self, codebase, monkeypatch):
+        for i in range(10):
+            (codebase / "pkg" / f"m{i}.py").write_text(f"import mod{i}\n" * (i + 1))
+            (codebase / "pkg" / f"s{i}.sh").write_text("echo\n" * i)
+        server = CodebaseMCPServer(str(codebase))
+        server._disk_cache = None
+
+        monkeypatch.setattr(mcp_server_module, "PARALLEL_SCAN_MIN_FILES", 10_000)
+        serial = server._analyze_codebase_uncached()
+        monkeypatch.setattr(mcp_server_module, "PARALLEL_SCAN_MIN_FILES", 1)
+        parallel = server._analyze_codebase_uncached()
+
+        assert parallel == serial
+        # A trailing partial line counts, so every non-empty file adds one
+        assert serial["total_lines_of_code"] == 5 + 2 + (55 + 10) + (45 + 9)
+
+    def test_detect_language(self, codebase):
+        server = CodebaseMCPServer(str(codebase))
+
+        assert server._detect_language(Path("a/App.TSX")) == "TypeScript (React)"
+        assert server._detect_language(Path("Makefile")) == "Other"
+        assert CodebaseMCPServer._detect_language_ext("PY") == "Python"
+
+class TestExtractDependencies:
+    """Test import/require extraction per language"""
+
+    def test_javascript(self, codebase):
+        server = CodebaseMCPServer(str(codebase))
+        content = (
+            "import React from 'react'\n"
+            "import './app.css'\n"
+            "import { a } from '@scope/pkg/sub'\n"
+            "const fs = require('fs')\n"
+        )
+        deps = server._extract_dependencies(content, codebase / "web" / "app.ts")
+
+        assert [(d["name"], d["type"], d["is_external"]) for d in deps] == [
+            ("react", "import", True), (".", "import", False),
+            ("scope", "import", True), ("fs", "require", True),
+        ]
+        assert {d["source"] for d in deps} == {"web/app.ts"}
+
+    def test_java_ruby_and_unknown(self, codebase):
+        server = CodebaseMCPServer(str(codebase))
+
+        java = server._extract_dependencies("import java.util.List;\n", codebase / "A.java")
+        ruby = server._extract_dependencies("require 'json'\n", codebase / "a.rb")
+        assert [(d["name"], d["import_path"]) for d in java] == [("java", "java.util.List")]
+        assert [(d["name"], d["type"]) for d in ruby] == [("json", "require")]
+        assert server._extract_dependencies('import "fmt"\n', codebase / "main.go") == []
+
+
+class TestCountLines:
+    """Test byte-level line counting"""
+
+    @pytest.mark.parametrize("data", [b"", b"one", b"one\n", b"a\nb\r\nc", "caf\u00e9\n\u00e9t\u00e9".encode()])
+    def test_matches_text_count(self, tmp_path, data):
+        path = tmp_path / "f.md"
+        path.write_bytes(data)
+        text = data.decode("utf-8")
+
+        assert CodebaseMCPServer._count_lines(path) == text.count("\n") + (1 if text else 0)
+
+    def test_spans_read_chunks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(mcp_server_module, "LINE_COUNT_CHUNK_SIZE", 4)
+        path = tmp_path / "f.md"
+        path.write_bytes(b"ab\ncdef\n\ngh")
+
+        assert CodebaseMCPServer._count_lines(path) == 4
+
+
+class TestIterFiles:
+    """Test the scandir-based file walker"""
+
+    def test_matches_os_walk(self, codebase):
+        (codebase / "pkg" / "sub").mkdir()
+        (codebase / "pkg" / "sub" / "deep.js").write_text("const a = 1\n")
+        (codebase / "pkg" / ".hidden.py").write_text("x = 1\n")
+        (codebase / ".github").mkdir()
+        (codebase / ".github" / "ci.yml").write_text("on: push\n")
+        os.symlink(codebase / "pkg", codebase / "linked")
+        server = CodebaseMCPServer(str(codebase))
+
+        expected = []
+        for root, dirs, files in os.walk(codebase):
+            dirs[:] = [d for d in dirs if d not in server.excluded]
+            expected.extend(os.path.join(root, f) for f in files if not f.startswith('.'))
+
+        assert [entry.path for entry in server._iter_files()] == expected
+        assert not any("node_modules" in path or "linked" in path for path in expected)
+
+
+    def test_git_checkout_uses_ls_files(self, codebase):
+        import subprocess
+
+        (codebase / ".gitignore").write_text("generated/\n")
+        (codebase / "generated").mkdir()
+        (codebase / "generated" / "out.py").write_text("x = 1\n")
+        (codebase / "pkg" / "build").mkdir()
+        (codebase / "pkg" / "build" / "tracked.py").write_text("x = 1\n")
+        subprocess.run(["git", "init", "-q"], cwd=codebase, check=True)
+        subprocess.run(["git", "add", "-f", "pkg", "README.md"], cwd=codebase, check=True)
+        (codebase / "pkg" / "untracked.py").write_text("x = 1\n")
+        server = CodebaseMCPServer(str(codebase))
+
+        # Ignored and excluded-dir files are dropped; untracked files are kept
+        assert sorted(entry.path[len(str(codebase)) + 1:] for entry in server._iter_files()) == [
+            "README.md", "pkg/app.py", "pkg/untracked.py"
+        ]
+        (codebase / "pkg" / "app.py").unlink()
+        assert server.analyze_codebase()["total_files"] == 2
+
+        # The listing is cached until invalidated
+        (codebase / "pkg" / "new.py").write_text("x = 1\n")
+        assert "pkg/new.py" not in server._git_tracked_files()
+        server.invalidate_analysis_cache()
+        assert "pkg/new.py" in server._git_tracked_files()
+
+    def test_non_git_root_walks_tree(self, codebase):
+        server = CodebaseMCPServer(str(codebase))
+        assert server._git_tracked_files() is None
+        assert len(list(server._iter_files())) == 2
+
+
+class TestFindReferences:
+    """Test find_references"""
+
+    def test_definitions_and_references(self, codebase):
+        (codebase / "pkg" / "app.py").write_text(
+            "class Greeter:\n"
+            "    def greet(self):\n"
+            "        return greet_all(greet)\n"
+            "\n"
+            "Greeter().greet()\n"
+        )
+        (codebase / "pkg" / "ui.js").write_text("function greet() {}\ngreet()\n")
+        (codebase / "node_modules" / "greet.js").write_text("greet()\n")
+        result = CodebaseMCPServer(str(codebase)).find_references("greet")
+
+        assert sorted(result.splitlines()) == [
+            "[DEF] pkg/app.py:2 (definition)",
+            "[DEF] pkg/ui.js:1 (definition)",
+            "[REF] pkg/app.py:3 (name)",
+            "[REF] pkg/app.py:5 (attribute)",
+            "[REF] pkg/ui.js:2 (reference)",
+        ]
+
+    def test_parallel_scan_matches_serial(self, codebase, monkeypatch):
+        for i in range(20):
+            (codebase / "pkg" / f"m{i}.js").write_text(f"// {i}\n" * i + "greet()\n")
+        server = CodebaseMCPServer(str(codebase))
+
+        monkeypatch.setattr(mcp_server_module, "PARALLEL_SCAN_MIN_FILES", 10_000)
+        serial = server.find_references("greet")
+        monkeypatch.setattr(mcp_server_module, "PARALLEL_SCAN_MIN_FILES", 1)
+        parallel = server.find_references("greet")
+
+        assert parallel == serial
+        assert len(parallel.splitlines()) == 20
+
+    def test_regex_scan_matches_per_line_search(self, codebase):
+        import re
+
+        content = (
+            "const greet = () => 1\n"
+            "greet(); greet()\n"
+            "\n"
+            "greeting = greet_all(greet)\n"
+            "export class greet {}\r\n"
+            "ungreet\n"
+            "greet"
+        )
+        expected = []
+        for i, line in enumerate(content.split("\n"), 1):
+            if re.search(r"\bgreet\b", line):
+                is_def = re.search(r"\b(function|class|const|let|var)\s+greet\b", line)
+                expected.append((i, "definition" if is_def else "reference"))
+
+        server = CodebaseMCPServer(str(codebase))
+        assert server._find_references_regex(codebase / "x.js", "greet", content) == expected
+        assert expected == [(1, "definition"), (2, "reference"), (4, "reference"),
+                            (5, "definition"), (7, "reference")]
+
+    def test_symbol_patterns_cached(self):
+        assert mcp_server_module._compile_symbol_patterns("a.b") is mcp_server_module._compile_symbol_patterns("a.b")
+        ref_pattern, _ = mcp_server_module._compile_symbol_patterns("a.b")
+        assert ref_pattern.search("a.b()") and not ref_pattern.search("axb")
+
+    def test_files_without_literal_skip_parsing(self, codebase, monkeypatch):
+        server = CodebaseMCPServer(str(codebase))
+        (codebase / "pkg" / "other.js").write_text("nothing here\n")
+        (codebase / "pkg" / "ui.js").write_text("greet()\n")
+        scanned = []
+        real_scan = server._find_references_regex
+        monkeypatch.setattr(server, "_find_references_regex",
+                            lambda path, symbol, content: scanned.append(path.name) or real_scan(path, symbol, content))
+        monkeypatch.setattr(server, "_index_python_source", lambda *args: pytest.fail("parsed .py file"))
+
+        assert server.find_references("greet") == "[REF] pkg/ui.js:1 (reference)"
+        assert scanned == ["ui.js"]
+
+    def test_large_files_searched_through_mmap(self, codebase, monkeypatch):
+        monkeypatch.setattr(mcp_server_module, "MMAP_MIN_SIZE", 16)
+        (codebase / "pkg" / "big.js").write_text("// filler\n" * 10 + "greet()\n")
+        (codebase / "pkg" / "app.py").write_text("x = 1\n" * 10 + "greet()\n")
+        (codebase / "pkg" / "tiny.js").write_text("greet\n")
+        (codebase / "pkg" / "empty.js").write_text("")
+        server = CodebaseMCPServer(str(codebase))
+
+        assert sorted(server.find_references("greet").splitlines()) == [
+            "[REF] pkg/app.py:11 (name)", "[REF] pkg/big.js:11 (reference)", "[REF] pkg/tiny.js:1 (reference)"
+        ]
+        assert server._read_text_if_contains(codebase / "pkg" / "big.js", b"missing") is None
+
+    def test_re2_backend_used_when_available(self, codebase, monkeypatch):
+        import re
+        import types
+
+        compiled = []
+
+        def compile_pattern(pattern):
+            compiled.append(pattern)
+            return re.compile(pattern)
+
+        monkeypatch.setattr(mcp_server_module, "RE2_AVAILABLE", True)
+        monkeypatch.setattr(mcp_server_module, "re2", types.SimpleNamespace(compile=compile_pattern), raising=False)
+        mcp_server_module._compile_symbol_patterns.cache_clear()
+        try:
+            (codebase / "pkg" / "ui.js").write_text("greet()\n")
+            assert CodebaseMCPServer(str(codebase)).find_references("greet") == "[REF] pkg/ui.js:1 (reference)"
+            mcp_server_module._compile_symbol_patterns("caf\u00e9")
+            assert compiled == [r"\bgreet\b"]
+        finally:
+            mcp_server_module._compile_symbol_patterns.cache_clear()
+
+    def test_python_index_covers_nested_and_async_nodes(self, codebase):
+        (codebase / "pkg" / "app.py").write_text(
+            "async def greet():\n"
+            "    return [greet for _ in range(2)]\n"
+            "\n"
+            "class A:\n"
+            "    class greet:\n"
+            "        x = self.greet.greet\n"
+        )
+        result = CodebaseMCPServer(str(codebase)).find_references("greet")
+
+        assert result.splitlines() == [
+            "[DEF] pkg/app.py:1 (definition)",
+            "[REF] pkg/app.py:2 (name)",
+            "[DEF] pkg/app.py:5 (definition)",
+            "[REF] pkg/app.py:6 (attribute)",
+            "[REF] pkg/app.py:6 (attribute)",
+        ]
+
+    def test_python_index_cached_until_file_changes(self, codebase, monkeypatch):
+        server = CodebaseMCPServer(str(codebase))
+        app = codebase / "pkg" / "app.py"
+        app.write_text("import os\nos.getcwd()\n")
+        assert server.find_references("getcwd") == "[REF] pkg/app.py:2 (attribute)"
+        assert list(server._python_index) == [str(app)]
+
+        # Any symbol is answered from the cached index without reading the file
+        real_read = server._read_text_if_contains
+        monkeypatch.setattr(server, "_read_text_if_contains",
+                            lambda path, needle: pytest.fail("file re-read") if path == app else real_read(path, needle))
+        assert server.find_references("os") == "[REF] pkg/app.py:2 (name)"
+        monkeypatch.undo()
+
+        app.write_text("import os\n\n\nos.getcwd()\n")
+        assert server.find_references("getcwd") == "[REF] pkg/app.py:4 (attribute)"
+
+    def test_python_syntax_error_falls_back_to_regex(self, codebase):
+        (codebase / "pkg" / "app.py").write_text("def greet(:\n    greet\n")
+        server = CodebaseMCPServer(str(codebase))
+
+        for _ in range(2):  # second pass hits the cached parse failure
+            assert server.find_references("greet") == "[REF] pkg/app.py:1 (reference)\n[REF] pkg/app.py:2 (reference)"
+
+    def test_no_references(self, codebase):
+        assert CodebaseMCPServer(str(codebase)).find_references("missing") == " No references found for 'missing'"
+
+
+class TestSubprocessTools:
+    """Test git_diff and run_tests"""
+
+    def test_git_diff_runs_in_root_without_chdir(self, codebase):
+        import subprocess
+
+        subprocess.run(["git", "init", "-q"], cwd=codebase, check=True)
+        subprocess.run(["git", "add", "."], cwd=codebase, check=True)
+        subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init"],
+                       cwd=codebase, check=True)
+        (codebase / "README.md").write_text("# Changed\n")
+        cwd = os.getcwd()
+
+        assert "README.md" in CodebaseMCPServer(str(codebase)).git_diff()
+        assert "+# Changed" in CodebaseMCPServer(str(codebase)).git_diff("README.md")
+        assert os.getcwd() == cwd
+
+    def test_run_tests_in_root(self, codebase):
+        (codebase / "test_sample.py").write_text("import os\n\ndef test_cwd():\n    assert os.path.exists('README.md')\n")
+        server = CodebaseMCPServer(str(codebase))
+        server.analyze_codebase()
+        cwd = os.getcwd()
+
+        result = server.run_tests("test_sample.py")
+        assert result.startswith("Exit: 0")
+        assert os.getcwd() == cwd
+        assert server._analyze_cache is None
+
+    def test_invalidation_clears_hybrid_keyword_cache(self, codebase, monkeypatch):
+        from orchestrator.hybrid_search import HybridSearch
+
+        hybrid_search = HybridSearch(mcp_client=CodebaseMCPServer(str(codebase)))
+        hybrid_search.keyword_search("print requests")
+        assert hybrid_search._keyword_cache
+        monkeypatch.setattr(mcp_server_module, "_hybrid_search_cache", hybrid_search)
+
+        CodebaseMCPServer(str(codebase)).invalidate_analysis_cache()
+        assert not hybrid_search._keyword_cache
+
+
+    def test_replaced_hybrid_search_is_closed(self, monkeypatch):
+        closed = []
+
+        class OldHybridSearch:
+            rag = object()
+
+            def close(self):
+                closed.append(True)
+
+        monkeypatch.setattr(mcp_server_module, "_hybrid_search_cache", OldHybridSearch())
+        new_rag = object()
+
+        assert mcp_server_module._get_hybrid_search(new_rag).rag is new_rag
+        assert closed == [True]
+        mcp_server_module._get_hybrid_search(new_rag)
+        assert closed == [True]
+
+
+class TestSearchDocs:
+    """Test the indexed search_docs"""
+
+    @pytest.fixture
+    def docs(self, codebase):
+        (codebase / "docs" / "guide").mkdir(parents=True)
+        (codebase / "docs" / "guide" / "auth.md").write_text("# Authentication\nUse the Token-Refresh flow.\n")
+        (codebase / "docs" / "deploy.md").write_text("Deploy with docker compose.\n")
+        (codebase / "README.md").write_text("# Demo\nSee docs for authentication.\n")
+        return codebase
+
+    def test_matches_case_insensitive_substrings(self, docs):
+        server = CodebaseMCPServer(str(docs))
+
+        assert sorted(server.search_docs("AUTH").splitlines()) == [
+            " README.md: Found 'AUTH'", " auth.md: Found 'AUTH'"
+        ]
+        assert server.search_docs("token-refresh fl") == " auth.md: Found 'token-refresh fl'"
+        assert server.search_docs("compose.") == " deploy.md: Found 'compose.'"
+        assert server.search_docs("->") == " No docs found for '->'"
+        assert server.search_docs("docker auth") == " No docs found for 'docker auth'"
+
+    def test_index_follows_edits_and_deletes(self, docs):
+        server = CodebaseMCPServer(str(docs))
+        assert server.search_docs("kubernetes") == " No docs found for 'kubernetes'"
+
+        (docs / "docs" / "deploy.md").write_text("Deploy with Kubernetes instead.\n")
+        assert server.search_docs("kubernetes") == " deploy.md: Found 'kubernetes'"
+        assert "docker" not in server._doc_postings
+
+        (docs / "docs" / "deploy.md").unlink()
+        assert server.search_docs("kubernetes") == " No docs found for 'kubernetes'"
+        assert "kubernetes" not in server._doc_postings
+        assert len(server._docs) == 2
+
+    def test_unchanged_docs_not_reread(self, docs, monkeypatch):
+        import builtins
+
+        server = CodebaseMCPServer(str(docs))
+        server.search_docs("auth")
+        monkeypatch.setattr(builtins, "open", lambda *args, **kwargs: pytest.fail("doc re-read"))
+        assert server.search_docs("deploy") == " deploy.md: Found 'deploy'"
+
+
+    def test_semantic_search_when_rag_available(self, docs, monkeypatch):
+        class FakeRAG:
+            def search(self, query, top_k=5):
+                assert top_k == 10
+                return [
+                    {"score": 0.91, "metadata": {"file_path": "docs/guide/auth.md"}},
+                    {"score": 0.88, "metadata": {"file_path": "orchestrator/auth.py"}},
+                    {"score": 0.75, "metadata": {"file_path": "docs/guide/auth.md"}},
+                    {"score": 0.52, "metadata": {"file_path": "README.md"}},
+                ]
+
+        monkeypatch.setattr(mcp_server_module, "_get_rag_service", lambda: FakeRAG())
+        server = CodebaseMCPServer(str(docs))
+
+        assert server.search_docs("login") == (
+            " auth.md: Related to 'login' (similarity 0.91)\n"
+            " README.md: Related to 'login' (similarity 0.52)"
+        )
+
+    def test_falls_back_without_doc_hits(self, docs, monkeypatch):
+        class CodeOnlyRAG:
+            def search(self, query, top_k=5):
+                return [{"score": 0.9, "metadata": {"file_path": "orchestrator/auth.py"}}]
+
+        monkeypatch.setattr(mcp_server_module, "_get_rag_service", lambda: CodeOnlyRAG())
+        assert CodebaseMCPServer(str(docs)).search_docs("compose") == " deploy.md: Found 'compose'"
+
+
+class TestDiskCache:
+    """Test the git-sha keyed persistent result cache"""
+
+    @staticmethod
+    def _git(codebase, *args):
+        import subprocess
+
+        subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+                       cwd=codebase, check=True, capture_output=True)
+
+    def test_clean_checkout_results_persisted_by_sha(self, codebase, monkeypatch):
+        (codebase / ".gitignore").write_text("node_modules/\n")
+        (codebase / "pkg" / "ui.js").write_text("greet()\n")
+        self._git(codebase, "init", "-q")
+        self._git(codebase, "add", ".")
+        self._git(codebase, "commit", "-qm", "init")
+        disk = {}
+
+        first = CodebaseMCPServer(str(codebase))
+        first._disk_cache = disk
+        assert first.find_references("greet") == "[REF] pkg/ui.js:1 (reference)"
+        assert len(disk) == 1
+
+        # A fresh server (e.g. after a restart) is answered from the disk cache
+        second = CodebaseMCPServer(str(codebase))
+        second._disk_cache = disk
+        monkeypatch.setattr(second, "_scan_one", lambda *args: pytest.fail("rescanned"))
+        assert second.find_references("greet") == "[REF] pkg/ui.js:1 (reference)"
+        monkeypatch.undo()
+
+        # Uncommitted changes bypass the cache entirely
+        (codebase / "pkg" / "ui.js").write_text("greet()\ngreet()\n")
+        second.invalidate_analysis_cache()
+        assert len(second.find_references("greet").splitlines()) == 2
+        assert len(disk) == 1
+
+        # A new commit gets its own entries
+        self._git(codebase, "commit", "-qam", "more")
+        second.invalidate_analysis_cache()
+        assert second.analyze_codebase()["total_files"] == 3
+        assert len(second.find_references("greet").splitlines()) == 2
+        assert len(disk) == 3
+
+    def test_version_and_settings_are_part_of_the_key(self, codebase, monkeypatch):
+        (codebase / ".gitignore").write_text("node_modules/\n")
+        self._git(codebase, "init", "-q")
+        self._git(codebase, "add", ".")
+        self._git(codebase, "commit", "-qm", "init")
+        disk = {}
+
+        def find_with(server):
+            server._disk_cache = disk
+            return server.find_references("os")
+
+        find_with(CodebaseMCPServer(str(codebase)))
+        find_with(CodebaseMCPServer(str(codebase)))
+        assert len(disk) == 1
+
+        # Other exclusions don't reuse the entry
+        narrow = CodebaseMCPServer(str(codebase))
+        narrow.excluded = frozenset({'.git'})
+        narrow._settings_key = (tuple(sorted(narrow.excluded)), narrow._settings_key[1])
+        find_with(narrow)
+        assert len(disk) == 2
+
+        # Nor does a newer cache format
+        monkeypatch.setattr(mcp_server_module, "DISK_CACHE_VERSION", mcp_server_module.DISK_CACHE_VERSION + 1)
+        find_with(CodebaseMCPServer(str(codebase)))
+        assert len(disk) == 3
+
+    def test_non_git_root_not_cached(self, codebase):
+        server = CodebaseMCPServer(str(codebase))
+        server._disk_cache = {}
+        server.find_references("greet")
+
+        assert server._clean_head_sha() is None
+        assert server._disk_cache == {}
+
+
+class TestStreamTests:
+    """Test streamed test runs"""
+
+    def test_endpoint_streams_output_then_exit_code(self, codebase, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        (codebase / "test_sample.py").write_text("def test_ok():\n    print('caf\u00e9')\n")
+        monkeypatch.setattr(mcp_server_module, "mcp_server", CodebaseMCPServer(str(codebase)))
+        response = TestClient(mcp_server_module.app).post("/api/mcp/run_tests", json={"test_file": "test_sample.py"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "test_sample.py::test_ok PASSED" in response.text
+        assert response.text.endswith("\nExit: 0\n")
+
+    async def test_timeout_kills_run(self, codebase, monkeypatch):
+        (codebase / "test_slow.py").write_text("import time\n\ndef test_slow():\n    time.sleep(30)\n")
+        monkeypatch.setattr(mcp_server_module, "RUN_TESTS_TIMEOUT", 1)
+        server = CodebaseMCPServer(str(codebase))
+        server.analyze_codebase()
+
+        chunks = [chunk async for chunk in server.stream_tests("test_slow.py")]
+        assert chunks[-1] == "\n Tests timed out (>1s)\n"
+        assert server._analyze_cache is None
+
+    async def test_no_framework(self, tmp_path):
+        chunks = [chunk async for chunk in CodebaseMCPServer(str(tmp_path)).stream_tests()]
+        assert chunks == [" No test framework detected"]
+
+
+class TestAnalyzeCodebaseEndpoint:
+    """Test ETag handling on /api/mcp/analyze_codebase"""
+
+    def test_if_none_match_returns_304(self, codebase, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        monkeypatch.setattr(mcp_server_module, "mcp_server", CodebaseMCPServer(str(codebase)))
+        client = TestClient(mcp_server_module.app)
+
+        response = client.post("/api/mcp/analyze_codebase")
+        assert response.status_code == 200
+        assert response.json()["result"]["total_files"] == 2
+        etag = response.headers["etag"]
+
+        revalidated = client.post("/api/mcp/analyze_codebase", headers={"If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+
+        stale = client.post("/api/mcp/analyze_codebase", headers={"If-None-Match": '"0-0"'})
+        assert stale.status_code == 200
+
+
+class TestListTools:
+    """Test the cached /api/mcp/tools response"""
+
+    def test_rebuilt_only_when_rag_availability_changes(self, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        clock = [100.0]
+        available = [False]
+        checks = []
+
+        def rag_available():
+            checks.append(clock[0])
+            return available[0]
+
+        monkeypatch.setattr(mcp_server_module.time, "monotonic", lambda: clock[0])
+        monkeypatch.setattr(mcp_server_module, "_rag_tools_available", rag_available)
+        monkeypatch.setattr(mcp_server_module, "_tools_cache", None)
+        client = TestClient(mcp_server_module.app)
+
+        names = [tool["name"] for tool in client.get("/api/mcp/tools").json()["tools"]]
+        assert "read_file" in names and "rag_search" not in names
+        client.get("/api/mcp/tools")
+        assert checks == [100.0]
+
+        available[0] = True
+        clock[0] += mcp_server_module.TOOLS_CACHE_TTL
+        response = client.get("/api/mcp/tools")
+        assert response.headers["content-type"] == "application/json"
+        assert [tool["name"] for tool in response.json()["tools"]][-2:] == ["rag_search", "rag_query"]
+        assert len(checks) == 2
+
+
+class TestRagServiceCache:
+    """Test the lazily loaded RAG service"""
+
+    def test_negative_result_rechecked_after_ttl(self, monkeypatch):
+        clock = [100.0]
+        service = [None]
+        loads = []
+
+        def try_load():
+            loads.append(clock[0])
+            return service[0]
+
+        monkeypatch.setattr(mcp_server_module.time, "monotonic", lambda: clock[0])
+        monkeypatch.setattr(mcp_server_module, "_try_load_rag", try_load)
+        monkeypatch.setattr(mcp_server_module, "_rag_service_cache", mcp_server_module._UNSET)
+
+        assert mcp_server_module._get_rag_service() is None
+        assert mcp_server_module._get_rag_service() is None
+        assert loads == [100.0]
+
+        service[0] = rag = object()
+        clock[0] += mcp_server_module.RAG_RECHECK_TTL
+        assert mcp_server_module._get_rag_service() is rag
+        clock[0] += mcp_server_module.RAG_RECHECK_TTL
+        assert mcp_server_module._get_rag_service() is rag
+        assert len(loads) == 2
+
+    def test_missing_index(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("RAG_INDEX_PATH", str(tmp_path / "missing.index"))
+        assert mcp_server_module._try_load_rag() is None
+
+
+class TestEndpointsOffloadBlockingWork:
+    """Test that endpoints run server methods off the event loop"""
+
+    async def test_slow_call_does_not_block_others(self, codebase, monkeypatch):
+        import asyncio
+        import threading
+        import httpx
+
+        server = CodebaseMCPServer(str(codebase))
+        read_served = threading.Event()
+        real_read_file = server.read_file
+
+        def slow_find_references(symbol):
+            # Only returns once another request has been served meanwhile
+            assert read_served.wait(timeout=5)
+            return "done"
+
+        def read_file(path, chunked=None):
+            read_served.set()
+            return real_read_file(path, chunked)
+
+        monkeypatch.setattr(server, "find_references", slow_find_references)
+        monkeypatch.setattr(server, "read_file", read_file)
+        monkeypatch.setattr(mcp_server_module, "mcp_server", server)
+
+        transport = httpx.ASGITransport(app=mcp_server_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp.test") as client:
+            refs, readme = await asyncio.gather(
+                client.post("/api/mcp/find_references", json={"symbol": "x"}),
+                client.post("/api/mcp/tool", json={"tool": "read_file", "args": {"path": "README.md"}}),
+            )
+
+        assert refs.json() == {"result": "done"}
+        assert readme.json() == {"result": "# Demo\n"}